@@ -0,0 +1,288 @@
+import json
+import threading
+import time
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import metrics
+import store
+import utils as ut
+
+# Price alerts over holdings, a watchlist and the Market Watch indices. Rules live in
+# data/alerts.json (DEFAULT_RULES until that file exists):
+#
+#   {"watchlist": ["TATAPOWER", "IRCTC"],
+#    "rules": [{"id": "below-200", "name": "Crossed below SMA200", "field": "close",
+#               "op": "crosses_below", "value": "sma200", "scope": "holdings"}, ...]}
+#
+# `value` is a number or another signal field; `scope` is holdings, watchlist, indices,
+# all or a list of symbols. On every live tick all rules are evaluated against all
+# symbols at once as one (symbol x rule) array operation. A rule notifies when its
+# condition turns true for a symbol, and again only after it has been false in between
+# and COOLDOWN_SECONDS have passed, so a price hovering at a level does not spam.
+#
+# One engine serves every session and writes each alert once to the log; a session
+# toasts the log entries within its own scopes that are newer than the last one it saw.
+# A tick only advances the (symbol, rule) pairs within the ticking session's scopes, so
+# another session's holdings never end or restart an episode, and a restarted engine
+# resumes its episodes from the log.
+
+RULES_FILE = store.DATA_DIR / "alerts.json"
+LOG_FILE = store.DATA_DIR / "alerts.jsonl"
+COOLDOWN_SECONDS = 3600
+MISSING_RETRY_SECONDS = 3600  # How often a symbol whose metrics cannot be computed is tried again
+
+FIELDS = ['close', 'pct_change', 'rsi', 'sma20', 'sma50', 'sma200', 'macd', 'macd_signal', 'macd_hist',
+          'pct_from_sma200', 'pct_from_52w_high', 'score', 'pros', 'cons', 'beta']
+_STORED = ['close', 'rsi', 'sma20', 'sma50', 'sma200', 'macd', 'macd_signal', 'pct_from_52w_high', 'score', 'pros', 'cons', 'beta']
+
+OPS = [">", ">=", "<", "<=", "crosses_above", "crosses_below"]
+SCOPES = ["holdings", "watchlist", "indices", "all"]
+
+DEFAULT_RULES = [
+    {'id': "below-sma200", 'name': "Crossed below SMA200", 'field': "close", 'op': "crosses_below", 'value': "sma200", 'scope': "holdings"},
+    {'id': "above-sma200", 'name': "Crossed above SMA200", 'field': "close", 'op': "crosses_above", 'value': "sma200", 'scope': "holdings"},
+    {'id': "rsi-oversold", 'name': "RSI oversold", 'field': "rsi", 'op': "<", 'value': 30, 'scope': "all"},
+    {'id': "index-down-2", 'name': "Index down 2%", 'field': "pct_change", 'op': "<=", 'value': -2, 'scope': "indices"},
+]
+
+
+def load_config():
+    """(rules, watchlist) from RULES_FILE, or the defaults and an empty watchlist."""
+    if not RULES_FILE.exists():
+        return DEFAULT_RULES, []
+    config = json.loads(RULES_FILE.read_text())
+    return config.get('rules', []), [s.strip().upper() for s in config.get('watchlist', [])]
+
+
+def validate(rule):
+    if rule['field'] not in FIELDS:
+        raise ValueError(f"Alert {rule['id']}: unknown field {rule['field']!r}")
+    if rule['op'] not in OPS:
+        raise ValueError(f"Alert {rule['id']}: unknown operator {rule['op']!r}")
+    if isinstance(rule['value'], str) and rule['value'] not in FIELDS:
+        raise ValueError(f"Alert {rule['id']}: unknown field {rule['value']!r}")
+    scope = rule.get('scope', "all")
+    if isinstance(scope, str) and scope not in SCOPES:
+        raise ValueError(f"Alert {rule['id']}: unknown scope {scope!r}")
+    return rule
+
+
+# --- SIGNALS (one row per symbol, one column per FIELDS entry) ---
+_compute_attempts = {}  # symbol -> epoch seconds of the last on-demand compute
+_compute_lock = threading.Lock()
+
+
+def _stored_metrics(symbols):
+    # Symbols the nightly job has not materialized are computed (and written through)
+    # here, each at most once per MISSING_RETRY_SECONDS so a failing one costs no ticks
+    df = metrics.read_all(symbols)
+    known = set(df['symbol'])
+    now = time.time()
+    with _compute_lock:
+        due = [s for s in symbols if s not in known and now - _compute_attempts.get(s, -np.inf) >= MISSING_RETRY_SECONDS]
+        _compute_attempts.update(dict.fromkeys(due, now))
+    if due and metrics.materialize(due)[0]:
+        df = metrics.read_all(symbols)
+    return df
+
+
+def signals(symbols, live_closes=None, indices=None, daily_closes=None):
+    """Signal frame for NSE symbols (stored indicators and scores plus live prices).
+
+    `live_closes` is today's intraday closes, one column per Yahoo symbol (`<symbol>.NS`
+    for stocks, the index ticker for `indices`, a {name: yf_symbol} map), and
+    `daily_closes` the last few daily closes in the same columns. The price, day change
+    (against the previous session's close, so an opening gap counts) and distance from
+    SMA200 follow the live price; RSI, MACD and scores are the latest materialized readings,
+    computed on the spot for symbols not materialized yet.
+    """
+    symbols = list(dict.fromkeys(symbols))
+    df = _stored_metrics(symbols).set_index('symbol').reindex(symbols)[_STORED].astype("float64")
+    indices = indices or {}
+    df = pd.concat([df, pd.DataFrame(index=list(indices), columns=_STORED, dtype="float64")])
+
+    if live_closes is not None and not live_closes.empty:
+        yf_symbols = [f"{s}.NS" for s in symbols] + list(indices.values())
+        closes = live_closes.reindex(columns=yf_symbols)
+        last = closes.ffill().iloc[-1].to_numpy()
+        df['close'] = np.where(np.isnan(last), df['close'].to_numpy(), last)
+        df['pct_change'] = (last / ut.previous_closes(daily_closes, closes.index[-1], yf_symbols).to_numpy() - 1) * 100
+    else:
+        df['pct_change'] = np.nan
+    df['macd_hist'] = df['macd'] - df['macd_signal']
+    df['pct_from_sma200'] = (df['close'] / df['sma200'] - 1) * 100
+    return df[FIELDS]
+
+
+def no_data(signal_frame, symbols):
+    """Symbols without any stored reading; only their live-price rules can fire."""
+    stored = [f for f in _STORED if f != 'close']
+    missing = signal_frame[stored].isna().all(axis=1)
+    return [s for s in symbols if missing.get(s, True)]
+
+
+# --- SINKS (callables taking a list of notification dicts) ---
+class JsonlSink:
+    """Appends notifications to a JSON-lines log."""
+
+    def __init__(self, path=LOG_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, notifications):
+        lines = "".join(json.dumps(n) + "\n" for n in notifications)
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(lines)
+
+
+def read_log(path=LOG_FILE, limit=50):
+    """Latest notifications from a JSON-lines log, newest first."""
+    if not path.exists():
+        return pd.DataFrame()
+    with open(path, encoding="utf-8") as f:
+        lines = f.readlines()[-limit:]
+    return pd.DataFrame([json.loads(line) for line in reversed(lines)])
+
+
+# --- ENGINE ---
+class AlertEngine:
+    """Evaluates compiled rules over a signal frame and notifies each (rule, symbol) once per episode.
+
+    `history` is earlier notifications (read_log); their (symbol, rule) pairs start out
+    as running episodes, so a restart does not announce them again.
+    """
+
+    def __init__(self, rules, watchlist=(), sinks=None, cooldown=COOLDOWN_SECONDS, history=None):
+        self.rules = [validate(r) for r in rules]
+        self.watchlist = list(watchlist)
+        self.sinks = sinks if sinks is not None else [JsonlSink()]
+        self.cooldown = cooldown
+        self.ids = [r['id'] for r in self.rules]
+        self._lock = threading.Lock()
+
+        # Rules as parallel arrays: operand columns, constants and operator codes
+        self.lhs = np.array([FIELDS.index(r['field']) for r in self.rules], dtype=np.int64)
+        is_ref = [isinstance(r['value'], str) for r in self.rules]
+        self.rhs_ref = np.array([FIELDS.index(r['value']) if ref else 0 for r, ref in zip(self.rules, is_ref)], dtype=np.int64)
+        self.rhs_is_ref = np.array(is_ref, dtype=bool)
+        self.rhs_const = np.array([np.nan if ref else float(r['value']) for r, ref in zip(self.rules, is_ref)])
+        self.op = np.array([OPS.index(r['op']) for r in self.rules], dtype=np.int64)
+
+        # Per (symbol, rule) state carried between ticks, as 0/1/NaN floats
+        self._above = pd.DataFrame(columns=self.ids, dtype="float64")  # lhs > rhs last tick (NaN: unknown)
+        self._active = pd.DataFrame(columns=self.ids, dtype="float64")  # Condition held last tick
+        self._last_fired = pd.DataFrame(columns=self.ids, dtype="float64")  # Epoch seconds
+        if history is not None and not history.empty and 'ts' in history.columns:
+            self._resume(history)
+
+    def _resume(self, history):
+        fired = history[history['rule'].isin(self.ids)].dropna(subset=['ts'])
+        if fired.empty:
+            return
+        self._last_fired = fired.pivot_table(index='symbol', columns='rule', values='ts', aggfunc="max").reindex(columns=self.ids)
+        self._active = self._last_fired.notna().astype("float64")
+
+    def _scope_mask(self, index, scopes):
+        # One isin per distinct scope, not per rule
+        mask = np.zeros((len(index), len(self.rules)), dtype=bool)
+        by_scope = {}
+        for i, r in enumerate(self.rules):
+            scope = r.get('scope', "all")
+            by_scope.setdefault(scope if isinstance(scope, str) else tuple(scope), []).append(i)
+        for scope, cols in by_scope.items():
+            if scope == "all":
+                members = index.isin(scopes.get('holdings', ())) | index.isin(scopes.get('watchlist', ()))
+            else:
+                members = index.isin(scopes.get(scope, ()) if isinstance(scope, str) else scope)
+            mask[:, cols] = members[:, None]
+        return mask
+
+    def evaluate(self, signal_frame, scopes, now=None):
+        """New notifications for this tick (also sent to every sink).
+
+        `scopes` maps holdings/watchlist/indices to their symbols (rows of `signal_frame`).
+        Only (symbol, rule) pairs within these scopes advance; the rest keep their state,
+        so a session without a symbol never ends or restarts another session's episode.
+        """
+        now = time.time() if now is None else now
+        index = signal_frame.index
+        values = signal_frame[FIELDS].to_numpy(dtype="float64")
+
+        lhs = values[:, self.lhs]
+        rhs = np.where(self.rhs_is_ref, values[:, self.rhs_ref], self.rhs_const)
+        known = ~(np.isnan(lhs) | np.isnan(rhs))
+        with np.errstate(invalid="ignore"):
+            above, below = lhs > rhs, lhs < rhs
+
+        with self._lock:
+            prev_above = self._above.reindex(index).to_numpy(dtype="float64")
+            prev_active = self._active.reindex(index).to_numpy(dtype="float64")
+            was_active = prev_active == 1
+            last_fired = self._last_fired.reindex(index).fillna(-np.inf).to_numpy(dtype="float64")
+
+            crossed_up = known & above & (prev_above == 0)
+            crossed_down = known & below & (prev_above == 1)
+            cond = np.select(
+                [self.op == 0, self.op == 1, self.op == 2, self.op == 3, self.op == 4],
+                [above, above | (lhs == rhs), below, below | (lhs == rhs), crossed_up],
+                crossed_down
+            )
+            in_scope = self._scope_mask(index, scopes)
+            cond &= known & in_scope
+
+            fire = cond & ~was_active & (now - last_fired >= self.cooldown)
+            # Symbols missing from this tick keep their state
+            self._above = self._merge(self._above, np.where(known, above, np.nan), index)
+            self._active = self._merge(self._active, np.where(in_scope, cond, prev_active), index)
+            self._last_fired = self._merge(self._last_fired, np.where(fire, now, np.where(np.isinf(last_fired), np.nan, last_fired)), index)
+
+        notifications = [self._notification(index[i], self.rules[j], lhs[i, j], rhs[i, j], now) for i, j in zip(*np.nonzero(fire))]
+        if notifications:
+            for sink in self.sinks:
+                sink(notifications)
+        return notifications
+
+    def visible(self, log, scopes):
+        """The log entries whose (symbol, rule) fall within `scopes`, for one session's view."""
+        log = log[log['rule'].isin(self.ids)] if not log.empty else log
+        if log.empty:
+            return log
+        mask = self._scope_mask(pd.Index(log['symbol']), scopes)
+        cols = np.array([self.ids.index(r) for r in log['rule']])
+        return log[mask[np.arange(len(log)), cols]]
+
+    def _merge(self, state, values, index):
+        fresh = pd.DataFrame(values, index=index, columns=self.ids, dtype="float64")
+        return pd.concat([state[~state.index.isin(index)], fresh]) if len(state) else fresh
+
+    @staticmethod
+    def _notification(symbol, rule, value, threshold, now):
+        against = f"{rule['value']} {threshold:,.2f}" if isinstance(rule['value'], str) else f"{threshold:g}"
+        return {
+            'time': datetime.fromtimestamp(now).isoformat(timespec="seconds"),
+            'ts': float(now),
+            'symbol': symbol,
+            'rule': rule['id'],
+            'message': f"{symbol}: {rule['name']} ({rule['field']} {value:,.2f} {rule['op'].replace('_', ' ')} {against})",
+            'value': float(value),
+            'threshold': float(threshold),
+        }
+
+
+_engine = None
+_engine_key = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """The process-wide engine (shared by every session, so each alert is logged once), reloaded when RULES_FILE changes."""
+    global _engine, _engine_key
+    key = RULES_FILE.stat().st_mtime if RULES_FILE.exists() else None
+    with _engine_lock:
+        if _engine is None or key != _engine_key:
+            rules, watchlist = load_config()
+            _engine, _engine_key = AlertEngine(rules, watchlist, history=read_log(limit=1000)), key
+        return _engine
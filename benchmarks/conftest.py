@@ -0,0 +1,197 @@
+"""Offline benchmark harness for the Dashboard and Screener hot paths.
+
+    python -m pytest benchmarks                          # compare against baseline.json
+    python -m pytest benchmarks --bench-save-baseline    # record a new baseline
+    python -m pytest benchmarks --bench-threshold 1.0    # allow a 2x slowdown
+
+The `benchmark` fixture mirrors pytest-benchmark's call style (`benchmark(fn, *args)`)
+so the tests also run unchanged under that plugin.
+
+Timings are compared in machine-independent units: the best round divided by the best
+time of a fixed pandas/interpreter reference workload measured right next to it. That
+keeps one baseline usable across laptops and CI, and a slow patch on a shared machine
+slows the reference too instead of failing the run.
+"""
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pytest
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent))
+# Anything that reaches for market data gets the recorded fixtures, never the network
+os.environ.setdefault("HUB_PROVIDER", "replay")
+
+FIXTURES_DIR = BENCH_DIR / "fixtures"
+BASELINE_FILE = BENCH_DIR / "baseline.json"
+DEFAULT_THRESHOLD = 0.5  # Fail when a path is >50% slower than the baseline
+MIN_ROUNDS = 5
+MIN_TIME = 0.2  # Seconds spent per benchmark after warm-up
+NOISE_FLOOR = 0.05  # Absolute slack (reference units) so sub-millisecond paths don't flap
+
+_results = {}
+
+
+@pytest.hookimpl(trylast=True)
+def pytest_configure(config):
+    # The store, journal and alert log go to a throwaway directory, never the real data/hub.db.
+    # Runs before collection, so before any test module imports store and reads HUB_DATA_DIR.
+    os.environ["HUB_DATA_DIR"] = str(config._tmp_path_factory.mktemp("hub-data"))
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("hub-benchmarks")
+    group.addoption("--bench-save-baseline", action="store_true",
+                    help="write the measured timings to benchmarks/baseline.json")
+    group.addoption("--bench-threshold", type=float,
+                    default=float(os.environ.get("BENCH_THRESHOLD", DEFAULT_THRESHOLD)),
+                    help="allowed slowdown vs the baseline as a fraction (env: BENCH_THRESHOLD)")
+
+
+def _load_baseline():
+    if not BASELINE_FILE.exists():
+        return {}
+    return json.loads(BASELINE_FILE.read_text())
+
+
+def _reference_workload():
+    # Roughly the mix the hot paths do: a pandas groupby plus per-value string formatting
+    df = pd.DataFrame({'k': np.arange(20_000) % 50, 'v': np.arange(20_000, dtype=float)})
+    df.groupby('k')['v'].sum()
+    return [f"{v:,.2f}" for v in range(2_000)]
+
+
+def _reference_time(rounds=3):
+    timings = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        _reference_workload()
+        timings.append(time.perf_counter() - t0)
+    return min(timings)
+
+
+class Benchmark:
+    """Times a callable over several rounds and checks the best round against the baseline."""
+
+    def __init__(self, name, baseline, threshold, save):
+        self.name = name
+        self.baseline = baseline
+        self.threshold = threshold
+        self.save = save
+        self.stats = None
+
+    def __call__(self, fn, *args, **kwargs):
+        result = fn(*args, **kwargs)  # Warm-up (imports, caches, first-call allocations)
+
+        reference = _reference_time()
+        timings = []
+        started = time.perf_counter()
+        while len(timings) < MIN_ROUNDS or time.perf_counter() - started < MIN_TIME:
+            t0 = time.perf_counter()
+            fn(*args, **kwargs)
+            timings.append(time.perf_counter() - t0)
+
+        reference = min(reference, _reference_time())
+        self.stats = {
+            'median': statistics.median(timings),
+            'min': min(timings),
+            'rounds': len(timings),
+            'units': min(timings) / reference,
+        }
+        _results[self.name] = self.stats
+        self._check()
+        return result
+
+    def _check(self):
+        if self.save or self.name not in self.baseline:
+            return
+        allowed = self.baseline[self.name] * (1 + self.threshold) + NOISE_FLOOR
+        units = self.stats['units']
+        if units > allowed:
+            pytest.fail(
+                f"{self.name}: {units:.2f} reference units exceeds baseline "
+                f"{self.baseline[self.name]:.2f} by more than {self.threshold:.0%}",
+                pytrace=False
+            )
+
+
+@pytest.fixture(scope="session")
+def baseline():
+    return _load_baseline()
+
+
+@pytest.fixture
+def benchmark(request, baseline):
+    config = request.config
+    return Benchmark(
+        request.node.nodeid.split("::", 1)[-1],
+        baseline,
+        config.getoption("--bench-threshold"),
+        config.getoption("--bench-save-baseline"),
+    )
+
+
+def pytest_sessionfinish(session, exitstatus):
+    if session.config.getoption("--bench-save-baseline") and _results:
+        merged = {**_load_baseline(), **{name: round(s['units'], 4) for name, s in _results.items()}}
+        BASELINE_FILE.write_text(json.dumps(dict(sorted(merged.items())), indent=2) + "\n")
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not _results:
+        return
+    baseline = _load_baseline()
+    terminalreporter.section("benchmarks (best / median, reference units)")
+    for name, s in sorted(_results.items()):
+        ref = baseline.get(name)
+        delta = f"{(s['units'] / ref - 1):+.0%} vs baseline" if ref else "no baseline"
+        terminalreporter.write_line(
+            f"{name:<36} {s['min'] * 1000:8.3f} / {s['median'] * 1000:8.3f} ms  "
+            f"{s['units']:7.2f} units  ({s['rounds']} rounds, {delta})"
+        )
+
+
+# --- RECORDED FIXTURES ---
+def _read_json(name):
+    return json.loads((FIXTURES_DIR / name).read_text())
+
+
+@pytest.fixture(scope="session")
+def kite_holdings():
+    return _read_json("kite_holdings.json")
+
+
+@pytest.fixture(scope="session")
+def kite_mf_holdings():
+    return _read_json("kite_mf_holdings.json")
+
+
+@pytest.fixture(scope="session")
+def kite_mf_sips():
+    return _read_json("kite_mf_sips.json")
+
+
+@pytest.fixture(scope="session")
+def sector_map():
+    return _read_json("sector_map.json")
+
+
+@pytest.fixture(scope="session")
+def ticker_info():
+    return _read_json("yf_info.json")
+
+
+@pytest.fixture(scope="session")
+def mfapi_payload():
+    return _read_json("mfapi_nav.json")
+
+
+@pytest.fixture
+def ohlc_history():
+    """Fresh copy of the recorded 2y daily history (indicator code mutates it)."""
+    return pd.read_csv(FIXTURES_DIR / "yf_history.csv", index_col="Date", parse_dates=True)
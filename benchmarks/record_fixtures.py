@@ -0,0 +1,173 @@
+"""Writes the offline fixtures used by the benchmark suite.
+
+    python benchmarks/record_fixtures.py          # deterministic synthetic portfolio
+    python benchmarks/record_fixtures.py --live   # record real yfinance/mfapi responses
+
+Kite payloads are always synthetic (no credentials in the repo), but they follow the
+exact shape returned by kite.holdings(), kite.mf_holdings() and kite.mf_sips().
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+
+HISTORY_SYMBOL = "RELIANCE.NS"
+SCHEME_CODE = "122639"
+
+EQUITY_SYMBOLS = [
+    "RELIANCE", "TCS", "HDFCBANK", "INFY", "ICICIBANK", "HINDUNILVR", "ITC", "SBIN", "BHARTIARTL", "KOTAKBANK",
+    "LT", "AXISBANK", "ASIANPAINT", "MARUTI", "SUNPHARMA", "TITAN", "ULTRACEMCO", "BAJFINANCE", "NESTLEIND", "WIPRO",
+    "HCLTECH", "POWERGRID", "NTPC", "TATAMOTORS", "TATASTEEL", "JSWSTEEL", "ONGC", "COALINDIA", "ADANIPORTS", "GRASIM",
+    "TECHM", "DRREDDY", "CIPLA", "DIVISLAB", "BRITANNIA", "EICHERMOT", "HEROMOTOCO", "BAJAJ-AUTO", "APOLLOHOSP", "TATACONSUM",
+]
+SECTORS = ["Energy", "Technology", "Financial Services", "Consumer Defensive", "Industrials",
+           "Basic Materials", "Healthcare", "Consumer Cyclical", "Utilities", "Communication Services"]
+FUNDS = [
+    "PARAG PARIKH FLEXI CAP FUND - DIRECT PLAN",
+    "UTI NIFTY 50 INDEX FUND - DIRECT PLAN",
+    "MIRAE ASSET MIDCAP FUND - DIRECT PLAN",
+    "ICICI PRUDENTIAL CORPORATE BOND FUND - DIRECT PLAN",
+    "AXIS LARGE CAP FUND - DIRECT PLAN",
+]
+
+
+def synthetic_kite(rng):
+    holdings = []
+    for symbol in EQUITY_SYMBOLS:
+        avg = round(float(rng.uniform(100, 5000)), 2)
+        holdings.append({
+            'tradingsymbol': symbol, 'exchange': "NSE", 'isin': f"INE{rng.integers(100000, 999999)}01",
+            'product': "CNC", 'quantity': int(rng.integers(1, 400)), 't1_quantity': 0,
+            'average_price': avg, 'last_price': round(avg * float(rng.uniform(0.6, 1.8)), 2),
+            'close_price': avg, 'pnl': 0.0, 'day_change': 0.0, 'day_change_percentage': 0.0,
+        })
+
+    mf_holdings = []
+    for i, fund in enumerate(FUNDS):
+        avg = round(float(rng.uniform(20, 120)), 4)
+        mf_holdings.append({
+            'folio': f"9{i:07d}", 'fund': fund, 'tradingsymbol': f"INF{i:09d}",
+            'quantity': round(float(rng.uniform(200, 5000)), 3), 'average_price': avg,
+            'last_price': round(avg * float(rng.uniform(0.9, 1.6)), 4), 'last_price_date': "2026-10-16", 'pnl': 0.0,
+        })
+
+    mf_sips = []
+    for i, fund in enumerate(FUNDS):
+        mf_sips.append({
+            'sip_id': f"SIP{i:04d}", 'fund': fund, 'tradingsymbol': f"INF{i:09d}", 'dividend_type': "growth",
+            'transaction_type': "BUY", 'status': "ACTIVE" if i % 4 else "PAUSED", 'frequency': "monthly",
+            'instalment_amount': float(rng.choice([1000, 2500, 5000, 10000])), 'instalments': -1,
+            'pending_instalments': -1, 'completed_instalments': int(rng.integers(1, 60)),
+            'instalment_day': int(rng.integers(1, 29)), 'next_instalment': "2026-11-05", 'created': "2022-01-05 10:00:00",
+        })
+    return holdings, mf_holdings, mf_sips
+
+
+def synthetic_history(rng, days=500):
+    dates = pd.bdate_range(end="2026-10-16", periods=days)
+    close = 2500 * np.exp(np.cumsum(rng.normal(0.0004, 0.015, days)))
+    spread = np.abs(rng.normal(0, 0.01, days)) * close
+    return pd.DataFrame({
+        'Open': close * (1 + rng.normal(0, 0.004, days)),
+        'High': close + spread,
+        'Low': close - spread,
+        'Close': close,
+        'Volume': rng.integers(1_000_000, 20_000_000, days),
+    }, index=pd.Index(dates, name='Date'))
+
+
+def synthetic_intraday(rng, sessions=22):
+    # One path of 1-minute NSE bars (09:15-15:29 IST); coarser intervals are aggregated from it
+    days = pd.bdate_range(end="2026-10-16", periods=sessions)
+    index = pd.DatetimeIndex(np.concatenate([
+        pd.date_range(day + pd.Timedelta(hours=9, minutes=15), periods=375, freq="min") for day in days
+    ])).tz_localize("Asia/Kolkata")
+    close = 2400 * np.exp(np.cumsum(rng.normal(0, 0.0007, len(index))))
+    spread = np.abs(rng.normal(0, 0.0005, len(index))) * close
+    bars = pd.DataFrame({
+        'Open': close * (1 + rng.normal(0, 0.0002, len(index))),
+        'High': close + spread,
+        'Low': close - spread,
+        'Close': close,
+        'Volume': rng.integers(1_000, 50_000, len(index)),
+    }, index=pd.Index(index, name='Datetime'))
+    agg = {'Open': "first", 'High': "max", 'Low': "min", 'Close': "last", 'Volume': "sum"}
+    return {
+        '1m': bars[bars.index >= index[-5 * 375]],  # Yahoo keeps 1m bars for a week
+        '5m': bars.resample("5min").agg(agg).dropna(),
+        '15m': bars.resample("15min").agg(agg).dropna(),
+    }
+
+
+def synthetic_info(rng):
+    return {
+        'symbol': HISTORY_SYMBOL, 'longName': "Reliance Industries Limited", 'sector': "Energy",
+        'forwardPE': 22.4, 'bookValue': 1150.0, 'currentPrice': 2890.5, 'returnOnEquity': 0.094,
+        'returnOnAssets': 0.131, 'debtToEquity': 36.2, 'revenueGrowth': 0.071, 'earningsGrowth': 0.118,
+        'dividendYield': 0.0035, 'profitMargins': 0.081, 'operatingMargins': 0.152, 'currentRatio': 1.18,
+        'marketCap': 19_500_000_000_000, 'beta': 0.92, 'fiftyTwoWeekHigh': 3217.9, 'fiftyTwoWeekLow': 2220.3,
+        'heldPercentInsiders': 0.503, 'heldPercentInstitutions': 0.372, 'freeCashflow': 420_000_000_000,
+    }
+
+
+def synthetic_mfapi(rng, days=1800):
+    dates = pd.date_range(end="2026-10-16", periods=days, freq="D")
+    nav = 40 * np.exp(np.cumsum(rng.normal(0.0005, 0.008, days)))
+    return {
+        'meta': {'scheme_code': int(SCHEME_CODE), 'scheme_name': FUNDS[0]},
+        'data': [{'date': d.strftime("%d-%m-%Y"), 'nav': f"{v:.4f}"} for d, v in zip(dates[::-1], nav[::-1])],
+        'status': "SUCCESS",
+    }
+
+
+def live_history():
+    import yfinance as yf
+    hist = yf.Ticker(HISTORY_SYMBOL).history(period="2y")
+    hist.index = hist.index.tz_localize(None).rename('Date')
+    return hist[['Open', 'High', 'Low', 'Close', 'Volume']]
+
+
+def live_info():
+    import yfinance as yf
+    return yf.Ticker(HISTORY_SYMBOL).info
+
+
+def live_mfapi():
+    import requests
+    return requests.get(f"https://api.mfapi.in/mf/{SCHEME_CODE}", timeout=15).json()
+
+
+def write_json(name, payload):
+    (FIXTURES_DIR / name).write_text(json.dumps(payload, indent=1, default=str))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--live", action="store_true", help="record yfinance and mfapi responses from the network")
+    args = parser.parse_args(argv)
+
+    FIXTURES_DIR.mkdir(exist_ok=True)
+    rng = np.random.default_rng(42)
+    holdings, mf_holdings, mf_sips = synthetic_kite(rng)
+    write_json("kite_holdings.json", holdings)
+    write_json("kite_mf_holdings.json", mf_holdings)
+    write_json("kite_mf_sips.json", mf_sips)
+    # Shape of utils.fetch_sector_info()
+    write_json("sector_map.json", {h['tradingsymbol']: SECTORS[i % len(SECTORS)] for i, h in enumerate(holdings)})
+
+    hist = live_history() if args.live else synthetic_history(rng)
+    hist.round(4).to_csv(FIXTURES_DIR / "yf_history.csv")
+    write_json("yf_info.json", live_info() if args.live else synthetic_info(rng))
+    write_json("mfapi_nav.json", live_mfapi() if args.live else synthetic_mfapi(rng))
+    # Separate stream so adding intraday bars left the other fixtures unchanged
+    for interval, bars in synthetic_intraday(np.random.default_rng(7)).items():
+        bars.round(4).to_csv(FIXTURES_DIR / f"yf_history_{interval}.csv")
+    print(f"Fixtures written to {FIXTURES_DIR}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
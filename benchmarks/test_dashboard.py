@@ -0,0 +1,182 @@
+from statistics import NormalDist
+import numpy as np
+import pandas as pd
+import pytest
+import charts
+import holdings as hd
+import utils as ut
+import risk
+import sip
+
+
+@pytest.fixture
+def frames(kite_holdings, kite_mf_holdings):
+    return ut.prepare_holdings_frames(kite_holdings, kite_mf_holdings)
+
+
+def test_prepare_holdings_frames(benchmark, kite_holdings, kite_mf_holdings):
+    df_eq, df_mf = benchmark(ut.prepare_holdings_frames, kite_holdings, kite_mf_holdings)
+    assert len(df_eq) == len(kite_holdings)
+    assert {'invested_value', 'current_value'} <= set(df_mf.columns)
+
+
+def test_what_if_simulation(benchmark, kite_holdings, kite_mf_holdings):
+    base_eq, _ = ut.prepare_holdings_frames(kite_holdings, kite_mf_holdings)
+    df_eq, _ = benchmark(ut.prepare_holdings_frames, kite_holdings, kite_mf_holdings, -20)
+    assert df_eq['current_value'].sum() == pytest.approx(base_eq['current_value'].sum() * 0.8)
+
+
+def test_compact_holdings_memory(benchmark, kite_holdings):
+    large = [dict(h, tradingsymbol=f"{h['tradingsymbol']}{i}") for i in range(25) for h in kite_holdings]
+    df_eq = benchmark(hd.from_records, large, hd.EQUITY_SCHEMA)
+    # Only the needed fields with compact dtypes (every symbol unique, so the categorical saves least)
+    assert hd.memory_bytes(df_eq) < hd.memory_bytes(pd.DataFrame(large)) / 2
+
+
+def test_portfolio_totals(benchmark, frames):
+    total_inv, total_curr = benchmark(ut.portfolio_totals, *frames)
+    assert total_inv > 0 and total_curr > 0
+
+
+def test_sector_aggregation(benchmark, frames, sector_map):
+    df_sector_full, df_sector_summary = benchmark(ut.build_sector_frames, frames[0], sector_map)
+    assert df_sector_summary['Weight %'].sum() == pytest.approx(100)
+    assert df_sector_summary['current_value'].is_monotonic_decreasing
+
+
+def test_equity_holdings_table(benchmark, frames):
+    html = benchmark(ut.equity_holdings_html, frames[0])
+    assert "<table" in html and "RELIANCE" in html
+
+
+def test_sector_table(benchmark, frames, sector_map):
+    _, df_sector_summary = ut.build_sector_frames(frames[0], sector_map)
+    html = benchmark(ut.sector_summary_html, df_sector_summary)
+    assert "<table" in html
+
+
+def test_indian_currency_formatter(benchmark, frames):
+    values = frames[0]['current_value'].tolist() * 25
+    formatted = benchmark(lambda: [ut.format_indian_currency(v) for v in values])
+    assert ut.format_indian_currency(12345678.9) == "1,23,45,678.90"
+    assert len(formatted) == len(values)
+
+
+def test_metric_formatter(benchmark, ticker_info):
+    values = [v for v in ticker_info.values() if isinstance(v, (int, float))] * 50
+    formatted = benchmark(lambda: [ut.format_val(v, prefix="₹", decimals=2) for v in values])
+    assert "N/A" not in formatted
+
+
+def test_nav_payload_parsing(benchmark, mfapi_payload):
+    df_nav = benchmark(ut.parse_nav_payload, mfapi_payload)
+    assert df_nav['date'].is_monotonic_increasing
+    assert df_nav['nav'].notna().all()
+
+
+def test_sip_cash_flow_projection(benchmark, kite_mf_sips):
+    df_sip = pd.DataFrame(kite_mf_sips)
+    flows = benchmark(sip.project_cash_flows, df_sip, 12, pd.Timestamp("2026-10-19"), holidays=[])
+    assert not flows.empty
+
+
+def test_nav_chart_downsample(benchmark, mfapi_payload):
+    import plotly.express as px
+    df_nav = ut.parse_nav_payload(mfapi_payload)
+    x = df_nav['date'].values.astype("int64").astype(float)
+    keep = benchmark(charts.lttb, x, df_nav['nav'].values, 500)
+    assert len(keep) == 500 and keep[0] == 0 and keep[-1] == len(df_nav) - 1
+    assert df_nav['nav'].idxmax() in keep and df_nav['nav'].idxmin() in keep
+
+    fig = px.area(df_nav, x='date', y='nav')
+    full_bytes = len(fig.to_json())
+    assert len(charts.downsample_figure(fig, 500).to_json()) < full_bytes / 2
+
+
+def test_memoized_sector_sunburst(benchmark, frames, sector_map):
+    import plotly.express as px
+    df_sector_full, _ = ut.build_sector_frames(frames[0], sector_map)
+    builds = []
+
+    def build():
+        builds.append(1)
+        return px.sunburst(df_sector_full, path=['Sector', 'tradingsymbol'], values='current_value', color='Sector')
+
+    spec = benchmark(charts.memo_figure, "bench_sunburst", build, df_sector_full)
+    assert len(builds) == 1 and spec['data'][0]['type'] == "sunburst"
+
+
+@pytest.fixture
+def risk_inputs():
+    # Synthetic 20-asset portfolio: three years of correlated normal daily log returns
+    rng = np.random.default_rng(7)
+    n_assets, n_days = 20, 750
+    loadings = rng.normal(0, 0.008, (n_assets, 3))
+    cov = loadings @ loadings.T + np.diag(rng.uniform(0.005, 0.012, n_assets) ** 2)
+    log_rets = rng.multivariate_normal(np.full(n_assets, 0.0004), cov, n_days)
+    prices = pd.DataFrame(100 * np.exp(np.cumsum(log_rets, axis=0)), index=pd.bdate_range("2022-01-03", periods=n_days))
+    value = rng.uniform(50_000, 500_000, n_assets)
+    positions = pd.DataFrame({'name': [f"A{i}" for i in range(n_assets)], 'current_value': value, 'weight': value / value.sum()})
+    return prices, positions, value.sum()
+
+
+def test_monte_carlo_var(benchmark, risk_inputs):
+    prices, positions, portfolio_value = risk_inputs
+    res = benchmark(risk.monte_carlo_var, prices, positions, portfolio_value, 0.95, 1, n_sims=100_000, seed=0)
+    assert benchmark.stats['min'] < 2.0  # 100k simulations, the Risk Lab default
+    assert len(res['returns']) == 100_000 and res['cvar'] > res['var'] > 0
+
+
+def test_monte_carlo_var_matches_analytic(risk_inputs):
+    # Normal VaR on the exact mean and covariance of the assets' lognormal simple returns;
+    # the simulated VaR only differs by the (small) skew of their weighted sum
+    prices, positions, portfolio_value = risk_inputs
+    log_rets = np.log(prices).diff().dropna()
+    weights = positions['weight'].to_numpy()
+    for confidence, horizon in [(0.95, 1), (0.99, 1), (0.95, 10)]:
+        mu, cov = log_rets.mean().to_numpy() * horizon, log_rets.cov().to_numpy() * horizon
+        growth = np.exp(mu + np.diag(cov) / 2)
+        mean = weights @ (growth - 1)
+        sigma = np.sqrt(weights @ (np.outer(growth, growth) * np.expm1(cov)) @ weights)
+        analytic = -(mean + NormalDist().inv_cdf(1 - confidence) * sigma) * portfolio_value
+        res = risk.monte_carlo_var(prices, positions, portfolio_value, confidence, horizon, n_sims=100_000, seed=1)
+        assert res['var'] == pytest.approx(analytic, rel=0.03)
+
+
+def test_fund_lookthrough(benchmark, frames, sector_map):
+    import lookthrough
+    df_eq, _ = frames
+    # Twelve index funds over the same constituents: one concat and one groupby expand them all
+    names = [f"Scheme {i} Nifty 50 Index Fund - Direct Growth" for i in range(12)]
+    df_mf = pd.DataFrame({'fund': names, 'current_value': [250000.0] * len(names)})
+    funds = {name: f"bench-{i}" for i, name in enumerate(names)}
+
+    df = benchmark(lookthrough.exposure, df_eq, df_mf, funds, sector_map)
+    assert df['total'].sum() == pytest.approx(df_eq['current_value'].sum() + df_mf['current_value'].sum())
+    assert df['symbol'].is_unique and (df['via_funds'] > 0).any()
+
+
+def test_sector_classification_lookup(benchmark, kite_holdings):
+    import classification
+    symbols = [h['tradingsymbol'] for h in kite_holdings]
+    classification.sector_map(symbols)  # Built from the index lists and filled in on the first call
+    sectors = benchmark(classification.sector_map, symbols)
+    assert set(sectors) == set(symbols) and all(sectors.values())
+
+
+def test_alert_rules_tick(benchmark):
+    import alerts
+    # 300 rules x 500 symbols per tick, mixing constant and field-to-field comparisons
+    fields, rng = alerts.FIELDS, np.random.default_rng(0)
+    rules = [{'id': f"r{i}", 'name': f"Rule {i}", 'field': fields[i % len(fields)], 'op': alerts.OPS[i % len(alerts.OPS)],
+              'value': fields[(i + 3) % len(fields)] if i % 2 else float(i % 50), 'scope': ["all", "holdings", "watchlist"][i % 3]}
+             for i in range(300)]
+    symbols = [f"SYM{i}" for i in range(500)]
+    scopes = {'holdings': symbols[:300], 'watchlist': symbols[300:]}
+    signal_frame = pd.DataFrame(rng.normal(30, 20, (len(symbols), len(fields))), index=symbols, columns=fields)
+    sent = []
+    engine = alerts.AlertEngine(rules, sinks=[sent.extend])
+
+    first = engine.evaluate(signal_frame, scopes, now=0)
+    repeat = benchmark(engine.evaluate, signal_frame, scopes, now=1)
+    assert first and not repeat and len(sent) == len(first)  # An unchanged tick notifies nothing new
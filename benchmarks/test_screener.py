@@ -0,0 +1,120 @@
+import pytest
+import fetch
+import indicators
+import intraday
+import metrics
+import providers
+import resilience
+import screen
+import utils as ut
+from ta.trend import MACD
+
+
+def test_indicator_pipeline(benchmark, ohlc_history):
+    hist_data = benchmark(ut.add_indicators, ohlc_history)
+    assert {'RSI', 'SMA20', 'SMA50', 'SMA200'} <= set(hist_data.columns)
+    assert 0 <= hist_data['RSI'].iloc[-1] <= 100
+
+
+def test_macd(benchmark, ohlc_history):
+    def run():
+        macd_io = MACD(close=ohlc_history['Close'])
+        return macd_io.macd().iloc[-1], macd_io.macd_signal().iloc[-1]
+
+    curr_macd, curr_signal = benchmark(run)
+    assert curr_macd == curr_macd and curr_signal == curr_signal  # not NaN
+
+
+def test_analyze_stock(benchmark, ticker_info, ohlc_history):
+    hist_data = ut.add_indicators(ohlc_history)
+    pros, cons, total_score = benchmark(ut.analyze_stock, ticker_info, hist_data)
+    assert 0 <= total_score <= 17
+    assert pros or cons
+
+
+def test_batch_screen(benchmark):
+    df = benchmark(screen.run_screen, "NIFTY 50")
+    assert df['rank'].tolist() == list(range(1, len(df) + 1))
+    assert df['score'].is_monotonic_decreasing and df['error'].isna().all()
+
+
+def test_materialized_metrics_lookup(benchmark):
+    metrics.get_or_compute("RELIANCE")  # Written through on the first call
+    row = benchmark(metrics.get, "RELIANCE")
+    assert row is not None and row['score'] is not None
+
+
+def test_incremental_indicator_update(benchmark, ohlc_history):
+    closes = ohlc_history['Close']
+    seeded = indicators.from_history(closes.iloc[:-1])
+
+    def run():
+        state = seeded.copy()
+        state.update(closes.index[-1], closes.iloc[-1])
+        return state.values()
+
+    live = benchmark(run)
+    full = ut.add_indicators(ohlc_history.copy()).iloc[-1]
+    macd_io = MACD(close=closes)
+    assert abs(live['rsi'] - full['RSI']) < 1e-9 and abs(live['sma200'] - full['SMA200']) < 1e-6
+    assert abs(live['macd_signal'] - macd_io.macd_signal().iloc[-1]) < 1e-6
+
+
+def test_intraday_chart_downsample(benchmark):
+    bars = ut.add_indicators(intraday.get_bars("RELIANCE.NS", "1m"))
+    plot_data = benchmark(intraday.downsample, bars, 500)
+    assert len(plot_data) <= 500 and plot_data['High'].max() == bars['High'].max()
+    assert plot_data['Close'].iloc[-1] == bars['Close'].iloc[-1]
+
+
+def test_peer_comparison(benchmark):
+    import peers
+    symbols = list(ut.get_index_tickers("NIFTY 50"))
+    metrics.materialize(symbols[:20])
+    matrix = peers.fundamentals_matrix(symbols)
+    table, percentiles = benchmark(peers.compare, matrix, symbols[0])
+    assert table.index[-1] == "Sector median" and list(percentiles.index) == list(table.columns)
+
+
+@pytest.fixture
+def live_yahoo(monkeypatch):
+    # The live provider's Yahoo path (fetch limits, retries, breaker) over fresh host state,
+    # answering from the recorded fixtures; `empty` symbols get Yahoo's empty answer
+    for state in ("_buckets", "_breakers", "_empties"):
+        monkeypatch.setattr(fetch, state, {})
+    monkeypatch.setattr(fetch, "BACKOFF", 0.01)
+    monkeypatch.setattr(fetch, "RATE_LIMITS", {"yahoo": (500, 500)})
+    replay, empty, calls = providers.ReplayProvider(), set(), []
+
+    def info(yf_symbol):
+        calls.append(yf_symbol)
+        if yf_symbol in empty:
+            raise providers._empty("info", yf_symbol)
+        return replay.ticker_info(yf_symbol)
+
+    monkeypatch.setattr(providers, "_info", info)
+    return providers.LiveProvider(), empty, calls
+
+
+def _screen_infos(provider, symbols):
+    return fetch.gather([lambda s=s: provider.ticker_info(f"{s}.NS") for s in symbols], return_exceptions=True)
+
+
+def test_screen_with_an_empty_symbol_keeps_the_breaker_closed(live_yahoo):
+    provider, empty, calls = live_yahoo
+    symbols = list(ut.get_index_tickers("NIFTY 50"))
+    empty.update({f"{symbols[0]}.NS", f"{symbols[1]}.NS"})  # Delisted or data-less tickers
+
+    results = _screen_infos(provider, symbols)
+    assert sum(isinstance(r, resilience.EmptyResponse) for r in results) == 2
+    assert fetch.breaker("yahoo").state == "closed" and fetch.bucket("yahoo").throttled == 0
+    assert calls.count(f"{symbols[0]}.NS") == 1  # Not retried
+
+
+def test_burst_of_empty_answers_counts_as_throttling(live_yahoo):
+    provider, empty, calls = live_yahoo
+    symbols = list(ut.get_index_tickers("NIFTY 50"))
+    empty.update(f"{s}.NS" for s in symbols)  # Yahoo answering empty for everything
+
+    _screen_infos(provider, symbols[:10])
+    assert fetch.bucket("yahoo").throttled > 0 and fetch.breaker("yahoo").state != "closed"
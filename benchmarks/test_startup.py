@@ -0,0 +1,47 @@
+"""Cold-start benchmarks: each round is a fresh interpreter, like a new Streamlit worker."""
+import json
+import subprocess
+import sys
+import pytest
+from conftest import BENCH_DIR
+
+ROOT = BENCH_DIR.parent
+HEAVY_MODULES = ("yfinance", "kiteconnect", "ta", "plotly.express")  # streamlit itself loads plotly.graph_objects
+
+_IMPORT_SCRIPT = """
+import json, sys
+import utils
+print(json.dumps(sorted(m for m in {heavy!r} if m in sys.modules)))
+"""
+
+_RENDER_SCRIPT = """
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({page!r}, default_timeout=60)
+at.run()
+assert not at.exception, at.exception
+"""
+
+
+def _run(script):
+    result = subprocess.run([sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True, timeout=120)
+    if result.returncode != 0:
+        pytest.fail(result.stderr[-2000:], pytrace=False)
+    return result.stdout
+
+
+def test_utils_import_defers_heavy_libraries():
+    loaded = json.loads(_run(_IMPORT_SCRIPT.format(heavy=HEAVY_MODULES)).splitlines()[-1])
+    assert loaded == []
+
+
+def test_cold_import_utils(benchmark):
+    benchmark(_run, "import utils")
+
+
+def test_home_first_render(benchmark):
+    benchmark(_run, _RENDER_SCRIPT.format(page=str(ROOT / "🏠_Home.py")))
+
+
+def test_dashboard_login_first_render(benchmark):
+    # Before login the Dashboard only shows Market Watch and the sidebar (replay data)
+    benchmark(_run, _RENDER_SCRIPT.format(page=str(ROOT / "pages" / "1_📊_Dashboard.py")))
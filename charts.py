@@ -0,0 +1,130 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import perf
+
+# Server-side thinning of time-series figures. Long histories ("max" price charts,
+# 15-year NAVs, the SMA overlay's four traces) are cut to a point budget per trace
+# with Largest-Triangle-Three-Buckets, which keeps the peaks, troughs and turns a
+# line chart is read for while dropping points no screen has the pixels to show.
+
+MAX_POINTS = 1000  # Per trace; about one point per horizontal pixel of a wide chart
+
+_PER_POINT = ("customdata", "text", "hovertext")
+
+
+def lttb(x, y, threshold):
+    """Indices of the `threshold` points of (x, y) that Largest-Triangle-Three-Buckets keeps.
+
+    The first and last points always survive; every bucket in between contributes the
+    point forming the largest triangle with the previous pick and the next bucket's mean.
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    every = (n - 2) / (threshold - 2)
+    edges = (np.arange(threshold - 1) * every).astype(np.int64) + 1  # Buckets [edges[i], edges[i + 1])
+    edges[-1] = n - 1
+    counts = np.diff(edges)
+    mean_x = np.append(np.add.reduceat(x[:-1], edges[:-1]) / counts, x[-1])
+    mean_y = np.append(np.add.reduceat(y[:-1], edges[:-1]) / counts, y[-1])
+
+    picked = np.empty(threshold, dtype=np.int64)
+    picked[0], picked[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        bx, by = x[lo:hi], y[lo:hi]
+        area = np.abs((x[a] - mean_x[i + 1]) * (by - y[a]) - (x[a] - bx) * (mean_y[i + 1] - y[a]))
+        a = lo + int(area.argmax())
+        picked[i + 1] = a
+    return picked
+
+
+def _numeric_x(x, n):
+    # Dates become epoch nanoseconds; anything non-numeric falls back to even spacing
+    if x is None:
+        return np.arange(n, dtype="float64")
+    values = np.asarray(x)
+    if values.dtype.kind in "iuf":
+        return values.astype("float64")
+    try:
+        return pd.DatetimeIndex(pd.to_datetime(values)).asi8.astype("float64")
+    except (TypeError, ValueError):
+        return np.arange(n, dtype="float64")
+
+
+@perf.instrument("render.downsample_figure")
+def downsample_figure(fig, max_points=MAX_POINTS):
+    """Thins every line/area trace of a figure longer than `max_points`, in place; returns the figure."""
+    for trace in fig.data:
+        if trace.type not in ("scatter", "scattergl") or trace.y is None or len(trace.y) <= max_points:
+            continue
+        y = np.asarray(trace.y, dtype="float64")
+        n = len(y)
+        finite = np.flatnonzero(np.isfinite(y))  # e.g. the warm-up NaNs of an SMA
+        keep = finite[lttb(_numeric_x(trace.x, n)[finite], y[finite], max_points)]
+
+        update = {'y': y[keep]}
+        if trace.x is not None:
+            update['x'] = np.asarray(trace.x)[keep]
+        for attr in _PER_POINT:
+            values = trace[attr]
+            if values is not None and not isinstance(values, str) and len(values) == n:
+                update[attr] = np.asarray(values)[keep]
+        trace.update(update)
+    return fig
+
+
+# --- FIGURE MEMOIZATION ---
+# Finished figures are kept as Plotly JSON, keyed on a content hash of their inputs
+# (frames hashed row by row, everything else by repr). One cache serves every session:
+# identical inputs give identical figures, so a rerun or another user with the same
+# data skips Plotly Express construction and the layout updates entirely.
+
+FIGURE_CACHE_BYTES = 32 * 1024 * 1024
+
+_figures = OrderedDict()
+_figures_lock = threading.Lock()
+_figures_bytes = 0
+
+
+def content_hash(*inputs):
+    """Stable digest of frames, series and plain values (the order of inputs matters)."""
+    digest = hashlib.blake2b(digest_size=16)
+    for value in inputs:
+        if isinstance(value, (pd.DataFrame, pd.Series)):
+            digest.update(pd.util.hash_pandas_object(value, index=True).values.tobytes())
+            names = list(value.columns) if isinstance(value, pd.DataFrame) else [value.name]
+            digest.update(repr((names, str(value.index.dtype))).encode())
+        else:
+            digest.update(repr(value).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def memo_figure(name, build, *inputs):
+    """Figure spec (a dict for st.plotly_chart) for `build()`, built only when `inputs` changed."""
+    global _figures_bytes
+    key = (name, content_hash(*inputs))
+    with _figures_lock:
+        spec = _figures.get(key)
+        if spec is not None:
+            _figures.move_to_end(key)
+    perf.record_cache(f"figure.{name}", hit=spec is not None)
+
+    if spec is None:
+        spec = build().to_json()
+        with _figures_lock:
+            if key not in _figures:
+                _figures[key] = spec
+                _figures_bytes += len(spec)
+            while _figures_bytes > FIGURE_CACHE_BYTES and len(_figures) > 1:
+                _figures_bytes -= len(_figures.popitem(last=False)[1])
+    return json.loads(spec)
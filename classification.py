@@ -0,0 +1,224 @@
+"""Local symbol -> sector, industry and market-cap bucket table.
+
+    python classification.py                 # rebuild from the NSE constituent lists
+
+Built in bulk from NSE index CSVs, which already carry each constituent's sector in
+their Industry column, with the market-cap bucket taken from index membership (Nifty
+50/Next 50 large, Midcap 150 mid, Smallcap 250 small). Holdings outside those lists
+are filled in lazily from Yahoo the first time they are looked up and written through,
+so a sector lookup is a dictionary join against one query, not a network call per holding.
+Yahoo's sectors are translated into NSE's, so both sources group together. Rows older
+than REFRESH_DAYS are refreshed, the NSE lists in one rebuild, so index rebalances and
+reclassifications reach the table.
+"""
+import argparse
+import sys
+import time
+from datetime import datetime
+import pandas as pd
+import fetch
+import providers
+import resilience
+import store
+import utils as ut
+
+# Index -> market-cap bucket of its members; earlier lists win for symbols in several
+BULK_INDICES = {
+    "NIFTY 50": "Large Cap",
+    "NIFTY NEXT 50": "Large Cap",
+    "NIFTY MIDCAP 150": "Mid Cap",
+    "NIFTY SMALLCAP 250": "Small Cap",
+    "NIFTY BANK": None,
+}
+
+# Approximate AMFI cut-offs (revised half-yearly) for symbols outside the index lists
+LARGE_CAP_CR = 90000
+MID_CAP_CR = 30000
+
+UNKNOWN_SECTOR = "Others"
+
+REFRESH_DAYS = 30
+
+# Yahoo sector -> NSE macro sector, with industry-level exceptions where NSE splits a Yahoo sector
+YAHOO_SECTORS = {
+    "Financial Services": "Financial Services",
+    "Technology": "Information Technology",
+    "Energy": "Oil Gas & Consumable Fuels",
+    "Utilities": "Power",
+    "Consumer Defensive": "Fast Moving Consumer Goods",
+    "Consumer Cyclical": "Consumer Services",
+    "Healthcare": "Healthcare",
+    "Industrials": "Capital Goods",
+    "Basic Materials": "Chemicals",
+    "Communication Services": "Telecommunication",
+    "Real Estate": "Realty",
+}
+YAHOO_INDUSTRIES = {
+    "Auto Manufacturers": "Automobile and Auto Components",
+    "Auto Parts": "Automobile and Auto Components",
+    "Recreational Vehicles": "Automobile and Auto Components",
+    "Furnishings, Fixtures & Appliances": "Consumer Durables",
+    "Consumer Electronics": "Consumer Durables",
+    "Luxury Goods": "Consumer Durables",
+    "Textile Manufacturing": "Textiles",
+    "Apparel Manufacturing": "Textiles",
+    "Residential Construction": "Realty",
+    "Steel": "Metals & Mining",
+    "Aluminum": "Metals & Mining",
+    "Copper": "Metals & Mining",
+    "Other Industrial Metals & Mining": "Metals & Mining",
+    "Gold": "Metals & Mining",
+    "Silver": "Metals & Mining",
+    "Coking Coal": "Metals & Mining",
+    "Thermal Coal": "Oil Gas & Consumable Fuels",
+    "Building Materials": "Construction Materials",
+    "Paper & Paper Products": "Forest Materials",
+    "Lumber & Wood Production": "Forest Materials",
+    "Engineering & Construction": "Construction",
+    "Infrastructure Operations": "Construction",
+    "Airlines": "Services",
+    "Marine Shipping": "Services",
+    "Integrated Freight & Logistics": "Services",
+    "Trucking": "Services",
+    "Railroads": "Services",
+    "Airports & Air Services": "Services",
+    "Staffing & Employment Services": "Services",
+    "Entertainment": "Media Entertainment & Publication",
+    "Broadcasting": "Media Entertainment & Publication",
+    "Publishing": "Media Entertainment & Publication",
+    "Advertising Agencies": "Media Entertainment & Publication",
+    "Internet Content & Information": "Consumer Services",
+    "Utilities - Regulated Gas": "Oil Gas & Consumable Fuels",
+    "Conglomerates": "Diversified",
+}
+
+COLUMNS = ['symbol', 'sector', 'industry', 'market_cap_bucket', 'source', 'updated_at']
+
+
+def cap_bucket(market_cap_cr):
+    if not market_cap_cr:
+        return None
+    if market_cap_cr >= LARGE_CAP_CR:
+        return "Large Cap"
+    return "Mid Cap" if market_cap_cr >= MID_CAP_CR else "Small Cap"
+
+
+def nse_sector(sector, industry=None):
+    """NSE's macro sector for a Yahoo sector/industry pair (unmapped sectors pass through)."""
+    if industry in YAHOO_INDUSTRIES:
+        return YAHOO_INDUSTRIES[industry]
+    return YAHOO_SECTORS.get(sector, sector)
+
+
+def write(rows):
+    """Upserts classification rows; a missing field never overwrites a known one."""
+    store.execute_many(
+        "INSERT INTO symbol_classification (symbol, sector, industry, market_cap_bucket, source, updated_at) "
+        "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(symbol) DO UPDATE SET "
+        "sector = COALESCE(excluded.sector, sector), industry = COALESCE(excluded.industry, industry), "
+        "market_cap_bucket = COALESCE(excluded.market_cap_bucket, market_cap_bucket), "
+        "source = excluded.source, updated_at = excluded.updated_at",
+        [tuple(row.get(c) for c in COLUMNS) for row in rows]
+    )
+    return len(rows)
+
+
+def build():
+    """Rebuilds the table from the NSE constituent lists; returns how many symbols it covers."""
+    now = datetime.now().isoformat(timespec="seconds")
+    frames = []
+    for index_name, bucket in BULK_INDICES.items():
+        try:
+            df = ut.get_index_constituents(index_name)
+        except Exception:
+            continue  # One unreachable list should not block the rest
+        industry = df['Industry'] if 'Industry' in df.columns else None
+        # NSE's "Industry" column is its macro sector (Financial Services, Capital Goods, ...)
+        frames.append(pd.DataFrame({'symbol': df['Symbol'].values, 'sector': industry, 'industry': industry,
+                                    'market_cap_bucket': bucket}).astype(object))
+    if not frames:
+        return 0
+
+    df = pd.concat(frames, ignore_index=True).drop_duplicates('symbol')
+    df = df.where(df.notna(), None).assign(source="nse", updated_at=now)
+    return write(df.to_dict('records'))
+
+
+def _from_yahoo(symbol):
+    try:
+        info = providers.get_provider().ticker_info(f"{symbol}.NS")
+    except Exception as e:
+        if resilience.is_transient(e):
+            raise
+        info = {}  # Unknown or delisted: stored as UNKNOWN_SECTOR so it is not asked again
+    market_cap = info.get('marketCap')
+    sector = nse_sector(info.get('sector'), info.get('industry'))
+    return {'symbol': symbol, 'sector': sector or UNKNOWN_SECTOR, 'industry': info.get('industry'),
+            'market_cap_bucket': cap_bucket(market_cap / 1e7 if market_cap else None),
+            'source': "yahoo", 'updated_at': datetime.now().isoformat(timespec="seconds")}
+
+
+def read(symbols=None):
+    """Stored rows as a DataFrame (optionally for some symbols), sectors in NSE's taxonomy."""
+    if symbols is None:
+        df = store.run_query("SELECT * FROM symbol_classification")
+    else:
+        symbols = list(symbols)
+        if not symbols:
+            return pd.DataFrame(columns=COLUMNS)
+        placeholders = ",".join("?" * len(symbols))
+        df = store.run_query(f"SELECT * FROM symbol_classification WHERE symbol IN ({placeholders})", symbols)
+    # Rows written before Yahoo sectors were translated still carry Yahoo's names
+    df['sector'] = [nse_sector(s) if isinstance(s, str) else s for s in df['sector']]
+    return df
+
+
+def lookup(symbols):
+    """Classification rows for `symbols`, (re)building the table when due and filling gaps from Yahoo.
+
+    Symbols without a row, or with one older than REFRESH_DAYS that the NSE rebuild did
+    not renew, are fetched from Yahoo. Raises resilience.UpstreamError when Yahoo is
+    throttling and some symbols are still unknown; stale rows are kept on failure.
+    """
+    symbols = list(dict.fromkeys(symbols))
+    cutoff = (datetime.now() - pd.Timedelta(days=REFRESH_DAYS)).isoformat(timespec="seconds")
+    latest = store.run_query("SELECT MAX(updated_at) AS latest FROM symbol_classification WHERE source = 'nse'")['latest'].iloc[0]
+    if latest is None or latest < cutoff:
+        build()
+
+    df = read(symbols)
+    fresh = set(df.loc[df['sector'].notna() & (df['updated_at'] >= cutoff), 'symbol'])
+    missing = [s for s in symbols if s not in fresh]
+    if not missing:
+        return df
+
+    # Fan out the gaps; the whole fill costs about one ticker.info round trip
+    results = fetch.gather([lambda s=s: _from_yahoo(s) for s in missing], return_exceptions=True)
+    rows = [r for r in results if not isinstance(r, Exception)]
+    write(rows)
+    known = set(df.loc[df['sector'].notna(), 'symbol'])
+    failed = [s for s, r in zip(missing, results) if isinstance(r, Exception) and s not in known]
+    if failed:
+        raise resilience.UpstreamError(f"Sector lookup failed for {len(failed)} symbols: {', '.join(failed[:5])}")
+    return read(symbols) if rows else df
+
+
+def sector_map(symbols):
+    """{symbol: sector} for every symbol, joined from the local table."""
+    symbols = list(symbols)
+    df = lookup(symbols)
+    known = dict(zip(df['symbol'], df['sector']))
+    return {s: known.get(s) or UNKNOWN_SECTOR for s in symbols}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.parse_args(argv)
+    started = time.perf_counter()
+    covered = build()
+    print(f"Classified {covered} symbols in {time.perf_counter() - started:.1f}s -> {store.DB_PATH}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,253 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+import resilience
+
+# Async fetch layer shared by every page and background thread.
+#
+# One event loop runs in a daemon thread and owns the per-host semaphores and retry
+# backoff. Blocking clients (requests, yfinance, KiteConnect) run on the I/O pool via
+# asyncio.to_thread, and HTTP goes through one pooled requests.Session. Timeouts are
+# set on the clients themselves (see host_timeout()), so an abandoned call never leaves its
+# thread running and its host slot is held until the socket really gives up.
+# Each host also has a token bucket (requests/second, halved on throttling) and a
+# circuit breaker that fails fast after repeated throttling or outages.
+# Streamlit scripts stay synchronous and call in through run() / call_sync() / gather().
+
+IO_WORKERS = 32
+FANOUT_WORKERS = 32
+POOL_MAXSIZE = 32
+
+# Concurrent requests allowed per upstream (Kite's REST API allows ~3 req/s)
+HOST_LIMITS = {"yahoo": 8, "mfapi": 8, "nse": 2, "kite": 3}
+DEFAULT_LIMIT = 4
+
+# Seconds before a request is abandoned (per attempt), passed to the HTTP clients
+TIMEOUTS = {"yahoo": 20, "mfapi": 15, "nse": 15, "kite": 10}
+DEFAULT_TIMEOUT = 15
+
+# Sustained requests/second and burst per upstream; the bucket adapts below these
+RATE_LIMITS = {"yahoo": (4, 8), "mfapi": (10, 10), "nse": (2, 2), "kite": (3, 3)}
+DEFAULT_RATE = (5, 5)
+
+# Empty answers for this many distinct symbols within N seconds mean throttling (the window
+# outlasts the slowed-down bucket, so a throttled host cannot drift out of the burst)
+EMPTY_BURST = (5, 60)
+
+BREAKER_THRESHOLD = 5  # Consecutive transient failures before a host's circuit opens
+BREAKER_COOLDOWN = 30  # Seconds before a probe call is let through (doubles per re-trip)
+
+RETRIES = 2
+BACKOFF = 0.5  # Seconds, doubled per attempt
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+USER_AGENT = "Mozilla/5.0"
+
+_loop = None
+_loop_thread = None
+_loop_lock = threading.Lock()
+_semaphores = {}
+_buckets = {}
+_breakers = {}
+_empties = {}
+_guards_lock = threading.Lock()
+_session = None
+_session_lock = threading.Lock()
+_fanout_pool = ThreadPoolExecutor(max_workers=FANOUT_WORKERS, thread_name_prefix="fanout")
+_local = threading.local()
+
+
+def session():
+    """Process-wide pooled HTTP session (keep-alive across pages, reruns and threads)."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_connections=len(HOST_LIMITS) + 4, pool_maxsize=POOL_MAXSIZE)
+            s.mount("https://", adapter)
+            s.mount("http://", adapter)
+            s.headers.update({'User-Agent': USER_AGENT})
+            _session = s
+        return _session
+
+
+def _get_loop():
+    global _loop, _loop_thread
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            loop.set_default_executor(ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="fetch-io"))
+            thread = threading.Thread(target=loop.run_forever, daemon=True, name="fetch-loop")
+            thread.start()
+            _loop, _loop_thread = loop, thread
+        return _loop
+
+
+def _semaphore(host):
+    # Only touched from the loop thread, so no lock is needed
+    if host not in _semaphores:
+        _semaphores[host] = asyncio.Semaphore(HOST_LIMITS.get(host, DEFAULT_LIMIT))
+    return _semaphores[host]
+
+
+def bucket(host):
+    """The host's shared token bucket."""
+    with _guards_lock:
+        if host not in _buckets:
+            _buckets[host] = resilience.TokenBucket(*RATE_LIMITS.get(host, DEFAULT_RATE))
+        return _buckets[host]
+
+
+def breaker(host):
+    """The host's shared circuit breaker."""
+    with _guards_lock:
+        if host not in _breakers:
+            _breakers[host] = resilience.CircuitBreaker(BREAKER_THRESHOLD, BREAKER_COOLDOWN)
+        return _breakers[host]
+
+
+def empties(host):
+    """The host's empty-answer burst detector."""
+    with _guards_lock:
+        if host not in _empties:
+            _empties[host] = resilience.EmptyBurst(*EMPTY_BURST)
+        return _empties[host]
+
+
+def host_status():
+    """Current rate, throttle count and breaker state per host (for the perf panel)."""
+    with _guards_lock:
+        hosts = sorted(set(_buckets) | set(_breakers))
+    return [{
+        'host': host,
+        'rate_per_s': round(bucket(host).rate, 2),
+        'throttled': bucket(host).throttled,
+        'circuit': breaker(host).state,
+        'trips': breaker(host).trips,
+    } for host in hosts]
+
+
+def host_timeout(host):
+    """The host's per-attempt request timeout in seconds."""
+    return TIMEOUTS.get(host, DEFAULT_TIMEOUT)
+
+
+def _retryable(exc):
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError, requests.ConnectionError, requests.Timeout)):
+        return True
+    if resilience.is_throttle_signal(exc):
+        return True
+    response = getattr(exc, "response", None)
+    status = getattr(response, "status_code", None) or getattr(exc, "code", None)
+    return status in RETRY_STATUS
+
+
+async def call(host, fn, *args, retries=RETRIES, **kwargs):
+    """Runs a blocking call under the host's rate and concurrency limits, with retries.
+
+    `fn` must bound its own network time (a client timeout); it is never abandoned mid-flight.
+    Raises `resilience.CircuitOpen` without calling `fn` while the host's breaker is open.
+    """
+    host_bucket, host_breaker, host_empties = bucket(host), breaker(host), empties(host)
+    for attempt in range(retries + 1):
+        host_breaker.before_call(host)
+        wait = host_bucket.reserve()
+        if wait:
+            await asyncio.sleep(wait)
+        try:
+            async with _semaphore(host):
+                result = await asyncio.to_thread(fn, *args, **kwargs)
+        except Exception as e:
+            if isinstance(e, resilience.EmptyResponse):
+                e.burst = host_empties.record(e.key if e.key is not None else str(e))
+            if resilience.is_throttle_signal(e):
+                host_bucket.on_throttle()
+            if resilience.is_transient(e):
+                host_breaker.on_failure()
+            else:
+                host_breaker.on_success()  # The host answered; the error is ours or the request's
+            if attempt == retries or not _retryable(e):
+                raise
+        else:
+            host_bucket.on_success()
+            host_breaker.on_success()
+            host_empties.reset()
+            return result
+        await asyncio.sleep(BACKOFF * 2 ** attempt)
+
+
+async def get(url, host, timeout=None, **kwargs):
+    """GET through the pooled session; raises for HTTP errors."""
+    timeout = timeout or host_timeout(host)
+
+    def _get():
+        response = session().get(url, timeout=timeout, **kwargs)
+        response.raise_for_status()
+        return response
+
+    return await call(host, _get)
+
+
+def run(coro):
+    """Sync bridge: runs a coroutine on the fetch loop and blocks until it finishes."""
+    loop = _get_loop()
+    if threading.current_thread() is _loop_thread:
+        raise RuntimeError("fetch.run() called from the fetch loop; await the coroutine instead")
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+
+def call_sync(host, fn, *args, **kwargs):
+    return run(call(host, fn, *args, **kwargs))
+
+
+async def _map_calls(host, fn, items, return_exceptions):
+    return await asyncio.gather(*(call(host, fn, item) for item in items), return_exceptions=return_exceptions)
+
+
+def map_calls(host, fn, items, return_exceptions=False):
+    """Calls `fn(item)` for every item concurrently under one host's limit."""
+    return run(_map_calls(host, fn, list(items), return_exceptions))
+
+
+def get_json(url, host, **kwargs):
+    return run(get(url, host, **kwargs)).json()
+
+
+def get_text(url, host, **kwargs):
+    return run(get(url, host, **kwargs)).text
+
+
+def _run_fanout_task(fn):
+    _local.in_fanout = True
+    try:
+        return fn()
+    finally:
+        _local.in_fanout = False
+
+
+async def _gather(thunks, return_exceptions):
+    loop = asyncio.get_running_loop()
+    futures = [loop.run_in_executor(_fanout_pool, _run_fanout_task, fn) for fn in thunks]
+    return await asyncio.gather(*futures, return_exceptions=return_exceptions)
+
+
+def gather(thunks, return_exceptions=False):
+    """Runs zero-argument callables concurrently and returns their results in order.
+
+    Use this to fan out over provider calls; each upstream call inside still goes
+    through `call()` and its host limit. Nested fan-outs run inline.
+    """
+    thunks = list(thunks)
+    if len(thunks) <= 1 or getattr(_local, "in_fanout", False):
+        results = []
+        for fn in thunks:
+            try:
+                results.append(fn())
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                results.append(e)
+        return results
+    return run(_gather(thunks, return_exceptions))
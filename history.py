@@ -0,0 +1,122 @@
+import hashlib
+import pandas as pd
+import store
+import utils as ut
+
+BENCHMARK_SYMBOL = "^NSEI"
+MF_PREFIX = "MF:"   # NAVs share the price store, keyed as MF:<scheme_code>
+LOOKBACK_DAYS = 365
+REVALUE_DAYS = 5    # Stored days recomputed on every run, for late NAVs and revised closes
+
+
+def holdings_quantities(df_eq, df_mf, fund_codes):
+    """Current quantity per price-store key for equity and mapped MF holdings."""
+    parts = []
+
+    if not df_eq.empty:
+        parts.append(pd.Series(df_eq['quantity'].values, index=df_eq['tradingsymbol'].astype(str) + ".NS"))
+
+    if not df_mf.empty:
+        codes = {name.upper(): code for name, code in fund_codes.items()}
+        mf_keys = df_mf['fund'].str.upper().map(codes)
+        mapped = mf_keys.notna()
+        parts.append(pd.Series(df_mf.loc[mapped, 'quantity'].values, index=MF_PREFIX + mf_keys[mapped]))
+
+    if not parts:
+        return pd.Series(dtype=float)
+    quantities = pd.concat(parts).astype(float)
+    return quantities.groupby(level=0).sum()
+
+
+def holdings_hash(quantities):
+    payload = "|".join(f"{k}:{q:.4f}" for k, q in sorted(quantities.items()))
+    return hashlib.md5(payload.encode()).hexdigest()
+
+
+def sync_price_store(keys, start):
+    """Fetches only the days missing from the local price store."""
+    today = pd.Timestamp.today().normalize()
+    default_since = pd.Timestamp(start)
+
+    # 1. Yahoo symbols (equities + benchmark) in one batched download from the oldest gap
+    yahoo_keys = [k for k in keys if not k.startswith(MF_PREFIX)]
+    last_dates = {k: store.last_price_date(k) for k in yahoo_keys}
+    stale = [k for k, last in last_dates.items() if last is None or last < today]
+    if stale:
+        since = min(last_dates[k] if last_dates[k] is not None else default_since for k in stale)
+        closes = ut.get_close_history(tuple(stale), start=since.strftime('%Y-%m-%d'))
+        store.write_prices(closes)
+
+    # 2. NAVs: mfapi always returns full history, so only the tail is written
+    nav_last = {k: store.last_price_date(k) for k in keys if k.startswith(MF_PREFIX)}
+    stale_navs = [k for k, last in nav_last.items() if last is None or last < today]
+    navs = ut.get_nav_histories(k[len(MF_PREFIX):] for k in stale_navs)
+    for key in stale_navs:
+        last = nav_last[key]
+        df_nav = navs[key[len(MF_PREFIX):]]
+        if isinstance(df_nav, Exception):
+            continue  # Valued on its stored NAVs, or left out like an unpriced fund in risk.py
+        df_nav = df_nav[df_nav['date'] >= (last if last is not None else default_since)]
+        store.write_prices(df_nav.set_index('date')[['nav']].rename(columns={'nav': key}))
+
+
+def build_value_history(df_eq, df_mf, fund_codes, user_id="", lookback_days=LOOKBACK_DAYS):
+    """Daily portfolio value at current quantities, with the benchmark level alongside.
+
+    Rows are persisted in the local store per account and holdings; each run only
+    recomputes the last REVALUE_DAYS stored days onwards, so a new trading day appends
+    a single row and a day valued on a forward-filled price is corrected once the real
+    one arrives.
+    """
+    quantities = holdings_quantities(df_eq, df_mf, fund_codes)
+    if quantities.empty:
+        return pd.DataFrame(columns=['value', 'benchmark'])
+
+    current_hash = holdings_hash(quantities)
+
+    # 1. Quantities changed -> this account's older series no longer describes its portfolio
+    store.execute_many("DELETE FROM portfolio_history WHERE user_id = ? AND holdings_hash != ?", [(user_id, current_hash)])
+    stored = store.run_query(
+        "SELECT date FROM portfolio_history WHERE user_id = ? AND holdings_hash = ? ORDER BY date", (user_id, current_hash)
+    )
+
+    start = pd.Timestamp.today().normalize() - pd.Timedelta(days=lookback_days)
+    last_stored = pd.Timestamp(stored['date'].iloc[-1]) if not stored.empty else None
+
+    # 2. Bring prices up to date, then revalue only from the last stored day
+    keys = list(quantities.index) + [BENCHMARK_SYMBOL]
+    sync_price_store(keys, start)
+
+    # A short pre-roll lets forward-fill cover holidays at the window start
+    prices = store.read_prices(keys, start=start - pd.Timedelta(days=10)).ffill().loc[start:]
+    if prices.empty:
+        return pd.DataFrame(columns=['value', 'benchmark'])
+
+    # Each holding carries its own last price (its first one before it was listed), so a
+    # holding missing a day never shows up as a dip; unpriced holdings are left out
+    held = prices[quantities.index].dropna(axis=1, how='all').bfill()
+    values = held.mul(quantities[held.columns]).sum(axis=1, min_count=1).dropna()
+    if last_stored is not None:
+        values = values[values.index >= last_stored - pd.Timedelta(days=REVALUE_DAYS)]
+
+    benchmark = prices[BENCHMARK_SYMBOL].reindex(values.index)
+    store.execute_many(
+        "INSERT OR REPLACE INTO portfolio_history (user_id, holdings_hash, date, value, benchmark) VALUES (?, ?, ?, ?, ?)",
+        [(user_id, current_hash, d.strftime('%Y-%m-%d'), float(v), None if pd.isna(b) else float(b))
+         for d, v, b in zip(values.index, values.values, benchmark.values)]
+    )
+
+    history = store.run_query(
+        "SELECT date, value, benchmark FROM portfolio_history WHERE user_id = ? AND holdings_hash = ? AND date >= ? ORDER BY date",
+        (user_id, current_hash, start.strftime('%Y-%m-%d'))
+    )
+    history['date'] = pd.to_datetime(history['date'])
+    return history.set_index('date')
+
+
+def rebase_benchmark(history):
+    """Scales the benchmark so it starts at the portfolio's first value."""
+    bench = history['benchmark'].dropna()
+    if bench.empty:
+        return bench
+    return bench / bench.iloc[0] * history.loc[bench.index[0], 'value']
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+
+# Compact columnar holdings model. Kite returns ~15 fields per holding, but the pages
+# only read a handful, so frames are built straight from the payload with just these
+# fields and fixed dtypes: categorical names (a few codes instead of one Python string
+# per row) carry most of the saving. Prices stay float64: float32 keeps only ~7
+# significant digits, so a 4-decimal quote above ₹1,000 (MRF trades above ₹1,00,000)
+# would be rounded, and the error would carry into totals, P&L and the holdings hash.
+
+EQUITY_SCHEMA = {
+    'tradingsymbol': "category",
+    'quantity': "float64",
+    'average_price': "float64",
+    'last_price': "float64",
+}
+
+MF_SCHEMA = {
+    'fund': "category",
+    'quantity': "float64",
+    'average_price': "float64",
+    'last_price': "float64",
+}
+
+
+def from_records(records, schema):
+    """Typed frame with only the schema's fields from a list of Kite dicts (empty in, empty out)."""
+    if not records:
+        return pd.DataFrame()
+    columns = {}
+    for name, dtype in schema.items():
+        values = [r.get(name) for r in records]
+        if dtype == "category":
+            # factorize + from_codes is several times cheaper than astype("category")
+            codes, uniques = pd.factorize(np.array(values, dtype=object))
+            columns[name] = pd.Categorical.from_codes(codes, uniques)
+        else:
+            columns[name] = np.array(values, dtype=dtype)
+    return pd.DataFrame(columns, copy=False)
+
+
+def with_values(df, multiplier=1.0):
+    """Adds invested_value and (simulated) current_value in place."""
+    if not df.empty:
+        df['invested_value'] = df['quantity'] * df['average_price']
+        df['current_value'] = df['quantity'] * df['last_price'] * multiplier
+    return df
+
+
+def view(df, columns, rename=None):
+    """Narrow projection of a holdings frame for one table or chart.
+
+    Only the requested columns are materialized, and categorical columns come back as
+    str so Stylers, formatters and Plotly see plain values.
+    """
+    out = df[list(columns)]
+    casts = {c: str for c in columns if isinstance(out[c].dtype, pd.CategoricalDtype)}
+    if casts:
+        out = out.astype(casts)
+    return out.rename(columns=rename) if rename else out
+
+
+def memory_bytes(df):
+    """Deep memory footprint of a frame (for comparing representations)."""
+    return int(df.memory_usage(deep=True).sum()) if not df.empty else 0
@@ -0,0 +1,306 @@
+import json
+import math
+from collections import deque
+from datetime import datetime
+import pandas as pd
+import store
+
+# Streaming indicator state: RSI(14), SMA20/50/200 and MACD(12,26,9) kept as a few
+# running numbers per symbol, persisted next to the price store. Folding in one more
+# bar is O(1) instead of re-running `ta` over the full two-year window, and a bar with
+# the same timestamp as the last one (today's still-forming candle, an intraday tick)
+# amends it rather than appending, so live prices can be applied repeatedly.
+#
+# The recurrences are the ones `ta` uses (pandas ewm with adjust=False, min_periods =
+# window), so a seeded state matches ut.add_indicators / MACD to float precision.
+
+SMA_WINDOWS = (20, 50, 200)
+RSI_WINDOW = 14
+MACD_WINDOWS = (12, 26, 9)  # fast, slow, signal
+
+NAN = float("nan")
+
+
+class SMA:
+    """Rolling-sum simple moving average."""
+
+    def __init__(self, window):
+        self.window = window
+        self.values = deque()
+        self.total = 0.0
+
+    def push(self, x):
+        self.values.append(x)
+        self.total += x
+        if len(self.values) > self.window:
+            self.total -= self.values.popleft()
+
+    def amend(self, x):
+        self.total += x - self.values[-1]
+        self.values[-1] = x
+
+    @property
+    def value(self):
+        return self.total / self.window if len(self.values) == self.window else NAN
+
+    def to_dict(self):
+        # The sum is rebuilt from the window on load so float drift never accumulates on disk
+        return {'window': self.window, 'values': list(self.values)}
+
+    @classmethod
+    def from_dict(cls, d):
+        sma = cls(d['window'])
+        sma.values = deque(d['values'])
+        sma.total = math.fsum(sma.values)
+        return sma
+
+
+class EMA:
+    """Exponential moving average with span-based smoothing, seeded with the first value."""
+
+    def __init__(self, span, alpha=None):
+        self.span = span
+        self.alpha = alpha if alpha is not None else 2 / (span + 1)
+        self.ema = None
+        self.prev = None  # EMA before the last push, for amend()
+        self.count = 0
+
+    def _step(self, base, x):
+        return x if base is None else base + self.alpha * (x - base)
+
+    def push(self, x):
+        self.prev = self.ema
+        self.ema = self._step(self.prev, x)
+        self.count += 1
+
+    def amend(self, x):
+        self.ema = self._step(self.prev, x)
+
+    @property
+    def value(self):
+        return self.ema if self.count >= self.span else NAN
+
+    def to_dict(self):
+        return {'span': self.span, 'alpha': self.alpha, 'ema': self.ema, 'prev': self.prev, 'count': self.count}
+
+    @classmethod
+    def from_dict(cls, d):
+        ema = cls(d['span'], d['alpha'])
+        ema.ema, ema.prev, ema.count = d['ema'], d['prev'], d['count']
+        return ema
+
+
+class RSI:
+    """Wilder RSI: smoothed average gain and loss over close-to-close changes."""
+
+    def __init__(self, window=RSI_WINDOW):
+        self.window = window
+        self.gain = EMA(window, alpha=1 / window)
+        self.loss = EMA(window, alpha=1 / window)
+        self.last_close = None
+        self.base_close = None  # Close before the last bar, for amend()
+
+    def _change(self, x):
+        # The first bar counts as a zero change, like `ta` filling the leading diff with 0
+        return x - self.base_close if self.base_close is not None else 0.0
+
+    def push(self, x):
+        self.base_close, self.last_close = self.last_close, x
+        change = self._change(x)
+        self.gain.push(max(change, 0.0))
+        self.loss.push(max(-change, 0.0))
+
+    def amend(self, x):
+        self.last_close = x
+        change = self._change(x)
+        self.gain.amend(max(change, 0.0))
+        self.loss.amend(max(-change, 0.0))
+
+    @property
+    def value(self):
+        if self.gain.count < self.window:
+            return NAN
+        if self.loss.ema == 0:
+            return 100.0
+        return 100 - 100 / (1 + self.gain.ema / self.loss.ema)
+
+    def to_dict(self):
+        return {'window': self.window, 'gain': self.gain.to_dict(), 'loss': self.loss.to_dict(),
+                'last_close': self.last_close, 'base_close': self.base_close}
+
+    @classmethod
+    def from_dict(cls, d):
+        rsi = cls(d['window'])
+        rsi.gain, rsi.loss = EMA.from_dict(d['gain']), EMA.from_dict(d['loss'])
+        rsi.last_close, rsi.base_close = d['last_close'], d['base_close']
+        return rsi
+
+
+class MACD:
+    """MACD line (fast EMA - slow EMA) and its signal EMA."""
+
+    def __init__(self, fast=MACD_WINDOWS[0], slow=MACD_WINDOWS[1], signal=MACD_WINDOWS[2]):
+        self.fast, self.slow, self.signal = EMA(fast), EMA(slow), EMA(signal)
+
+    def push(self, x):
+        self.fast.push(x)
+        self.slow.push(x)
+        # The signal line starts at the first defined MACD value, as in `ta`
+        if self.slow.count >= self.slow.span:
+            self.signal.push(self.value)
+
+    def amend(self, x):
+        self.fast.amend(x)
+        self.slow.amend(x)
+        if self.slow.count >= self.slow.span:
+            self.signal.amend(self.value)
+
+    @property
+    def value(self):
+        return self.fast.value - self.slow.value
+
+    def to_dict(self):
+        return {'fast': self.fast.to_dict(), 'slow': self.slow.to_dict(), 'signal': self.signal.to_dict()}
+
+    @classmethod
+    def from_dict(cls, d):
+        macd = cls()
+        macd.fast, macd.slow, macd.signal = (EMA.from_dict(d[k]) for k in ('fast', 'slow', 'signal'))
+        return macd
+
+
+class IndicatorState:
+    """Every indicator the Screener shows for one symbol, advanced bar by bar."""
+
+    def __init__(self):
+        self.rsi = RSI()
+        self.smas = {w: SMA(w) for w in SMA_WINDOWS}
+        self.macd = MACD()
+        self.last_bar = None
+        self.close = NAN
+
+    def update(self, bar, close):
+        """Folds in one bar in O(1); a bar at the last timestamp replaces it, older bars are ignored.
+
+        Returns whether the state changed.
+        """
+        bar = pd.Timestamp(bar)
+        if self.last_bar is not None and bar < self.last_bar:
+            return False
+        close = float(close)
+        parts = [self.rsi, self.macd, *self.smas.values()]
+        if bar == self.last_bar:
+            if close == self.close:
+                return False
+            for part in parts:
+                part.amend(close)
+        else:
+            for part in parts:
+                part.push(close)
+            self.last_bar = bar
+        self.close = close
+        return True
+
+    def extend(self, closes):
+        """Applies a close series (indexed by bar time) in order; returns how many bars changed the state."""
+        applied = 0
+        for bar, close in closes.items():
+            if not pd.isna(close) and self.update(bar, close):
+                applied += 1
+        return applied
+
+    def values(self):
+        """Latest readings, named like the symbol_metrics columns (NaN until warmed up)."""
+        row = {'close': self.close, 'rsi': self.rsi.value, 'macd': self.macd.value, 'macd_signal': self.macd.signal.value}
+        row.update({f'sma{w}': sma.value for w, sma in self.smas.items()})
+        return row
+
+    def to_json(self):
+        return json.dumps({
+            'last_bar': self.last_bar.isoformat() if self.last_bar is not None else None,
+            'close': self.close,
+            'rsi': self.rsi.to_dict(),
+            'smas': [sma.to_dict() for sma in self.smas.values()],
+            'macd': self.macd.to_dict(),
+        })
+
+    @classmethod
+    def from_json(cls, text):
+        d = json.loads(text)
+        state = cls()
+        state.last_bar = pd.Timestamp(d['last_bar']) if d['last_bar'] else None
+        state.close = d['close'] if d['close'] is not None else NAN
+        state.rsi = RSI.from_dict(d['rsi'])
+        state.smas = {s['window']: SMA.from_dict(s) for s in d['smas']}
+        state.macd = MACD.from_dict(d['macd'])
+        return state
+
+    def copy(self):
+        return IndicatorState.from_json(self.to_json())
+
+
+def from_history(closes):
+    """A state seeded from a full close series (the one-off O(n) pass)."""
+    state = IndicatorState()
+    state.extend(closes)
+    return state
+
+
+# --- PERSISTENCE (indicator_state table in the local store) ---
+def load(symbol, interval="1d"):
+    df = store.run_query("SELECT state FROM indicator_state WHERE symbol = ? AND interval = ?", (symbol, interval))
+    return IndicatorState.from_json(df['state'].iloc[0]) if not df.empty else None
+
+
+def save(symbol, state, interval="1d"):
+    store.execute_many(
+        "INSERT OR REPLACE INTO indicator_state (symbol, interval, last_bar, updated_at, state) VALUES (?, ?, ?, ?, ?)",
+        [(symbol, interval, state.last_bar.isoformat(), datetime.now().isoformat(timespec="seconds"), state.to_json())]
+    )
+
+
+def advance(symbol, hist_data, interval="1d"):
+    """The stored state brought up to the last bar of `hist_data`, persisted when it moved.
+
+    Only bars from the stored last bar onwards are folded in (that one is amended with
+    its final close). The state is reseeded from the full history when nothing is stored,
+    the history no longer reaches back to the stored bar, or the history has been
+    re-adjusted since (a split or dividend).
+    """
+    state = load(symbol, interval)
+    if hist_data.empty:
+        return state
+
+    closes = hist_data['Close']
+    if state is None or state.last_bar is None or state.last_bar < closes.index[0] or _readjusted(state, closes):
+        state = from_history(closes)
+        applied = len(closes)
+    else:
+        applied = state.extend(closes[closes.index >= state.last_bar])
+    if applied:
+        save(symbol, state, interval)
+    return state
+
+
+def _readjusted(state, closes):
+    # The last bar may have been stored while still forming, so compare the settled bar
+    # before it: adjusted histories rewrite every close before the ex-date
+    settled = closes[closes.index < state.last_bar].dropna()
+    if settled.empty or state.rsi.base_close is None:
+        return False
+    return not math.isclose(settled.iloc[-1], state.rsi.base_close, rel_tol=1e-9)
+
+
+def live_reading(symbol, hist_data, live_price=None, interval="1d"):
+    """Latest readings with a live price amending the current bar (not persisted).
+
+    The history already carries the still-forming bar during market hours, so the live
+    price replaces its close rather than opening a new bar.
+    """
+    state = advance(symbol, hist_data, interval)
+    if state is None:
+        return None
+    if live_price:
+        state = state.copy()
+        state.update(state.last_bar, live_price)
+    return state.values()
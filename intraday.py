@@ -0,0 +1,115 @@
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import perf
+import providers
+import resilience
+
+# Intraday bars (1m/5m/15m) for the Technicals tab and Deep Scan. Bars sit in one
+# process-wide cache shared by every session: each (symbol, interval) series keeps its
+# last few trading sessions, older sessions drop off as new ones arrive, and the least
+# recently used series is evicted past MAX_SERIES. Once a series is cached, a refresh
+# only asks Yahoo for the current session and merges it in.
+
+INTERVALS = {"1m": "5d", "5m": "1mo", "15m": "1mo"}  # Interval -> first-load lookback (Yahoo serves 1m for 7 days)
+KEEP_SESSIONS = {"1m": 5, "5m": 20, "15m": 20}
+REFRESH_SECONDS = {"1m": 60, "5m": 300, "15m": 900}  # One bar's worth
+MAX_SERIES = 64
+CHART_POINTS = 1500  # Per trace; a 5-session 1m chart is ~1,900 bars
+
+# NSE hours for Plotly rangebreaks, so charts skip nights and weekends
+RANGEBREAKS = [dict(bounds=["sat", "mon"]), dict(bounds=[15.5, 9.25], pattern="hour")]
+
+_AGG = {'Open': "first", 'High': "max", 'Low': "min", 'Close': "last", 'Volume': "sum"}
+
+
+class BarCache:
+    """LRU of intraday series: (yf_symbol, interval) -> (bars, fetched at)."""
+
+    def __init__(self, max_series=MAX_SERIES):
+        self.max_series = max_series
+        self.series = OrderedDict()
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self.series.get(key)
+            if entry is not None:
+                self.series.move_to_end(key)
+            return entry
+
+    def put(self, key, bars):
+        with self._lock:
+            self.series[key] = (bars, time.monotonic())
+            self.series.move_to_end(key)
+            while len(self.series) > self.max_series:
+                self.series.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self.series.clear()
+
+
+_cache = BarCache()
+
+
+def trim_sessions(bars, keep):
+    """Only the last `keep` trading sessions of a bar frame."""
+    sessions = bars.index.normalize().unique()
+    if len(sessions) <= keep:
+        return bars
+    return bars[bars.index >= sessions[-keep]]
+
+
+def merge(old, fresh):
+    # Bars in `fresh` win, including the still-forming last bar of `old`
+    if old is None or old.empty:
+        return fresh
+    if fresh.empty:
+        return old
+    return pd.concat([old[old.index < fresh.index[0]], fresh])
+
+
+@perf.instrument("intraday.refresh", "upstream")
+def _refresh(yf_symbol, interval, bars):
+    period = "1d" if bars is not None else INTERVALS[interval]
+    fresh = providers.get_provider().history(yf_symbol, period=period, interval=interval)
+    return trim_sessions(merge(bars, fresh.dropna(subset=['Close'])), KEEP_SESSIONS[interval])
+
+
+def get_bars(yf_symbol, interval):
+    """OHLCV bars at a 1m/5m/15m interval over the last few sessions (a copy; add columns freely)."""
+    if interval not in INTERVALS:
+        raise ValueError(f"Unsupported intraday interval: {interval}")
+    key = (yf_symbol, interval)
+    entry = _cache.get(key)
+    fresh_enough = entry is not None and time.monotonic() - entry[1] < REFRESH_SECONDS[interval]
+    perf.record_cache("intraday.bars", hit=fresh_enough)
+    if fresh_enough:
+        return entry[0].copy()
+
+    old = entry[0] if entry is not None else None
+    try:
+        bars = _refresh(yf_symbol, interval, old)
+    except Exception as e:
+        # Keep serving the cached session while Yahoo is throttling or down
+        if old is None or not resilience.is_transient(e):
+            raise
+        return old.copy()
+    _cache.put(key, bars)
+    return bars.copy()
+
+
+def downsample(df, max_points=CHART_POINTS):
+    """At most `max_points` rows for charting: OHLCV aggregated per bucket, other columns take the last value."""
+    if len(df) <= max_points:
+        return df
+    step = -(-len(df) // max_points)
+    buckets = np.arange(len(df)) // step
+    out = df.groupby(buckets).agg({c: _AGG.get(c, "last") for c in df.columns})
+    out.index = df.index[::step]
+    return out
@@ -0,0 +1,125 @@
+import re
+import pandas as pd
+import metrics
+import store
+import utils as ut
+
+# Fund look-through: index funds are expanded into their index constituents so a stock
+# held directly and through, say, a Nifty 50 fund shows up once with its true exposure.
+#
+# Basket weights come from, in order:
+#   1. data/fund_holdings/<scheme_code>.csv  (symbol, weight in % of NAV; e.g. from the
+#      AMC's monthly portfolio disclosure). This also covers active funds.
+#   2. The NSE constituent list of the fund's index, weighted by market cap from the
+#      nightly symbol_metrics table (equal weights where a cap is not materialized yet).
+# Funds with neither stay as one "not looked through" line so totals still add up.
+
+HOLDINGS_DIR = store.DATA_DIR / "fund_holdings"
+UNMAPPED_SECTOR = "Funds (not looked through)"
+
+_INDEX_PATTERN = re.compile(r"NIFTY\s+(50|NEXT 50|MIDCAP 150|SMALLCAP 250|LARGEMIDCAP 250)\s+INDEX", re.IGNORECASE)
+
+
+def fund_index(fund_name):
+    """NSE index tracked by an index fund, from its name (None for active funds)."""
+    match = _INDEX_PATTERN.search(fund_name)
+    return f"NIFTY {match.group(1).upper()}" if match else None
+
+
+def _local_basket(scheme_code):
+    path = HOLDINGS_DIR / f"{scheme_code}.csv"
+    if not path.exists():
+        return None
+    df = pd.read_csv(path)
+    df.columns = [c.strip().lower() for c in df.columns]
+    basket = pd.DataFrame({'symbol': df['symbol'].str.strip().str.upper(), 'weight': df['weight'] / 100})
+    basket['industry'] = df['industry'] if 'industry' in df.columns else None
+    return basket
+
+
+def _index_basket(index_name):
+    constituents = ut.get_index_constituents(index_name)
+    basket = pd.DataFrame({
+        'symbol': constituents['Symbol'].values,
+        'industry': constituents['Industry'].values if 'Industry' in constituents.columns else None,
+    })
+    caps = metrics.read_all(basket['symbol']).set_index('symbol')['market_cap_cr']
+    cap = basket['symbol'].map(caps).astype("float64")
+    # Symbols without a materialized cap weigh in at the median (all equal when none are known)
+    cap = cap.fillna(cap.median() if cap.notna().any() else 1.0)
+    basket['weight'] = cap / cap.sum()
+    return basket
+
+
+def basket(fund_name, scheme_code, index_baskets=None):
+    """(symbol, weight, industry) frame for a fund, weights as fractions of its value; None if unknown.
+
+    Pass a dict as `index_baskets` to build each index's basket once across many funds.
+    """
+    local = _local_basket(scheme_code)
+    if local is not None:
+        return local
+    index_name = fund_index(fund_name)
+    if not index_name:
+        return None
+    if index_baskets is None:
+        return _index_basket(index_name)
+    if index_name not in index_baskets:
+        index_baskets[index_name] = _index_basket(index_name)
+    return index_baskets[index_name]
+
+
+def _direct_values(df_eq):
+    # Direct equity value per symbol (categorical symbols become plain strings)
+    if df_eq.empty:
+        return pd.Series(dtype="float64")
+    return df_eq.groupby(df_eq['tradingsymbol'].astype(str))['current_value'].sum()
+
+
+def exposure(df_eq, df_mf, funds, sector_map=None):
+    """Per-stock exposure across direct equity and looked-through funds.
+
+    Returns symbol, sector, direct, via_funds, total and weight_pct (of equity plus
+    fund value), largest first. Funds without a basket stay as one row each under
+    UNMAPPED_SECTOR.
+    """
+    sector_map = sector_map or {}
+    fund_value = df_mf.groupby('fund', observed=True)['current_value'].sum() if not df_mf.empty else pd.Series(dtype="float64")
+
+    # Kite fund names are matched case-insensitively against the curated scheme codes
+    codes = {name.upper(): code for name, code in funds.items()}
+    parts, unmapped, index_baskets = [], [], {}
+    for fund, value in fund_value.items():
+        code = codes.get(str(fund).upper())
+        fund_basket = basket(fund, code, index_baskets) if code is not None else None
+        if fund_basket is None or fund_basket.empty:
+            unmapped.append({'symbol': fund, 'sector': UNMAPPED_SECTOR, 'via_funds': value})
+            continue
+        parts.append(fund_basket.assign(via_funds=fund_basket['weight'] * value))
+        if fund_basket['weight'].sum() < 0.999:  # Cash and other assets left out of a disclosure
+            unmapped.append({'symbol': fund, 'sector': UNMAPPED_SECTOR, 'via_funds': value * (1 - fund_basket['weight'].sum())})
+
+    # One concat and one groupby for every fund, however many constituents
+    via = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=['symbol', 'industry', 'via_funds'])
+    industry = via.dropna(subset=['industry']).drop_duplicates('symbol').set_index('symbol')['industry']
+    via = via.groupby('symbol')['via_funds'].sum()
+
+    direct = _direct_values(df_eq)
+    df = pd.concat([direct.rename('direct'), via.rename('via_funds')], axis=1).fillna(0.0)
+    df.index.name = 'symbol'
+    df = df.reset_index()
+    df['sector'] = df['symbol'].map(sector_map).fillna(df['symbol'].map(industry)).fillna("Others")
+
+    if unmapped:
+        df = pd.concat([df, pd.DataFrame(unmapped).assign(direct=0.0)], ignore_index=True)
+    df['total'] = df['direct'] + df['via_funds']
+    grand_total = df['total'].sum()
+    df['weight_pct'] = df['total'] / grand_total * 100 if grand_total else 0.0
+    return df[['symbol', 'sector', 'direct', 'via_funds', 'total', 'weight_pct']].sort_values('total', ascending=False, ignore_index=True)
+
+
+def sector_exposure(df_exposure):
+    """Direct, via-fund and total value per sector, largest first."""
+    df = df_exposure.groupby('sector')[['direct', 'via_funds', 'total']].sum()
+    df['weight_pct'] = df['total'] / df['total'].sum() * 100
+    return df.sort_values('total', ascending=False).reset_index()
@@ -0,0 +1,163 @@
+"""Nightly materialization of per-symbol fundamentals and technicals into the local store.
+
+    python metrics.py                        # every supported index
+    python metrics.py --index "NIFTY 50"     # one universe
+
+Schedule it after the close (e.g. cron `30 19 * * 1-5 cd /path && python metrics.py`).
+Deep Scan, the Screener tabs and screen.py then read one indexed row per symbol
+(`symbol_metrics`, keyed by NSE symbol) instead of recomputing ratios and indicators;
+a missing or stale row is computed on demand and written through.
+"""
+import argparse
+import math
+import os
+import sys
+import time
+from datetime import datetime
+import pandas as pd
+import fetch
+import indicators
+import store
+import utils as ut
+
+MAX_AGE_HOURS = 36  # A nightly run plus slack for a missed night
+
+COLUMNS = [
+    'symbol', 'as_of', 'sector', 'market_cap_cr', 'trailing_pe', 'forward_pe', 'peg_ratio', 'price_to_book',
+    'roe_pct', 'roa_pct', 'profit_margin_pct', 'operating_margin_pct', 'revenue_growth_pct', 'earnings_growth_pct',
+    'debt_to_equity', 'dividend_yield', 'trailing_eps', 'beta',
+    'high_52w', 'low_52w', 'close', 'rsi', 'sma20', 'sma50', 'sma200', 'macd', 'macd_signal',
+    'pct_from_52w_high', 'score', 'recommendation', 'pros', 'cons',
+]
+
+
+def _num(value, scale=1):
+    """Float or None (Yahoo mixes None, NaN, strings like 'Infinity' and numbers)."""
+    try:
+        value = float(value) * scale
+    except (TypeError, ValueError):
+        return None
+    return value if math.isfinite(value) else None
+
+
+def compute(symbol):
+    """All derived metrics for an NSE symbol as a dict (None where data is missing)."""
+    yf_symbol = f"{symbol}.NS"
+    info = ut.get_ticker_info(yf_symbol)
+    hist_data = ut.get_ohlc_history(yf_symbol, "2y")
+
+    price_to_book = _num(info.get('priceToBook'))
+    if price_to_book is None and _num(info.get('bookValue')) and _num(info.get('currentPrice')):
+        price_to_book = info['currentPrice'] / info['bookValue']
+    row = {
+        'symbol': symbol,
+        'as_of': datetime.now().isoformat(timespec="seconds"),
+        'sector': info.get('sector'),
+        'market_cap_cr': _num(info.get('marketCap'), 1e-7),
+        'trailing_pe': _num(info.get('trailingPE')),
+        'forward_pe': _num(info.get('forwardPE')),
+        'peg_ratio': _num(info.get('pegRatio')),
+        'price_to_book': price_to_book,
+        'roe_pct': _num(info.get('returnOnEquity'), 100),
+        'roa_pct': _num(info.get('returnOnAssets'), 100),
+        'profit_margin_pct': _num(info.get('profitMargins'), 100),
+        'operating_margin_pct': _num(info.get('operatingMargins'), 100),
+        'revenue_growth_pct': _num(info.get('revenueGrowth'), 100),
+        'earnings_growth_pct': _num(info.get('earningsGrowth'), 100),
+        # debtToEquity comes as a percentage base (e.g. 40.0 for 0.4)
+        'debt_to_equity': _num(info.get('debtToEquity'), 0.01),
+        'dividend_yield': _num(info.get('dividendYield')),
+        'trailing_eps': _num(info.get('trailingEps')),
+        'beta': _num(info.get('beta')),
+        'high_52w': _num(info.get('fiftyTwoWeekHigh')),
+        'low_52w': _num(info.get('fiftyTwoWeekLow')),
+    }
+
+    if not hist_data.empty:
+        # Only the bars since the last run are folded into the stored indicator state
+        technicals = indicators.advance(symbol, hist_data).values()
+        row.update({k: _num(v) for k, v in technicals.items()})
+        if row['high_52w'] and row['close']:
+            row['pct_from_52w_high'] = (row['high_52w'] - row['close']) / row['high_52w'] * 100
+        if info:
+            pros, cons, score = ut.analyze_stock(info, hist_data, technicals)
+            row.update({'score': score, 'recommendation': ut.recommendation(score), 'pros': len(pros), 'cons': len(cons)})
+    return {c: row.get(c) for c in COLUMNS}
+
+
+def _complete(row):
+    # Rows built from an empty info dict or price history (e.g. while Yahoo throttles)
+    # are served to the caller but never persisted as the symbol's metrics
+    return row['score'] is not None
+
+
+def write(rows):
+    rows = [r for r in rows if _complete(r)]
+    placeholders = ",".join("?" * len(COLUMNS))
+    store.execute_many(
+        f"INSERT OR REPLACE INTO symbol_metrics ({','.join(COLUMNS)}) VALUES ({placeholders})",
+        [tuple(r[c] for c in COLUMNS) for r in rows]
+    )
+    return len(rows)
+
+
+def get(symbol, max_age_hours=MAX_AGE_HOURS):
+    """The materialized row for a symbol (primary-key lookup), or None when missing or stale."""
+    df = store.run_query("SELECT * FROM symbol_metrics WHERE symbol = ?", (symbol,))
+    if df.empty:
+        return None
+    row = df.iloc[0].to_dict()
+    if datetime.now() - datetime.fromisoformat(row['as_of']) > pd.Timedelta(hours=max_age_hours):
+        return None
+    return {k: (None if isinstance(v, float) and math.isnan(v) else v) for k, v in row.items()}
+
+
+def get_or_compute(symbol, max_age_hours=MAX_AGE_HOURS):
+    """Materialized metrics for a symbol, computing and storing them on a miss."""
+    row = get(symbol, max_age_hours)
+    if row is None:
+        row = compute(symbol)
+        write([row])
+    return row
+
+
+def read_all(symbols=None):
+    """Materialized rows as a DataFrame, best score first (optionally for some symbols)."""
+    if symbols is None:
+        return store.run_query("SELECT * FROM symbol_metrics ORDER BY score DESC")
+    symbols = list(symbols)
+    if not symbols:
+        return pd.DataFrame(columns=COLUMNS)
+    placeholders = ",".join("?" * len(symbols))
+    return store.run_query(f"SELECT * FROM symbol_metrics WHERE symbol IN ({placeholders}) ORDER BY score DESC", symbols)
+
+
+def materialize(symbols):
+    """Recomputes and stores metrics for every symbol concurrently; returns (stored, failed)."""
+    symbols = list(dict.fromkeys(symbols))
+    results = fetch.gather([lambda s=s: compute(s) for s in symbols], return_exceptions=True)
+    rows = [r for r in results if not isinstance(r, Exception)]
+    stored = write(rows)
+    return stored, len(symbols) - stored
+
+
+def main(argv=None):
+    import screen
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--index", action="append", choices=screen.INDICES,
+                        help="universe to materialize (repeatable; default every supported index)")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("HUB_PROVIDER", "cached")  # Read on the first provider call
+    started = time.perf_counter()
+    symbols = []
+    for index_name in args.index or screen.INDICES:
+        symbols += list((ut.get_index_tickers(index_name) or {}).keys())
+    stored, failed = materialize(symbols)
+    print(f"Materialized {stored} of {stored + failed} symbols in {time.perf_counter() - started:.1f}s -> {store.DB_PATH}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,16 +1,21 @@
 import textwrap
 import streamlit as st
 import pandas as pd
-import plotly.express as px
+import numpy as np
 from datetime import datetime, time, timedelta
-import yfinance as yf
-import plotly.graph_objects as go
-import requests
-from dateutil.relativedelta import relativedelta
-from ta.momentum import RSIIndicator
-from ta.trend import SMAIndicator
 from styles import apply_custom_css  # Import the style function
 import utils as ut 
+import charts
+import holdings as hd
+import intraday
+import lookthrough
+import risk
+import history
+import metrics
+import snapshots
+import swr
+import sip
+import perf
 
 
 # 1. Your curated dictionary of scheme codes
@@ -31,6 +36,7 @@ MY_FUNDS = {
 
 # Page Config
 st.set_page_config(page_title="Kite Portfolio Dashboard", page_icon="💰", layout="wide")
+perf.begin_run("dashboard")
 
 # 2. Apply the CSS from our separate file
 apply_custom_css()
@@ -48,17 +54,46 @@ simulation_pct = ut.handle_what_if_sidebar()
 
 # 2. Main Page Content
 if st.session_state.get("authenticated"):
+    # Charting libraries load on the first authenticated render, not on the login screen
+    import plotly.express as px
+    import plotly.graph_objects as go
+
     try:
         if "kite" in st.session_state:
             kite_session = st.session_state.kite
             
             # --- STEP 2: ACCOUNT DETAILS LOGIC ---
-            with st.spinner("🔄 Fetching Holdings & Profile..."):
-                # Data Fetching
-                user_profile = kite_session.profile()
-                holdings = kite_session.holdings()
-                mf_holdings = kite_session.mf_holdings()
-                mf_sips = kite_session.mf_sips() 
+            # Stale-while-revalidate: render this account's last journaled snapshot immediately
+            # and let a background thread refresh Kite data (live fetches are journaled too).
+            # An account with no snapshot yet waits for the broker below, never another account's.
+            refreshing_versions = {}
+            kite_user_id = st.session_state.get("kite_user_id")
+            kite_key = swr.session_key("kite", getattr(kite_session, "access_token", None) or f"offline:{kite_user_id}")
+            kite_entry = swr.revalidate(
+                kite_key,
+                fetch_fn=lambda: snapshots.fetch_payloads(kite_session),
+                fallback_fn=lambda: snapshots.load_latest_payloads(kite_user_id),
+                max_age=300
+            )
+            if kite_entry.value is None:
+                # First ever load: nothing journaled yet, so wait for the broker once
+                with st.spinner("🔄 Fetching Holdings & Profile..."):
+                    kite_entry.wait(timeout=60)
+            if kite_entry.value is None:
+                raise RuntimeError(kite_entry.error or "Timed out fetching holdings from Kite.")
+            if kite_entry.refreshing:
+                refreshing_versions[kite_key] = kite_entry.version
+
+            with st.container():
+                # Data Fetching (the version doubles as the snapshot id for memoized sections)
+                snapshot_id = (kite_key, kite_entry.version)
+                payloads = kite_entry.value
+                user_profile = payloads["profile"]
+                holdings = payloads["holdings"]
+                mf_holdings = payloads["mf_holdings"]
+                mf_sips = payloads["mf_sips"]
+
+                ut.show_freshness_badge(kite_entry, label="Holdings")
 
                 # We use a single markdown block to keep the HTML structure intact
                 st.markdown(f"""
@@ -85,28 +120,30 @@ if st.session_state.get("authenticated"):
                 </div>
                 """, unsafe_allow_html=True)
 
-                # --- STEP A: PREPARE DATAFRAMES & SIMULATION ---
-                multiplier = 1 + (simulation_pct / 100)
-                
-                df_eq = pd.DataFrame(holdings) if holdings else pd.DataFrame()
-                df_mf = pd.DataFrame(mf_holdings) if mf_holdings else pd.DataFrame()
+                # --- WHAT CHANGED SINCE YESTERDAY (Snapshot Journal Diff) ---
+                diff_expander = ut.lazy_expander("🕑 What changed since yesterday", key="snapshot_diff_expander")
+                if ut.is_open(diff_expander):
+                    with diff_expander, perf.timed("render.snapshot_diff"):
+                        start_of_today = datetime.now().date()
+                        diff_labels = {"holdings": "Equity Holdings", "mf_holdings": "Mutual Fund Holdings", "mf_sips": "SIP Mandates"}
+                        any_change = False
+                        for kind, label in diff_labels.items():
+                            df_diff = snapshots.diff_snapshots(kind, user_profile['user_id'], start_of_today)
+                            if not df_diff.empty:
+                                any_change = True
+                                st.markdown(f"**{label}**")
+                                st.dataframe(df_diff, hide_index=True, use_container_width=True)
+                        if not any_change:
+                            st.caption("No changes to quantities, prices paid or SIP mandates since yesterday.")
 
-                if not df_eq.empty:
-                    df_eq['invested_value'] = df_eq['quantity'] * df_eq['average_price']
-                    # Apply simulation to current value
-                    df_eq['current_value'] = (df_eq['quantity'] * df_eq['last_price']) * multiplier
+                # --- STEP A: PREPARE DATAFRAMES & SIMULATION ---
+                df_eq, df_mf = ut.prepare_holdings_frames(holdings, mf_holdings, simulation_pct)
 
-                if not df_mf.empty:
-                    df_mf['invested_value'] = df_mf['quantity'] * df_mf['average_price']
-                    # Apply simulation to current value
-                    df_mf['current_value'] = (df_mf['quantity'] * df_mf['last_price']) * multiplier
+                # --- PRICE ALERTS (re-evaluated on every Market Watch tick) ---
+                ut.watch_alerts(tuple(df_eq['tradingsymbol'].astype(str).unique()))
 
                 # --- NEW: INSERT TOTAL SUMMARY HERE ---
-                total_inv_combined = (df_eq['invested_value'].sum() if not df_eq.empty else 0) + \
-                                     (df_mf['invested_value'].sum() if not df_mf.empty else 0)
-
-                total_curr_combined = (df_eq['current_value'].sum() if not df_eq.empty else 0) + \
-                                      (df_mf['current_value'].sum() if not df_mf.empty else 0)
+                total_inv_combined, total_curr_combined = ut.portfolio_totals(df_eq, df_mf)
 
                 total_pnl_combined = total_curr_combined - total_inv_combined
                 total_pnl_pct_combined = (total_pnl_combined / total_inv_combined * 100) if total_inv_combined != 0 else 0
@@ -162,23 +199,27 @@ if st.session_state.get("authenticated"):
                 viz_col1, viz_col2 = st.columns([1, 1.2]) # Give the Treemap slightly more room
 
                 with viz_col1:
-                    fig_asset = px.pie(
-                        names=["Equity", "Mutual Funds"], 
-                        values=[total_eq_val, total_mf_val], 
-                        hole=0.6, 
-                        color_discrete_sequence=['#4e73df', '#22c55e'] # Clean Blue and Green
-                    )
-                    # Professional Plotly Styling
-                    fig_asset.update_traces(customdata=hover_values, textinfo='percent+label', pull=[0.05, 0],
-                                            hovertemplate="<b>%{label}</b><br>Value: ₹%{customdata}<extra></extra>")
-                    fig_asset.update_layout(
-                        showlegend=False,
-                        margin=dict(t=10, b=10, l=10, r=10),
-                        paper_bgcolor='rgba(0,0,0,0)',
-                        plot_bgcolor='rgba(0,0,0,0)',
-                        annotations=[dict(text=f'<span style="font-size:13px;color:#858796;">Total</span><br><b>₹{grand_total/100000:.1f}L</b>', x=0.5, y=0.5, font_size=18, showarrow=False)]
-                    )
-                    st.plotly_chart(fig_asset, use_container_width=True)
+                    def build_asset_fig():
+                        fig_asset = px.pie(
+                            names=["Equity", "Mutual Funds"], 
+                            values=[total_eq_val, total_mf_val], 
+                            hole=0.6, 
+                            color_discrete_sequence=['#4e73df', '#22c55e'] # Clean Blue and Green
+                        )
+                        # Professional Plotly Styling
+                        fig_asset.update_traces(customdata=hover_values, textinfo='percent+label', pull=[0.05, 0],
+                                                hovertemplate="<b>%{label}</b><br>Value: ₹%{customdata}<extra></extra>")
+                        fig_asset.update_layout(
+                            showlegend=False,
+                            margin=dict(t=10, b=10, l=10, r=10),
+                            paper_bgcolor='rgba(0,0,0,0)',
+                            plot_bgcolor='rgba(0,0,0,0)',
+                            annotations=[dict(text=f'<span style="font-size:13px;color:#858796;">Total</span><br><b>₹{grand_total/100000:.1f}L</b>', x=0.5, y=0.5, font_size=18, showarrow=False)]
+                        )
+                        return fig_asset
+
+                    # Rebuilt only when the totals change
+                    st.plotly_chart(charts.memo_figure("asset_allocation", build_asset_fig, total_eq_val, total_mf_val), use_container_width=True)
                     st.markdown('</div>', unsafe_allow_html=True)
 
                 with viz_col2:
@@ -190,12 +231,12 @@ if st.session_state.get("authenticated"):
                     )
 
                     if view_option == "Equity":
-                        df_top_10 = df_eq[['tradingsymbol', 'current_value']].rename(columns={'tradingsymbol': 'Name'}) if not df_eq.empty else pd.DataFrame()
+                        df_top_10 = hd.view(df_eq, ['tradingsymbol', 'current_value'], rename={'tradingsymbol': 'Name'}) if not df_eq.empty else pd.DataFrame()
                     elif view_option == "Mutual Funds":
-                        df_top_10 = df_mf[['fund', 'current_value']].rename(columns={'fund': 'Name'}) if not df_mf.empty else pd.DataFrame()
+                        df_top_10 = hd.view(df_mf, ['fund', 'current_value'], rename={'fund': 'Name'}) if not df_mf.empty else pd.DataFrame()
                     else:
-                        df_eq_sub = df_eq[['tradingsymbol', 'current_value']].rename(columns={'tradingsymbol': 'Name'}) if not df_eq.empty else pd.DataFrame()
-                        df_mf_sub = df_mf[['fund', 'current_value']].rename(columns={'fund': 'Name'}) if not df_mf.empty else pd.DataFrame()
+                        df_eq_sub = hd.view(df_eq, ['tradingsymbol', 'current_value'], rename={'tradingsymbol': 'Name'}) if not df_eq.empty else pd.DataFrame()
+                        df_mf_sub = hd.view(df_mf, ['fund', 'current_value'], rename={'fund': 'Name'}) if not df_mf.empty else pd.DataFrame()
                         df_top_10 = pd.concat([df_eq_sub, df_mf_sub])
 
                     # --- WITHIN viz_col2 ---
@@ -210,884 +251,1085 @@ if st.session_state.get("authenticated"):
                         # This keeps the Indian comma placement (e.g., 32,06,945)
                         df_top_10['formatted_val_0d'] = df_top_10['current_value'].apply(lambda x: ut.format_indian_currency(x).split('.')[0])
 
-                        fig_tree = px.treemap(
-                            df_top_10, 
-                            path=[px.Constant("Top 10 Holdings"), 'Display_Name'], 
-                            values='current_value',
-                            color='current_value',
-                            color_continuous_scale='Blues',
-                            custom_data=['formatted_val_0d'] # Pass the 0-decimal string
-                        )
+                        def build_tree_fig():
+                            fig_tree = px.treemap(
+                                df_top_10, 
+                                path=[px.Constant("Top 10 Holdings"), 'Display_Name'], 
+                                values='current_value',
+                                color='current_value',
+                                color_continuous_scale='Blues',
+                                custom_data=['formatted_val_0d'] # Pass the 0-decimal string
+                            )
                         
-                        fig_tree.update_traces(
-                            # Labels on the Treemap boxes
-                            texttemplate="<b>%{label}</b><br>₹%{customdata[0]}", 
-                            textposition="middle center",
-                            textfont_size=14,
-                            # Hover tooltip (now also 0 decimals)
-                            hovertemplate="<b>%{label}</b><br>Value: ₹%{customdata[0]}<extra></extra>"
-                        )
+                            fig_tree.update_traces(
+                                # Labels on the Treemap boxes
+                                texttemplate="<b>%{label}</b><br>₹%{customdata[0]}", 
+                                textposition="middle center",
+                                textfont_size=14,
+                                # Hover tooltip (now also 0 decimals)
+                                hovertemplate="<b>%{label}</b><br>Value: ₹%{customdata[0]}<extra></extra>"
+                            )
                         
-                        fig_tree.update_layout(
-                            margin=dict(t=0, l=0, r=0, b=0),
+                            fig_tree.update_layout(
+                                margin=dict(t=0, l=0, r=0, b=0),
+                                paper_bgcolor='rgba(0,0,0,0)',
+                                coloraxis_showscale=False
+                            )
+                            return fig_tree
+
+                        st.plotly_chart(charts.memo_figure("top_10_treemap", build_tree_fig, df_top_10), use_container_width=True)
+                    else:
+                        st.info(f"No {view_option} data available.")
+
+                st.write("<br>", unsafe_allow_html=True)
+
+                # --- STEP 3: PORTFOLIO VALUE HISTORY ---
+                st.markdown("### 📈 Portfolio Value History")
+                try:
+                    df_value_hist = ut.memo_per_snapshot(
+                        "value_history", snapshot_id,
+                        lambda: history.build_value_history(df_eq, df_mf, MY_FUNDS, user_profile['user_id'])
+                    )
+                    if len(df_value_hist) > 1:
+                        fig_value = go.Figure()
+                        fig_value.add_trace(go.Scatter(
+                            x=df_value_hist.index, y=df_value_hist['value'],
+                            name="Portfolio", line=dict(color='#4e73df', width=2.5),
+                            fill='tozeroy', fillcolor='rgba(78, 115, 223, 0.08)',
+                            hovertemplate="<b>%{x|%d %b %Y}</b><br>Portfolio: ₹%{y:,.0f}<extra></extra>"
+                        ))
+                        fig_value.add_trace(go.Scatter(
+                            x=df_value_hist.index, y=history.rebase_benchmark(df_value_hist),
+                            name="Nifty 50 (Rebased)", line=dict(color='#f6c23e', width=1.5, dash='dot'),
+                            hovertemplate="Nifty 50: ₹%{y:,.0f}<extra></extra>"
+                        ))
+                        fig_value.update_layout(
+                            hovermode="x unified",
+                            height=380,
+                            margin=dict(t=10, l=10, r=40, b=10),
+                            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
                             paper_bgcolor='rgba(0,0,0,0)',
-                            coloraxis_showscale=False
+                            plot_bgcolor='rgba(0,0,0,0)',
+                            xaxis=dict(showgrid=False, title=None),
+                            yaxis=dict(showgrid=True, gridcolor="rgba(255,255,255,0.05)", side="right", tickprefix="₹", zeroline=False)
                         )
-                        st.plotly_chart(fig_tree, use_container_width=True)
+                        st.plotly_chart(charts.downsample_figure(fig_value), use_container_width=True)
+                        st.caption("Reconstructed at current quantities from cached daily prices and NAVs.")
                     else:
-                        st.info(f"No {view_option} data available.")
+                        st.info("Not enough price history yet to chart portfolio value.")
+                except Exception as e:
+                    st.warning(f"Portfolio history unavailable: {e}")
 
                 st.write("<br>", unsafe_allow_html=True)
 
-            tab1, tab2, tab3 = st.tabs([
-            "💎 EQUITY ASSETS", 
-            "🧺 MUTUAL FUNDS", 
-            "⏱️ SIP TRACKER"
-        ])
-
-            with tab1:
-                if not df_eq.empty:
-                    # Calculations for Tab 1 (already simulated in Step A)
-                    df_eq['pnl'] = df_eq['current_value'] - df_eq['invested_value']
-                    df_eq['pnl_pct'] = (df_eq['pnl'] / df_eq['invested_value']) * 100
-                    df_eq = df_eq.sort_values(by='current_value', ascending=False).reset_index(drop=True)
-                    df_eq.index = df_eq.index + 1
+            # Lazy tabs: only the active tab's body executes on a rerun
+            tab1, tab2, tab3, tab4 = ut.lazy_tabs([
+                "💎 EQUITY ASSETS",
+                "🧺 MUTUAL FUNDS",
+                "⏱️ SIP TRACKER",
+                "🛡️ RISK LAB"
+            ], key="dashboard_tabs")
+
+            if ut.is_open(tab1):
+                with tab1, perf.timed("render.tab.equity"):
+                    if not df_eq.empty:
+                        # Calculations for Tab 1 (already simulated in Step A)
+                        df_eq['pnl'] = df_eq['current_value'] - df_eq['invested_value']
+                        df_eq['pnl_pct'] = (df_eq['pnl'] / df_eq['invested_value']) * 100
+                        df_eq = df_eq.sort_values(by='current_value', ascending=False).reset_index(drop=True)
+                        df_eq.index = df_eq.index + 1
                     
-                    # --- EQUITY CALCULATIONS ---
-                    total_inv_eq = df_eq['invested_value'].sum()
-                    current_val_eq = df_eq['current_value'].sum()
-                    total_pnl_eq = current_val_eq - total_inv_eq
-                    total_pnl_pct = (total_pnl_eq / total_inv_eq) * 100 if total_inv_eq != 0 else 0
-
-                    # --- PREPARE FORMATTED STRINGS ---
-                    fmt_inv_eq = ut.format_indian_currency(total_inv_eq)
-                    fmt_curr_eq = ut.format_indian_currency(current_val_eq)
-                    fmt_pnl_eq = ut.format_indian_currency(total_pnl_eq)
-
-                    eq_pnl_class = "pnl-positive" if total_pnl_eq >= 0 else "pnl-negative"
-                    sim_glow = "border: 1px solid #f6c23e;" if simulation_pct != 0 else "border: 1px solid rgba(78,115,223,0.1);"
-                    curr_label_eq = "Current Value" if simulation_pct == 0 else f"Simulated ({simulation_pct:+.0f}%)"
-
-                    # --- RENDER EQUITY HTML ---
-                    equity_html = f"""
-                    <div style="display: flex; gap: 15px; margin-bottom: 25px; flex-wrap: wrap; width: 100%;">
-                        <div style="flex: 1; min-width: 200px; background: rgba(255,255,255,0.02); border: 1px solid rgba(78,115,223,0.1); padding: 15px; border-radius: 12px;">
-                            <p style="font-size: 0.75rem; color: #858796; margin: 0; text-transform: uppercase;">Equity Investment</p>
-                            <p style="font-size: 1.4rem; font-weight: 700; margin: 5px 0 0 0;">₹{fmt_inv_eq}</p>
-                        </div>
-                        <div style="flex: 1; min-width: 200px; background: rgba(255,255,255,0.02); {sim_glow} padding: 15px; border-radius: 12px;">
-                            <p style="font-size: 0.75rem; color: #858796; margin: 0; text-transform: uppercase;">{curr_label_eq}</p>
-                            <p style="font-size: 1.4rem; font-weight: 700; margin: 5px 0 0 0; color: #4e73df;">₹{fmt_curr_eq}</p>
-                        </div>
-                        <div style="flex: 1; min-width: 200px; background: rgba(255,255,255,0.02); border: 1px solid rgba(78,115,223,0.1); padding: 15px; border-radius: 12px;">
-                            <p style="font-size: 0.75rem; color: #858796; margin: 0; text-transform: uppercase;">Total Equity P&L</p>
-                            <div style="display: flex; align-items: baseline; gap: 8px; margin-top: 5px;">
-                                <span style="font-size: 1.4rem; font-weight: 700;" class="{eq_pnl_class}">₹{fmt_pnl_eq}</span>
-                                <span style="font-size: 0.85rem; font-weight: 600; background: rgba(0,0,0,0.05); padding: 2px 8px; border-radius: 10px;" class="{eq_pnl_class}">{total_pnl_pct:+.2f}%</span>
+                        # --- EQUITY CALCULATIONS ---
+                        total_inv_eq = df_eq['invested_value'].sum()
+                        current_val_eq = df_eq['current_value'].sum()
+                        total_pnl_eq = current_val_eq - total_inv_eq
+                        total_pnl_pct = (total_pnl_eq / total_inv_eq) * 100 if total_inv_eq != 0 else 0
+
+                        # --- PREPARE FORMATTED STRINGS ---
+                        fmt_inv_eq = ut.format_indian_currency(total_inv_eq)
+                        fmt_curr_eq = ut.format_indian_currency(current_val_eq)
+                        fmt_pnl_eq = ut.format_indian_currency(total_pnl_eq)
+
+                        eq_pnl_class = "pnl-positive" if total_pnl_eq >= 0 else "pnl-negative"
+                        sim_glow = "border: 1px solid #f6c23e;" if simulation_pct != 0 else "border: 1px solid rgba(78,115,223,0.1);"
+                        curr_label_eq = "Current Value" if simulation_pct == 0 else f"Simulated ({simulation_pct:+.0f}%)"
+
+                        # --- RENDER EQUITY HTML ---
+                        equity_html = f"""
+                        <div style="display: flex; gap: 15px; margin-bottom: 25px; flex-wrap: wrap; width: 100%;">
+                            <div style="flex: 1; min-width: 200px; background: rgba(255,255,255,0.02); border: 1px solid rgba(78,115,223,0.1); padding: 15px; border-radius: 12px;">
+                                <p style="font-size: 0.75rem; color: #858796; margin: 0; text-transform: uppercase;">Equity Investment</p>
+                                <p style="font-size: 1.4rem; font-weight: 700; margin: 5px 0 0 0;">₹{fmt_inv_eq}</p>
+                            </div>
+                            <div style="flex: 1; min-width: 200px; background: rgba(255,255,255,0.02); {sim_glow} padding: 15px; border-radius: 12px;">
+                                <p style="font-size: 0.75rem; color: #858796; margin: 0; text-transform: uppercase;">{curr_label_eq}</p>
+                                <p style="font-size: 1.4rem; font-weight: 700; margin: 5px 0 0 0; color: #4e73df;">₹{fmt_curr_eq}</p>
+                            </div>
+                            <div style="flex: 1; min-width: 200px; background: rgba(255,255,255,0.02); border: 1px solid rgba(78,115,223,0.1); padding: 15px; border-radius: 12px;">
+                                <p style="font-size: 0.75rem; color: #858796; margin: 0; text-transform: uppercase;">Total Equity P&L</p>
+                                <div style="display: flex; align-items: baseline; gap: 8px; margin-top: 5px;">
+                                    <span style="font-size: 1.4rem; font-weight: 700;" class="{eq_pnl_class}">₹{fmt_pnl_eq}</span>
+                                    <span style="font-size: 0.85rem; font-weight: 600; background: rgba(0,0,0,0.05); padding: 2px 8px; border-radius: 10px;" class="{eq_pnl_class}">{total_pnl_pct:+.2f}%</span>
+                                </div>
                             </div>
                         </div>
-                    </div>
-                    """
-
-                    st.markdown(equity_html, unsafe_allow_html=True)
-
-                    # --- ADD THIS BEFORE SECTORAL ANALYSIS IN TAB 1 ---
-                    st.markdown("### 📋 Detailed Equity Holdings")
-
-                    # 1. Prepare and Clean Data
-                    df_holdings = df_eq.copy()
-                    df_holdings = df_holdings[['tradingsymbol', 'quantity', 'average_price', 'last_price', 'invested_value', 'current_value']]
-
-                    # Calculations
-                    df_holdings['P&L'] = df_holdings['current_value'] - df_holdings['invested_value']
-                    df_holdings['P&L %'] = (df_holdings['P&L'] / df_holdings['invested_value']) * 100
-                    df_holdings['Weight %'] = (df_holdings['current_value'] / df_holdings['current_value'].sum()) * 100
-
-                    # Sort by highest current value
-                    df_holdings = df_holdings.sort_values(by='current_value', ascending=False).reset_index(drop=True)
-
-                    # 2. Rename columns for display
-                    rename_map = {
-                        'tradingsymbol': 'Stock', 'quantity': 'Qty', 'average_price': 'Avg Price',
-                        'last_price': 'LTP', 'invested_value': 'Invested', 'current_value': 'Current',
-                        'P&L': 'P&L', 'P&L %': 'P&L %', 'Weight %': 'Weight %'
-                    }
-                    df_display = df_holdings.rename(columns=rename_map)
-
-                    # 3. Create formatting lambdas for 0 decimals and 2 decimals
-                    # format_indian_currency is the function we created earlier
-                    fmt_0d = lambda x: f"₹{ut.format_indian_currency(x).split('.')[0]}"
-                    fmt_2d = lambda x: f"₹{ut.format_indian_currency(x)}"
-                    fmt_qty = lambda x: ut.format_indian_currency(x).split('.')[0] # No ₹ for quantity
-
-                    # 4. Create the Styled Object
-                    styled_final = df_display.style.applymap(ut.color_values, subset=['P&L', 'P&L %']) \
-                        .format({
-                            'Qty': fmt_qty,
-                            'Avg Price': fmt_2d,
-                            'LTP': fmt_2d,
-                            'Invested': fmt_0d,
-                            'Current': fmt_0d,
-                            'P&L': fmt_0d,
-                            'P&L %': '{:+.2f}%',
-                            'Weight %': '{:.1f}%'
-                        })
-
-                    # 6. Render
-                    html = ut.apply_holdings_style(styled_final).hide(axis='index').to_html()
-                    st.markdown(html, unsafe_allow_html=True)
-                    st.write("<br>", unsafe_allow_html=True)
-
-                    #Sector-wise Allocation sunburnt chart
-                    st.markdown("### 🏭 Sectoral Exposure & Summary")
-
-                    with st.spinner("Analyzing Sectoral Weights..."):
-                        # 1. Fetch Sector Info and Build Data
-                        sector_map = ut.get_sector_info(df_eq['tradingsymbol'].tolist())
-                        df_sector_full = df_eq.copy()
-                        df_sector_full['Sector'] = df_sector_full['tradingsymbol'].map(sector_map)
-                        
-                        # Pre-calculate formatted strings for Sunburst hover (0 decimals)
-                        df_sector_full['fmt_current_val'] = df_sector_full['current_value'].apply(
-                            lambda x: ut.format_indian_currency(x).split('.')[0]
-                        )
+                        """
 
-                        # Aggregate Summary
-                        df_sector_summary = df_sector_full.groupby('Sector').agg({
-                            'invested_value': 'sum',
-                            'current_value': 'sum'
-                        }).reset_index()
-                        
-                        df_sector_summary['P&L'] = df_sector_summary['current_value'] - df_sector_summary['invested_value']
-                        df_sector_summary['Weight %'] = (df_sector_summary['current_value'] / df_sector_summary['current_value'].sum()) * 100
-                        df_sector_summary = df_sector_summary.sort_values(by='current_value', ascending=False)
+                        st.markdown(equity_html, unsafe_allow_html=True)
 
-                        # UI Layout
-                        col_chart, col_table = st.columns([1.2, 1])
+                        # --- ADD THIS BEFORE SECTORAL ANALYSIS IN TAB 1 ---
+                        st.markdown("### 📋 Detailed Equity Holdings")
 
-                        with col_chart:
-                            # 1. Create a dictionary that maps BOTH Sector names and Stock names to their Indian-formatted values
-                            # This ensures Plotly has a value for every 'label' it encounters in the sunburst path
-                            sector_totals = df_sector_full.groupby('Sector')['current_value'].sum().to_dict()
-                            stock_values = df_sector_full.set_index('tradingsymbol')['current_value'].to_dict()
-
-                            # Merge them into one lookup dictionary
-                            all_label_values = {**sector_totals, **stock_values}
-
-                            # 2. Create the custom data list based on the actual path used in the chart
-                            # We need to format the values to 0 decimals for the inner labels
-                            df_sector_full['fmt_val_0d'] = df_sector_full['current_value'].apply(lambda x: ut.format_indian_currency(x).split('.')[0])
-
-                            fig_sect = px.sunburst(
-                                df_sector_full, 
-                                path=['Sector', 'tradingsymbol'], 
-                                values='current_value',
-                                height=450,
-                                color='Sector',
-                                color_discrete_sequence=px.colors.qualitative.Prism
-                            )
+                        html = ut.equity_holdings_html(df_eq)
+                        st.markdown(html, unsafe_allow_html=True)
+                        st.write("<br>", unsafe_allow_html=True)
 
-                            # 3. Use a Lambda/Function in update_traces to pull from our mapped totals
-                            # This replaces the '?' by manually providing the text for each slice
-                            formatted_labels = []
-                            for i, row in df_sector_full.iterrows():
-                                # Plotly's sunburst can be tricky with customdata on hierarchies. 
-                                # A more robust way is to set 'text' directly.
-                                pass
-
-                            # Easiest Fix: Update the traces to use the 'value' but override the formatting
-                            fig_sect.update_traces(
-                                # Internal text: label name + the value formatted with commas and 0 decimals
-                                texttemplate="<b>%{label}</b><br>₹%{value:,.0f}",
+                        #Sector-wise Allocation sunburnt chart
+                        st.markdown("### 🏭 Sectoral Exposure & Summary")
+
+                        with st.container():
+                            # 1. Fetch Sector Info (background refresh; unknown sectors show as pending)
+                            sector_symbols = sorted(df_eq['tradingsymbol'].unique().tolist())
+                            sector_key = swr.session_key("sectors", ",".join(sector_symbols))
+                            sector_entry = swr.revalidate(sector_key, fetch_fn=lambda: ut.fetch_sector_info(sector_symbols), max_age=86400)
+                            if sector_entry.refreshing:
+                                refreshing_versions[sector_key] = sector_entry.version
+                            sector_map = sector_entry.value or {}
+
+                            df_sector_full, df_sector_summary = ut.build_sector_frames(df_eq, sector_map, missing_label="Loading…")
+                            if sector_entry.value is None:
+                                st.caption("🕑 Sector classification is loading in the background…")
+
+                            # UI Layout
+                            col_chart, col_table = st.columns([1.2, 1])
+
+                            with col_chart:
+                                # Rebuilt only when the holdings or their sectors change
+                                def build_sector_fig():
+                                    # 1. Create a dictionary that maps BOTH Sector names and Stock names to their Indian-formatted values
+                                    # This ensures Plotly has a value for every 'label' it encounters in the sunburst path
+                                    sector_totals = df_sector_full.groupby('Sector')['current_value'].sum().to_dict()
+                                    stock_values = df_sector_full.set_index('tradingsymbol')['current_value'].to_dict()
+
+                                    # Merge them into one lookup dictionary
+                                    all_label_values = {**sector_totals, **stock_values}
+
+                                    # 2. Create the custom data list based on the actual path used in the chart
+                                    # We need to format the values to 0 decimals for the inner labels
+                                    df_sector_full['fmt_val_0d'] = df_sector_full['current_value'].apply(lambda x: ut.format_indian_currency(x).split('.')[0])
+
+                                    fig_sect = px.sunburst(
+                                        df_sector_full, 
+                                        path=['Sector', 'tradingsymbol'], 
+                                        values='current_value',
+                                        height=450,
+                                        color='Sector',
+                                        color_discrete_sequence=px.colors.qualitative.Prism
+                                    )
+
+                                    # 3. Use a Lambda/Function in update_traces to pull from our mapped totals
+                                    # This replaces the '?' by manually providing the text for each slice
+                                    formatted_labels = []
+                                    for i, row in df_sector_full.iterrows():
+                                        # Plotly's sunburst can be tricky with customdata on hierarchies. 
+                                        # A more robust way is to set 'text' directly.
+                                        pass
+
+                                    # Easiest Fix: Update the traces to use the 'value' but override the formatting
+                                    fig_sect.update_traces(
+                                        # Internal text: label name + the value formatted with commas and 0 decimals
+                                        texttemplate="<b>%{label}</b><br>₹%{value:,.0f}",
                                 
-                                # Hover text: Now uses %{value} to match the internal calculation
-                                hovertemplate="<b>%{label}</b><br>Value: ₹%{value:,.0f}<extra></extra>",
+                                        # Hover text: Now uses %{value} to match the internal calculation
+                                        hovertemplate="<b>%{label}</b><br>Value: ₹%{value:,.0f}<extra></extra>",
                                 
-                                textinfo="label+value",
-                                insidetextorientation='radial'
-                            )
+                                        textinfo="label+value",
+                                        insidetextorientation='radial'
+                                    )
                             
-                            fig_sect.update_layout(
-                                margin=dict(t=0, l=0, r=0, b=0),
-                                paper_bgcolor='rgba(0,0,0,0)',
-                                plot_bgcolor='rgba(0,0,0,0)',
-                                extendsunburstcolors=True,
-                                # IMPORTANT: This tells Plotly to use Indian grouping style (commas)
-                                # It changes the decimal and thousand separators globally for this chart
-                                separators='.,' 
-                            )
-                            st.plotly_chart(fig_sect, use_container_width=True)
-
-                        with col_table:
-                            df_clean = df_sector_summary.reset_index(drop=True)
-                            df_clean.columns = [col.replace('_', ' ').title() for col in df_clean.columns]
-
-                            # Define the Indian Numbering Lambda with 0 Decimals
-                            fmt_indian_0d = lambda x: f"₹{ut.format_indian_currency(x).split('.')[0]}"
-
-                            # Apply Professional Styling and Formatting
-                            styled_sector = df_clean.style.applymap(ut.color_pnl_custom, subset=['P&L']) \
-                                .format({
-                                    'Invested Value': fmt_indian_0d,
-                                    'Current Value': fmt_indian_0d,
-                                    'P&L': fmt_indian_0d,
-                                    'Weight %': '{:.0f}%' # Zero decimals for weight as requested
-                                })
-
-                            st.markdown("#### Sector Breakdown")
-                            html_sector = ut.apply_sector_style(styled_sector).hide(axis='index').to_html()
-                            st.markdown(html_sector, unsafe_allow_html=True)
-
-                    # --- STEP D: HISTORICAL PERFORMANCE & FUNDAMENTALS ---
-                    st.write("<br>", unsafe_allow_html=True)
-                    st.markdown("### 🛰️ Stock Deep Scan")
-
-                    # 1. Selection Header (Full width for stock selection)
-                    stock_list = sorted(df_eq['tradingsymbol'].unique().tolist())
-                    selected_stock = st.selectbox("Select stock to analyze:", stock_list, key="stock_selector_main")
-
-                    # 2. Fetch Data from yFinance
-                    yf_symbol = f"{selected_stock}.NS"
-                    ticker_obj = yf.Ticker(yf_symbol)
-
-                    with st.spinner(f"Analyzing {selected_stock}..."):
-                        info = ticker_obj.info
-
-                        # 2. Fetch all data points
-                        # (Existing data preparation logic remains the same)
-                        sector = info.get('sector', 'N/A')
-                        raw_mcap_cr = info.get('marketCap', 0) / 10**7
-                        mcap_val = f"₹{ut.format_indian_currency(raw_mcap_cr).split('.')[0]} Cr"
-                        pe_val = f"{info.get('trailingPE', 0):.2f}"
-                        pb_val = f"{info.get('priceToBook', 0):.2f}"
-                        roe_val = f"{info.get('returnOnEquity', 0) * 100:.2f}%"
-                        npm_val = f"{info.get('profitMargins', 0) * 100:.2f}%"
-                        de_val = f"{info.get('debtToEquity', 0)/100:.2f}"
-                        div_val = f"{info.get('dividendYield', 0) :.2f}%"
-
-                        # 3. Create Row 1
-                        col1, col2, col3, col4 = st.columns(4)
-                        col1.metric("SECTOR", sector)
-                        col2.metric("MARKET CAP", mcap_val)
-                        col3.metric("P/E RATIO", pe_val)
-                        col4.metric("P/B RATIO", pb_val)
-
-                        # 4. Create Row 2
-                        col5, col6, col7, col8 = st.columns(4)
-                        col5.metric("ROE", roe_val)
-                        col6.metric("PROFIT MARGIN", npm_val)
-                        col7.metric("DEBT TO EQUITY", de_val)
-                        col8.metric("DIV. YIELD", div_val)
-
+                                    fig_sect.update_layout(
+                                        margin=dict(t=0, l=0, r=0, b=0),
+                                        paper_bgcolor='rgba(0,0,0,0)',
+                                        plot_bgcolor='rgba(0,0,0,0)',
+                                        extendsunburstcolors=True,
+                                        # IMPORTANT: This tells Plotly to use Indian grouping style (commas)
+                                        # It changes the decimal and thousand separators globally for this chart
+                                        separators='.,' 
+                                    )
+                                    return fig_sect
+
+                                st.plotly_chart(charts.memo_figure("sector_sunburst", build_sector_fig, df_sector_full), use_container_width=True)
+
+                            with col_table:
+                                st.markdown("#### Sector Breakdown")
+                                html_sector = ut.sector_summary_html(df_sector_summary)
+                                st.markdown(html_sector, unsafe_allow_html=True)
+
+                        # --- LOOK-THROUGH: DIRECT EQUITY + STOCKS HELD VIA INDEX FUNDS ---
+                        lookthrough_expander = ut.lazy_expander("🔍 Look-through Exposure (Direct + Index Funds)", key="lookthrough_expander")
+                        if ut.is_open(lookthrough_expander):
+                            with lookthrough_expander, perf.timed("render.lookthrough"):
+                                try:
+                                    df_look = ut.memo_per_snapshot(
+                                        "lookthrough", (snapshot_id, simulation_pct, tuple(sorted(sector_map.items()))),
+                                        lambda: lookthrough.exposure(df_eq, df_mf, MY_FUNDS, sector_map)
+                                    )
+                                    col_stocks, col_sectors = st.columns([1.3, 1])
+                                    with col_stocks:
+                                        st.markdown("#### Top Stocks")
+                                        df_top = df_look.head(25).rename(columns={
+                                            'symbol': 'Stock', 'sector': 'Sector', 'direct': 'Direct',
+                                            'via_funds': 'Via Funds', 'total': 'Total', 'weight_pct': '% of Portfolio'
+                                        })
+                                        st.dataframe(
+                                            df_top.style.format({'Direct': "₹{:,.0f}", 'Via Funds': "₹{:,.0f}", 'Total': "₹{:,.0f}", '% of Portfolio': "{:.2f}%"}),
+                                            hide_index=True, use_container_width=True
+                                        )
+                                    with col_sectors:
+                                        st.markdown("#### By Sector")
+                                        df_look_sector = lookthrough.sector_exposure(df_look)[['sector', 'total', 'weight_pct']]
+                                        df_look_sector.columns = ['Sector', 'Total', '% of Portfolio']
+                                        st.dataframe(
+                                            df_look_sector.style.format({'Total': "₹{:,.0f}", '% of Portfolio': "{:.2f}%"}),
+                                            hide_index=True, use_container_width=True
+                                        )
+                                    st.caption(
+                                        "Index funds are expanded into their NSE constituents, weighted by market cap from the nightly metrics "
+                                        f"(equal weights until it has run). A CSV per scheme code in {lookthrough.HOLDINGS_DIR} overrides this "
+                                        "with the AMC's disclosed portfolio. Other funds are shown as one line each."
+                                    )
+                                except Exception as e:
+                                    st.error(f"Could not build the look-through view: {e}")
+
+                        # --- STEP D: HISTORICAL PERFORMANCE & FUNDAMENTALS ---
                         st.write("<br>", unsafe_allow_html=True)
-                        # --- NEW: TIME PERIOD TOGGLE (Between Fundamentals and Chart) ---
-
-                        # --- 2. DISPLAY BELOW CHART ---
-                        st.markdown("### 📈 Historical Price Analysis")
-                        time_period = st.radio(
-                            "Select Timeframe:",
-                            options=["1mo", "3mo", "6mo", "1y", "2y", "5y", "max"],
-                            index=3, # Default to '1y'
-                            horizontal=True,
-                            key="stock_time_toggle"
-                        )
+                        st.markdown("### 🛰️ Stock Deep Scan")
+
+                        # 1. Selection Header (Full width for stock selection)
+                        stock_list = sorted(df_eq['tradingsymbol'].unique().tolist())
+                        selected_stock = st.selectbox("Select stock to analyze:", stock_list, key="stock_selector_main")
+
+                        # 2. Fetch Data from yFinance
+                        yf_symbol = f"{selected_stock}.NS"
+
+                        with st.spinner(f"Analyzing {selected_stock}..."):
+                            # Warm every Deep Scan fetch in one concurrent round trip
+                            time_period_default = st.session_state.get("stock_time_toggle", "1y")
+                            ut.prefetch(
+                                lambda: metrics.get_or_compute(selected_stock),
+                                lambda: ut.get_ohlc_history(yf_symbol, time_period_default),
+                                lambda: ut.get_financials(yf_symbol),
+                                lambda: ut.get_financials(yf_symbol, quarterly=True)
+                            )
+                            m = metrics.get_or_compute(selected_stock)  # Now a single indexed lookup
+
+                            # 2. Fetch all data points (materialized nightly by metrics.py)
+                            sector = m['sector'] or 'N/A'
+                            raw_mcap_cr = m['market_cap_cr'] or 0
+                            mcap_val = f"₹{ut.format_indian_currency(raw_mcap_cr).split('.')[0]} Cr"
+                            pe_val = f"{m['trailing_pe'] or 0:.2f}"
+                            pb_val = f"{m['price_to_book'] or 0:.2f}"
+                            roe_val = f"{m['roe_pct'] or 0:.2f}%"
+                            npm_val = f"{m['profit_margin_pct'] or 0:.2f}%"
+                            de_val = f"{m['debt_to_equity'] or 0:.2f}"
+                            div_val = f"{m['dividend_yield'] or 0:.2f}%"
+
+                            # 3. Create Row 1
+                            col1, col2, col3, col4 = st.columns(4)
+                            col1.metric("SECTOR", sector)
+                            col2.metric("MARKET CAP", mcap_val)
+                            col3.metric("P/E RATIO", pe_val)
+                            col4.metric("P/B RATIO", pb_val)
+
+                            # 4. Create Row 2
+                            col5, col6, col7, col8 = st.columns(4)
+                            col5.metric("ROE", roe_val)
+                            col6.metric("PROFIT MARGIN", npm_val)
+                            col7.metric("DEBT TO EQUITY", de_val)
+                            col8.metric("DIV. YIELD", div_val)
 
-                        # --- 6. Historical Chart Logic ---
-                        hist_data = yf.download(yf_symbol, period=time_period, interval="1d", progress=False, auto_adjust=True)
+                            st.write("<br>", unsafe_allow_html=True)
+                            # --- NEW: TIME PERIOD TOGGLE (Between Fundamentals and Chart) ---
+
+                            # --- 2. DISPLAY BELOW CHART ---
+                            st.markdown("### 📈 Historical Price Analysis")
+                            bar_size = st.radio("Bars:", options=["Daily", *intraday.INTERVALS], horizontal=True, key="stock_bar_toggle")
+                            is_daily = bar_size == "Daily"
+                            time_period = st.radio(
+                                "Select Timeframe:",
+                                options=["1mo", "3mo", "6mo", "1y", "2y", "5y", "max"],
+                                index=3, # Default to '1y'
+                                horizontal=True,
+                                key="stock_time_toggle",
+                                disabled=not is_daily # Intraday bars cover the last few sessions
+                            )
 
-                        if not hist_data.empty:
-                            if isinstance(hist_data.columns, pd.MultiIndex):
-                                hist_data.columns = hist_data.columns.get_level_values(0)
-                            
-                            # --- CALCULATE RETURNS ---
-                            start_price = float(hist_data['Close'].iloc[0])
-                            end_price = float(hist_data['Close'].iloc[-1])
-                            abs_return = ((end_price - start_price) / start_price) * 100
-                            
-                            days = (hist_data.index[-1] - hist_data.index[0]).days
-                            years = days / 365.25
-                            
-                            if years >= 1:
-                                cagr = ((end_price / start_price) ** (1 / years) - 1) * 100
-                                return_text = f"{abs_return:+.2f}% Abs | {cagr:.2f}% CAGR"
+                            # --- 6. Historical Chart Logic ---
+                            # Copy: indicator columns are added below and the cached frame must stay pristine
+                            if is_daily:
+                                hist_data = ut.get_ohlc_history(yf_symbol, time_period).copy()
                             else:
-                                return_text = f"{abs_return:+.2f}% Abs Return"
+                                hist_data = intraday.get_bars(yf_symbol, bar_size)  # Already a copy
 
-                            perf_color = "#22c55e" if abs_return >= 0 else "#ef4444"
-                            avg_buy = float(df_eq[df_eq['tradingsymbol'] == selected_stock]['average_price'].iloc[0])
+                            if not hist_data.empty:
+                                # --- CALCULATE RETURNS ---
+                                start_price = float(hist_data['Close'].iloc[0])
+                                end_price = float(hist_data['Close'].iloc[-1])
+                                abs_return = ((end_price - start_price) / start_price) * 100
                             
-                            line_color = "#22c55e" if end_price >= avg_buy else "#ef4444"
-                            fill_color = "rgba(34, 197, 94, 0.1)" if end_price >= avg_buy else "rgba(239, 68, 68, 0.1)"
-
-                            # --- UPDATED MODERN HEADER ---
-                            # Using a professional font-weight and separating the name from the return
-                            chart_title = (
-                                f"<span style='font-size:22px; font-weight:700; color:white;'>{selected_stock}</span> "
-                                f"<span style='font-size:14px; color:#858796;'> Historical Price</span><br>"
-                                f"<span style='font-size:18px; font-weight:500; color:{perf_color};'>{return_text} ({time_period.upper()})</span>"
-                            )
-
-                            fig_hist = px.area(hist_data, y='Close', title=chart_title, template="plotly_dark")
+                                days = (hist_data.index[-1] - hist_data.index[0]).days
+                                years = days / 365.25
                             
-                            # Styling
-                            fig_hist.update_traces(
-                                line_color=line_color, line_width=2.5, fillcolor=fill_color,
-                                hovertemplate="<b>Date:</b> %{x}<br><b>Price:</b> ₹%{y:,.2f}<extra></extra>"
-                            )
-
-                            fig_hist.add_hline(
-                                y=avg_buy, line_dash="dot", line_color="#f6c23e", line_width=1.5,
-                                annotation_text=f"Your Avg: ₹{avg_buy:,.2f}", 
-                                annotation_position="bottom right",
-                                annotation_font=dict(color="#f6c23e")
-                            )
-
-                            fig_hist.update_layout(
-                                hovermode="x unified",
-                                # FIX: Increased top margin (t=80) so the header isn't cut off
-                                margin=dict(t=80, l=10, r=40, b=10), 
-                                height=500,
-                                paper_bgcolor='rgba(0,0,0,0)', 
-                                plot_bgcolor='rgba(0,0,0,0)',
-                                xaxis=dict(showgrid=False, title="", tickfont=dict(color="#858796")),
-                                yaxis=dict(
-                                    showgrid=True, 
-                                    gridcolor="rgba(255,255,255,0.05)", 
-                                    title=None, 
-                                    side="right", 
-                                    tickfont=dict(color="#858796"),
-                                    tickprefix="₹",
-                                    zeroline=False
-                                ),
-                                # Ensures the title is positioned properly within the margin
-                                title_x=0.01,
-                                title_y=0.92
-                            )
+                                if not is_daily:
+                                    return_text = f"{abs_return:+.2f}% over {hist_data.index.normalize().nunique()} sessions"
+                                elif years >= 1:
+                                    cagr = ((end_price / start_price) ** (1 / years) - 1) * 100
+                                    return_text = f"{abs_return:+.2f}% Abs | {cagr:.2f}% CAGR"
+                                else:
+                                    return_text = f"{abs_return:+.2f}% Abs Return"
 
-                            st.plotly_chart(fig_hist, use_container_width=True, config={'displayModeBar': False})
+                                perf_color = "#22c55e" if abs_return >= 0 else "#ef4444"
+                                avg_buy = float(df_eq[df_eq['tradingsymbol'] == selected_stock]['average_price'].iloc[0])
+                            
+                                line_color = "#22c55e" if end_price >= avg_buy else "#ef4444"
+                                fill_color = "rgba(34, 197, 94, 0.1)" if end_price >= avg_buy else "rgba(239, 68, 68, 0.1)"
+
+                                # --- UPDATED MODERN HEADER ---
+                                # Using a professional font-weight and separating the name from the return
+                                chart_title = (
+                                    f"<span style='font-size:22px; font-weight:700; color:white;'>{selected_stock}</span> "
+                                    f"<span style='font-size:14px; color:#858796;'> Historical Price</span><br>"
+                                    f"<span style='font-size:18px; font-weight:500; color:{perf_color};'>{return_text} ({time_period.upper() if is_daily else bar_size})</span>"
+                                )
 
-                            st.write("<br>", unsafe_allow_html=True)
+                                # Intraday series are bucketed to a point budget before they reach the browser
+                                plot_data = hist_data if is_daily else intraday.downsample(hist_data)
 
-                        # --- 1. CALCULATIONS ---
-                        # RSI (Relative Strength Index)
-                        rsi_io = RSIIndicator(close=hist_data['Close'], window=14)
-                        hist_data['RSI'] = rsi_io.rsi()
-
-                        # Moving Averages
-                        sma20_io = SMAIndicator(close=hist_data['Close'], window=20)
-                        hist_data['SMA20'] = sma20_io.sma_indicator()
-
-                        sma50_io = SMAIndicator(close=hist_data['Close'], window=50)
-                        hist_data['SMA50'] = sma50_io.sma_indicator()
-
-                        # Get latest values for the display
-                        current_price = hist_data['Close'].iloc[-1]
-                        current_rsi = hist_data['RSI'].iloc[-1]
-                        val_sma20 = hist_data['SMA20'].iloc[-1]
-                        val_sma50 = hist_data['SMA50'].iloc[-1]
-
-                        # --- 2. DISPLAY BELOW CHART ---
-                        st.markdown("### ⚡ Technical Momentum")
-                        t_col1, t_col2, t_col3, t_col4 = st.columns(4)
-
-                        with t_col1:
-                            # Set the status and color based on the RSI value
-                            if current_rsi > 70:
-                                rsi_label = "Overbought"
-                                rsi_delta = f"- {rsi_label}" # Red Up Arrow
-                                rsi_col = "normal"
-                            elif current_rsi < 30:
-                                rsi_label = "Oversold"
-                                rsi_delta = f"+ {rsi_label}" # Green Down Arrow
-                                rsi_col = "normal"
-                            else:
-                                rsi_label = "Neutral"
-                                rsi_delta = f"{rsi_label}" # No arrow, just text
-                                rsi_col = "off" # Gray color for neutral
+                                def build_hist_fig():
+                                    fig_hist = px.area(plot_data, y='Close', title=chart_title, template="plotly_dark")
                             
-                            st.metric(
-                                label="RSI (14)", 
-                                value=f"{current_rsi:.1f}", 
-                                delta=f"{rsi_delta}", 
-                                delta_color=rsi_col
-                            )
+                                    # Styling
+                                    fig_hist.update_traces(
+                                        line_color=line_color, line_width=2.5, fillcolor=fill_color,
+                                        hovertemplate="<b>Date:</b> %{x}<br><b>Price:</b> ₹%{y:,.2f}<extra></extra>"
+                                    )
+
+                                    fig_hist.add_hline(
+                                        y=avg_buy, line_dash="dot", line_color="#f6c23e", line_width=1.5,
+                                        annotation_text=f"Your Avg: ₹{avg_buy:,.2f}", 
+                                        annotation_position="bottom right",
+                                        annotation_font=dict(color="#f6c23e")
+                                    )
+
+                                    fig_hist.update_layout(
+                                        hovermode="x unified",
+                                        # FIX: Increased top margin (t=80) so the header isn't cut off
+                                        margin=dict(t=80, l=10, r=40, b=10), 
+                                        height=500,
+                                        paper_bgcolor='rgba(0,0,0,0)', 
+                                        plot_bgcolor='rgba(0,0,0,0)',
+                                        xaxis=dict(showgrid=False, title="", tickfont=dict(color="#858796"),
+                                                   rangebreaks=None if is_daily else intraday.RANGEBREAKS),
+                                        yaxis=dict(
+                                            showgrid=True, 
+                                            gridcolor="rgba(255,255,255,0.05)", 
+                                            title=None, 
+                                            side="right", 
+                                            tickfont=dict(color="#858796"),
+                                            tickprefix="₹",
+                                            zeroline=False
+                                        ),
+                                        # Ensures the title is positioned properly within the margin
+                                        title_x=0.01,
+                                        title_y=0.92
+                                    )
+
+                                    return charts.downsample_figure(fig_hist)
+
+                                st.plotly_chart(charts.memo_figure("deep_scan_history", build_hist_fig, plot_data['Close'], chart_title, avg_buy, line_color, is_daily), use_container_width=True, config={'displayModeBar': False})
+
+                                st.write("<br>", unsafe_allow_html=True)
+
+                            # --- 1. CALCULATIONS ---
+                            # RSI (Relative Strength Index) and Moving Averages
+                            ut.add_indicators(hist_data, sma_windows=(20, 50))
+
+                            # Get latest values for the display
+                            current_price = hist_data['Close'].iloc[-1]
+                            current_rsi = hist_data['RSI'].iloc[-1]
+                            val_sma20 = hist_data['SMA20'].iloc[-1]
+                            val_sma50 = hist_data['SMA50'].iloc[-1]
+
+                            # --- 2. DISPLAY BELOW CHART ---
+                            st.markdown("### ⚡ Technical Momentum")
+                            t_col1, t_col2, t_col3, t_col4 = st.columns(4)
+
+                            with t_col1:
+                                # Set the status and color based on the RSI value
+                                if current_rsi > 70:
+                                    rsi_label = "Overbought"
+                                    rsi_delta = f"- {rsi_label}" # Red Up Arrow
+                                    rsi_col = "normal"
+                                elif current_rsi < 30:
+                                    rsi_label = "Oversold"
+                                    rsi_delta = f"+ {rsi_label}" # Green Down Arrow
+                                    rsi_col = "normal"
+                                else:
+                                    rsi_label = "Neutral"
+                                    rsi_delta = f"{rsi_label}" # No arrow, just text
+                                    rsi_col = "off" # Gray color for neutral
+                            
+                                st.metric(
+                                    label="RSI (14)", 
+                                    value=f"{current_rsi:.1f}", 
+                                    delta=f"{rsi_delta}", 
+                                    delta_color=rsi_col
+                                )
 
-                        with t_col2:
-                            dist_sma20 = ((current_price - val_sma20) / val_sma20) * 100
-                            st.metric("20 Day SMA", f"₹{val_sma20:,.2f}", delta=f"{dist_sma20:+.1f}% vs Price")
-
-                        with t_col3:
-                            is_bullish = current_price > val_sma20
-                            # --- THE FIX ---
-                            # Instead of just text, we provide a value that Streamlit MUST treat as negative
-                            # We use a formatted string that starts with the minus sign
-                            status_text = "Bullish" if is_bullish else "Bearish"
-                            delta_label = f"{'+' if is_bullish else '-'} Below SMA20" if not is_bullish else "Above SMA20"
+                            with t_col2:
+                                dist_sma20 = ((current_price - val_sma20) / val_sma20) * 100
+                                st.metric("20 Day SMA" if is_daily else f"20 × {bar_size} SMA", f"₹{val_sma20:,.2f}", delta=f"{dist_sma20:+.1f}% vs Price")
+
+                            with t_col3:
+                                is_bullish = current_price > val_sma20
+                                # --- THE FIX ---
+                                # Instead of just text, we provide a value that Streamlit MUST treat as negative
+                                # We use a formatted string that starts with the minus sign
+                                status_text = "Bullish" if is_bullish else "Bearish"
+                                delta_label = f"{'+' if is_bullish else '-'} Below SMA20" if not is_bullish else "Above SMA20"
                             
-                            st.metric(
-                                label="Trend (Short-term)", 
-                                value=status_text, 
-                                delta=delta_label,
-                                delta_color="normal" # 'normal' + '-' sign = RED; 'normal' + '+' sign = GREEN
-                            )
+                                st.metric(
+                                    label="Trend (Short-term)", 
+                                    value=status_text, 
+                                    delta=delta_label,
+                                    delta_color="normal" # 'normal' + '-' sign = RED; 'normal' + '+' sign = GREEN
+                                )
 
-                        with t_col4:
-                            day_change = ((current_price - hist_data['Close'].iloc[-2]) / hist_data['Close'].iloc[-2]) * 100
-                            st.metric("Daily Momentum", f"₹{current_price:,.2f}", delta=f"{day_change:+.2f}%")
+                            with t_col4:
+                                day_change = ((current_price - hist_data['Close'].iloc[-2]) / hist_data['Close'].iloc[-2]) * 100
+                                st.metric("Daily Momentum" if is_daily else f"{bar_size} Momentum", f"₹{current_price:,.2f}", delta=f"{day_change:+.2f}%")
   
 
-                    # --- STEP E: FINANCIAL GROWTH (REVENUE vs PROFIT TOGGLE) ---
+                        # --- STEP E: FINANCIAL GROWTH (REVENUE vs PROFIT TOGGLE) ---
 
-                    st.write("<br>", unsafe_allow_html=True)
+                        st.write("<br>", unsafe_allow_html=True)
 
-                    # 1. CSS for the Boxed Card, Custom Tabs, and Pill Toggle
-                    st.markdown("""
-                    <style>
-                        /* Main card housing with border */
-                        .stElementContainer:has(div.financial-card) {
-                            border: 1px solid #e6e9ef;
-                            border-radius: 12px;
-                            padding: 20px;
-                            background-color: white;
-                        }
+                        # 1. CSS for the Boxed Card, Custom Tabs, and Pill Toggle
+                        st.markdown("""
+                        <style>
+                            /* Main card housing with border */
+                            .stElementContainer:has(div.financial-card) {
+                                border: 1px solid #e6e9ef;
+                                border-radius: 12px;
+                                padding: 20px;
+                                background-color: white;
+                            }
                         
-                        /* REMOVE default gray line under the tab list */
-                        [data-testid="stBaseButton-tablist"] {
-                            border-bottom: none !important;
-                            gap: 30px;
-                        }
-
-                        /* Style for Revenue/Profit Tabs */
-                        [data-testid="stBaseButton-tab"] {
-                            color: #7d8592 !important;
-                            font-weight: 600 !important;
-                            padding-bottom: 10px !important;
-                        }
-                        [data-testid="stBaseButton-tab"][aria-selected="true"] {
-                            color: #00b18d !important;
-                            border-bottom: 3px solid #00b18d !important;
-                        }
-
-                        /* Pill-Shaped Toggle for Quarterly/Yearly */
-                        div[data-testid="stSegmentedControl"] {
-                            background-color: #f1f8f6; /* Very light teal background */
-                            border-radius: 30px;
-                            padding: 4px;
-                            width: fit-content;
-                        }
-                        div[data-testid="stSegmentedControl"] button {
-                            border: none !important;
-                            border-radius: 25px !important;
-                            background-color: transparent !important;
-                            color: #7d8592 !important;
-                        }
-                        div[data-testid="stSegmentedControl"] button[aria-checked="true"] {
-                            background-color: white !important; /* White pill on light background */
-                            color: #00b18d !important;
-                            font-weight: bold !important;
-                            box-shadow: 0px 2px 4px rgba(0,0,0,0.05);
-                        }
-                    </style>
-                    """, unsafe_allow_html=True)
-
-                    # 3. Main Dashboard Section
-                    st.markdown("### 🚀 Financial Growth Analysis")
-
-                    # Use columns to keep the box to half the page width
-                    col_chart, col_spacer = st.columns([1.1, 0.9])
-
-                    with col_chart:
-                        # Main card container
-                        with st.container(border=True): 
-                            # Metric selection tabs
-                            tab_revenue, tab_profit = st.tabs(["Revenue", "Profit"])
+                            /* REMOVE default gray line under the tab list */
+                            [data-testid="stBaseButton-tablist"] {
+                                border-bottom: none !important;
+                                gap: 30px;
+                            }
+
+                            /* Style for Revenue/Profit Tabs */
+                            [data-testid="stBaseButton-tab"] {
+                                color: #7d8592 !important;
+                                font-weight: 600 !important;
+                                padding-bottom: 10px !important;
+                            }
+                            [data-testid="stBaseButton-tab"][aria-selected="true"] {
+                                color: #00b18d !important;
+                                border-bottom: 3px solid #00b18d !important;
+                            }
+
+                            /* Pill-Shaped Toggle for Quarterly/Yearly */
+                            div[data-testid="stSegmentedControl"] {
+                                background-color: #f1f8f6; /* Very light teal background */
+                                border-radius: 30px;
+                                padding: 4px;
+                                width: fit-content;
+                            }
+                            div[data-testid="stSegmentedControl"] button {
+                                border: none !important;
+                                border-radius: 25px !important;
+                                background-color: transparent !important;
+                                color: #7d8592 !important;
+                            }
+                            div[data-testid="stSegmentedControl"] button[aria-checked="true"] {
+                                background-color: white !important; /* White pill on light background */
+                                color: #00b18d !important;
+                                font-weight: bold !important;
+                                box-shadow: 0px 2px 4px rgba(0,0,0,0.05);
+                            }
+                        </style>
+                        """, unsafe_allow_html=True)
+
+                        # 3. Main Dashboard Section
+                        st.markdown("### 🚀 Financial Growth Analysis")
+
+                        # Use columns to keep the box to half the page width
+                        col_chart, col_spacer = st.columns([1.1, 0.9])
+
+                        with col_chart:
+                            # Main card container
+                            with st.container(border=True): 
+                                # Metric selection tabs
+                                tab_revenue, tab_profit = st.tabs(["Revenue", "Profit"])
                             
-                            metrics = {"Revenue": "Total Revenue", "Profit": "Net Income"}
+                                fin_rows = {"Revenue": "Total Revenue", "Profit": "Net Income"}
                             
-                            for tab, label in zip([tab_revenue, tab_profit], ["Revenue", "Profit"]):
-                                with tab:
-                                    # Layout containers
-                                    chart_area = st.container()
-                                    footer_container = st.container()
+                                for tab, label in zip([tab_revenue, tab_profit], ["Revenue", "Profit"]):
+                                    with tab:
+                                        # Layout containers
+                                        chart_area = st.container()
+                                        footer_container = st.container()
                                     
-                                    # Bottom Row: Pill-shaped toggle
-                                    with footer_container:
-                                        view_choice = st.segmented_control(
-                                            f"toggle_{label}",
-                                            options=["Quarterly", "Yearly"],
-                                            default="Yearly",
-                                            label_visibility="collapsed"
-                                        )
+                                        # Bottom Row: Pill-shaped toggle
+                                        with footer_container:
+                                            view_choice = st.segmented_control(
+                                                f"toggle_{label}",
+                                                options=["Quarterly", "Yearly"],
+                                                default="Yearly",
+                                                label_visibility="collapsed"
+                                            )
 
-                                    # Data Logic and Visualization
-                                    with chart_area:
-                                        data_key = metrics[label]
-                                        source_df = ticker_obj.financials if view_choice == "Yearly" else ticker_obj.quarterly_financials
+                                        # Data Logic and Visualization
+                                        with chart_area:
+                                            data_key = fin_rows[label]
+                                            source_df = ut.get_financials(yf_symbol, quarterly=(view_choice != "Yearly"))
                                         
-                                        if not source_df.empty and data_key in source_df.index:
-                                            # 1. Data Cleaning and Chronology
-                                            df = source_df.loc[data_key].dropna().head(5).reset_index()
-                                            df.columns = ['Label', 'Value']
-                                            df['Label'] = df['Label'].dt.strftime('%Y' if view_choice == "Yearly" else '%b %y')
+                                            if not source_df.empty and data_key in source_df.index:
+                                                # 1. Data Cleaning and Chronology
+                                                df = source_df.loc[data_key].dropna().head(5).reset_index()
+                                                df.columns = ['Label', 'Value']
+                                                df['Label'] = df['Label'].dt.strftime('%Y' if view_choice == "Yearly" else '%b %y')
                                             
-                                            if view_choice == "Yearly": 
-                                                df = df.sort_values('Label')
-                                            else: 
-                                                df = df.iloc[::-1]
+                                                if view_choice == "Yearly": 
+                                                    df = df.sort_values('Label')
+                                                else: 
+                                                    df = df.iloc[::-1]
                                             
-                                            # 2. Indian Numbering Logic
-                                            # Scale to Crores
-                                            df['Value_Cr'] = df['Value'] / 10**7 
+                                                # 2. Indian Numbering Logic
+                                                # Scale to Crores
+                                                df['Value_Cr'] = df['Value'] / 10**7 
                                             
-                                            # Pre-format Indian currency string with 0 decimals
-                                            df['fmt_val'] = df['Value_Cr'].apply(
-                                                lambda x: f"₹{ut.format_indian_currency(x).split('.')[0]} Cr"
-                                            )
+                                                # Pre-format Indian currency string with 0 decimals
+                                                df['fmt_val'] = df['Value_Cr'].apply(
+                                                    lambda x: f"₹{ut.format_indian_currency(x).split('.')[0]} Cr"
+                                                )
                                             
-                                            # 3. Create Bar Chart
-                                            fig = px.bar(
-                                                df, 
-                                                x='Label', 
-                                                y='Value_Cr',
-                                                custom_data=['fmt_val'] # Attach Indian string to the bars
-                                            )
+                                                # 3. Create Bar Chart
+                                                def build_financials_fig():
+                                                    fig = px.bar(
+                                                        df, 
+                                                        x='Label', 
+                                                        y='Value_Cr',
+                                                        custom_data=['fmt_val'] # Attach Indian string to the bars
+                                                    )
                                             
-                                            # 4. Apply Your Custom Styling Function
-                                            # IMPORTANT: We do this BEFORE the trace update to avoid overrides
-                                            styled_fig = ut.style_financial_chart(fig, df['Value_Cr'])
+                                                    # 4. Apply Your Custom Styling Function
+                                                    # IMPORTANT: We do this BEFORE the trace update to avoid overrides
+                                                    styled_fig = ut.style_financial_chart(fig, df['Value_Cr'])
                                             
-                                            # 5. Force Indian Labels (Override Everything Else)
-                                            styled_fig.update_traces(
-                                                # Uses the customdata string: e.g., ₹1,72,985 Cr
-                                                texttemplate="<b>%{customdata[0]}</b>",
-                                                textposition="outside",
-                                                # Syncs hover tooltip to use the same format
-                                                hovertemplate="<b>%{x}</b><br>Amount: %{customdata[0]}<extra></extra>",
-                                                marker_color='#00b18d'
-                                            )
+                                                    # 5. Force Indian Labels (Override Everything Else)
+                                                    styled_fig.update_traces(
+                                                        # Uses the customdata string: e.g., ₹1,72,985 Cr
+                                                        texttemplate="<b>%{customdata[0]}</b>",
+                                                        textposition="outside",
+                                                        # Syncs hover tooltip to use the same format
+                                                        hovertemplate="<b>%{x}</b><br>Amount: %{customdata[0]}<extra></extra>",
+                                                        marker_color='#00b18d'
+                                                    )
                                             
-                                            # 6. Final Layout Polish
-                                            styled_fig.update_layout(
-                                                separators='.,', # Proper Indian comma/dot placement
-                                                margin=dict(t=50, b=10, l=10, r=10), # Extra top room for the ₹ labels
-                                                yaxis_tickformat=None, # Prevents auto-scaling on the side axis
-                                            )
+                                                    # 6. Final Layout Polish
+                                                    styled_fig.update_layout(
+                                                        separators='.,', # Proper Indian comma/dot placement
+                                                        margin=dict(t=50, b=10, l=10, r=10), # Extra top room for the ₹ labels
+                                                        yaxis_tickformat=None, # Prevents auto-scaling on the side axis
+                                                    )
                                             
-                                            st.plotly_chart(styled_fig, use_container_width=True, config={'displayModeBar': False})
-                                        else:
-                                            st.info(f"{view_choice} {label.lower()} data not available.")
-
-                else:
-                    st.info("No Equity holdings found.")
-
-            with tab2:
-                if not df_mf.empty:
-                    # Calculations for Tab 2 (already simulated in Step A)
-                    df_mf['pnl'] = df_mf['current_value'] - df_mf['invested_value']
-                    df_mf['pnl_pct'] = (df_mf['pnl'] / df_mf['invested_value']) * 100
-                    df_mf = df_mf.sort_values(by='current_value', ascending=False).reset_index(drop=True)
-                    df_mf.index = df_mf.index + 1
+                                                    return styled_fig
+
+                                                st.plotly_chart(charts.memo_figure("financials", build_financials_fig, df), use_container_width=True, config={'displayModeBar': False})
+                                            else:
+                                                st.info(f"{view_choice} {label.lower()} data not available.")
+
+                    else:
+                        st.info("No Equity holdings found.")
+
+            if ut.is_open(tab2):
+                with tab2, perf.timed("render.tab.mutual_funds"):
+                    if not df_mf.empty:
+                        # Calculations for Tab 2 (already simulated in Step A)
+                        df_mf['pnl'] = df_mf['current_value'] - df_mf['invested_value']
+                        df_mf['pnl_pct'] = (df_mf['pnl'] / df_mf['invested_value']) * 100
+                        df_mf = df_mf.sort_values(by='current_value', ascending=False).reset_index(drop=True)
+                        df_mf.index = df_mf.index + 1
                     
-                    # --- MUTUAL FUND CALCULATIONS ---
-                    total_inv_mf = df_mf['invested_value'].sum()
-                    current_val_mf = df_mf['current_value'].sum()
-                    total_pnl_mf = current_val_mf - total_inv_mf
-                    total_pnl_pct_mf = (total_pnl_mf / total_inv_mf) * 100 if total_inv_mf != 0 else 0
-
-                    # --- PREPARE INDIAN FORMATTED STRINGS ---
-                    # Reusing the format_indian_currency function defined earlier
-                    fmt_inv_mf = ut.format_indian_currency(total_inv_mf)
-                    fmt_curr_mf = ut.format_indian_currency(current_val_mf)
-                    fmt_pnl_mf = ut.format_indian_currency(total_pnl_mf)
-
-                    # 1. Prepare dynamic variables
-                    mf_pnl_class = "pnl-positive" if total_pnl_mf >= 0 else "pnl-negative"
-                    mf_sim_glow = "border: 1px solid #f6c23e;" if simulation_pct != 0 else "border: 1px solid rgba(78,115,223,0.1);"
-                    mf_curr_label = "Current Value" if simulation_pct == 0 else f"Simulated ({simulation_pct:+.0f}%)"
-
-                    # 2. Use dedent to strip leading whitespace from the string
-                    mf_summary_html = textwrap.dedent(f"""
-                        <div style="display: flex; gap: 15px; margin-bottom: 25px; flex-wrap: wrap; width: 100%;">
-                            <div style="flex: 1; min-width: 200px; background: rgba(255,255,255,0.02); border: 1px solid rgba(78,115,223,0.1); padding: 15px; border-radius: 12px;">
-                                <p style="font-size: 0.75rem; color: #858796; margin: 0; text-transform: uppercase;">MF Investment</p>
-                                <p style="font-size: 1.4rem; font-weight: 700; margin: 5px 0 0 0;">₹{fmt_inv_mf}</p>
-                            </div>
-                            <div style="flex: 1; min-width: 200px; background: rgba(255,255,255,0.02); {mf_sim_glow} padding: 15px; border-radius: 12px;">
-                                <p style="font-size: 0.75rem; color: #858796; margin: 0; text-transform: uppercase;">{mf_curr_label}</p>
-                                <p style="font-size: 1.4rem; font-weight: 700; margin: 5px 0 0 0; color: #4e73df;">₹{fmt_curr_mf}</p>
-                            </div>
-                            <div style="flex: 1; min-width: 200px; background: rgba(255,255,255,0.02); border: 1px solid rgba(78,115,223,0.1); padding: 15px; border-radius: 12px;">
-                                <p style="font-size: 0.75rem; color: #858796; margin: 0; text-transform: uppercase;">MF P&L</p>
-                                <div style="display: flex; align-items: baseline; gap: 8px; margin-top: 5px;">
-                                    <span style="font-size: 1.4rem; font-weight: 700;" class="{mf_pnl_class}">₹{fmt_pnl_mf}</span>
-                                    <span style="font-size: 0.85rem; font-weight: 600; background: rgba(0,0,0,0.05); padding: 2px 8px; border-radius: 10px;" class="{mf_pnl_class}">{total_pnl_pct_mf:+.2f}%</span>
+                        # --- MUTUAL FUND CALCULATIONS ---
+                        total_inv_mf = df_mf['invested_value'].sum()
+                        current_val_mf = df_mf['current_value'].sum()
+                        total_pnl_mf = current_val_mf - total_inv_mf
+                        total_pnl_pct_mf = (total_pnl_mf / total_inv_mf) * 100 if total_inv_mf != 0 else 0
+
+                        # --- PREPARE INDIAN FORMATTED STRINGS ---
+                        # Reusing the format_indian_currency function defined earlier
+                        fmt_inv_mf = ut.format_indian_currency(total_inv_mf)
+                        fmt_curr_mf = ut.format_indian_currency(current_val_mf)
+                        fmt_pnl_mf = ut.format_indian_currency(total_pnl_mf)
+
+                        # 1. Prepare dynamic variables
+                        mf_pnl_class = "pnl-positive" if total_pnl_mf >= 0 else "pnl-negative"
+                        mf_sim_glow = "border: 1px solid #f6c23e;" if simulation_pct != 0 else "border: 1px solid rgba(78,115,223,0.1);"
+                        mf_curr_label = "Current Value" if simulation_pct == 0 else f"Simulated ({simulation_pct:+.0f}%)"
+
+                        # 2. Use dedent to strip leading whitespace from the string
+                        mf_summary_html = textwrap.dedent(f"""
+                            <div style="display: flex; gap: 15px; margin-bottom: 25px; flex-wrap: wrap; width: 100%;">
+                                <div style="flex: 1; min-width: 200px; background: rgba(255,255,255,0.02); border: 1px solid rgba(78,115,223,0.1); padding: 15px; border-radius: 12px;">
+                                    <p style="font-size: 0.75rem; color: #858796; margin: 0; text-transform: uppercase;">MF Investment</p>
+                                    <p style="font-size: 1.4rem; font-weight: 700; margin: 5px 0 0 0;">₹{fmt_inv_mf}</p>
+                                </div>
+                                <div style="flex: 1; min-width: 200px; background: rgba(255,255,255,0.02); {mf_sim_glow} padding: 15px; border-radius: 12px;">
+                                    <p style="font-size: 0.75rem; color: #858796; margin: 0; text-transform: uppercase;">{mf_curr_label}</p>
+                                    <p style="font-size: 1.4rem; font-weight: 700; margin: 5px 0 0 0; color: #4e73df;">₹{fmt_curr_mf}</p>
+                                </div>
+                                <div style="flex: 1; min-width: 200px; background: rgba(255,255,255,0.02); border: 1px solid rgba(78,115,223,0.1); padding: 15px; border-radius: 12px;">
+                                    <p style="font-size: 0.75rem; color: #858796; margin: 0; text-transform: uppercase;">MF P&L</p>
+                                    <div style="display: flex; align-items: baseline; gap: 8px; margin-top: 5px;">
+                                        <span style="font-size: 1.4rem; font-weight: 700;" class="{mf_pnl_class}">₹{fmt_pnl_mf}</span>
+                                        <span style="font-size: 0.85rem; font-weight: 600; background: rgba(0,0,0,0.05); padding: 2px 8px; border-radius: 10px;" class="{mf_pnl_class}">{total_pnl_pct_mf:+.2f}%</span>
+                                    </div>
                                 </div>
                             </div>
-                        </div>
-                    """).strip()
-
-                    # 3. Render
-                    st.markdown(mf_summary_html, unsafe_allow_html=True)
-
-                    st.markdown("### 📜 Detailed Mutual Fund Holdings")
-
-                    # 1. Prepare Data
-                    disp_mf = df_mf[['fund', 'quantity', 'average_price', 'invested_value', 'last_price', 'current_value', 'pnl', 'pnl_pct']].copy()
-                    disp_mf.columns = ['Fund Name', 'Units', 'Avg. NAV', 'Invested', 'Current NAV', 'Current Value', 'P&L', 'P&L %']
-
-                    # --- Define Indian Numbering Formatters ---
-                    # Formatter for 2 decimals (Units, Avg. NAV, Current NAV)
-                    fmt_indian_2d = lambda x: f"₹{ut.format_indian_currency(x)}" if isinstance(x, (int, float)) else x
-                    fmt_units_2d = lambda x: f"{ut.format_indian_currency(x)}" if isinstance(x, (int, float)) else x
-
-                    # Formatter for 0 decimals (Invested, Current Value, P&L)
-                    fmt_indian_0d = lambda x: f"₹{ut.format_indian_currency(x).split('.')[0]}" if isinstance(x, (int, float)) else x
-                    # 3. Create the Styled Object
-                    styled_mf = disp_mf.style.applymap(ut.color_pnl_custom, subset=['P&L', 'P&L %']) \
-                        .format({
-                            'Units': fmt_units_2d,          # 2 decimals Indian format
-                            'Avg. NAV': fmt_indian_2d,     # 2 decimals Indian format
-                            'Current NAV': fmt_indian_2d, # 2 decimals Indian format
-                            'Invested': fmt_indian_0d,      # 0 decimals Indian format
-                            'Current Value': fmt_indian_0d, # 0 decimals Indian format
-                            'P&L': fmt_indian_0d,           # 0 decimals Indian format
-                            'P&L %': '{:+.2f}%'             # Standard % formatting
-                        })
-
-                    # 5. Render to HTML
-                    html_mf = ut.apply_mf_style(styled_mf).hide(axis='index').to_html()
-                    st.markdown(html_mf, unsafe_allow_html=True)
-                    st.write("<br>", unsafe_allow_html=True)
+                        """).strip()
+
+                        # 3. Render
+                        st.markdown(mf_summary_html, unsafe_allow_html=True)
+
+                        st.markdown("### 📜 Detailed Mutual Fund Holdings")
+
+                        # 1. Prepare Data
+                        disp_mf = hd.view(df_mf, ['fund', 'quantity', 'average_price', 'invested_value', 'last_price', 'current_value', 'pnl', 'pnl_pct'])
+                        disp_mf.columns = ['Fund Name', 'Units', 'Avg. NAV', 'Invested', 'Current NAV', 'Current Value', 'P&L', 'P&L %']
+
+                        # --- Define Indian Numbering Formatters ---
+                        # Formatter for 2 decimals (Units, Avg. NAV, Current NAV)
+                        fmt_indian_2d = lambda x: f"₹{ut.format_indian_currency(x)}" if isinstance(x, (int, float)) else x
+                        fmt_units_2d = lambda x: f"{ut.format_indian_currency(x)}" if isinstance(x, (int, float)) else x
+
+                        # Formatter for 0 decimals (Invested, Current Value, P&L)
+                        fmt_indian_0d = lambda x: f"₹{ut.format_indian_currency(x).split('.')[0]}" if isinstance(x, (int, float)) else x
+                        # 3. Create the Styled Object
+                        styled_mf = disp_mf.style.applymap(ut.color_pnl_custom, subset=['P&L', 'P&L %']) \
+                            .format({
+                                'Units': fmt_units_2d,          # 2 decimals Indian format
+                                'Avg. NAV': fmt_indian_2d,     # 2 decimals Indian format
+                                'Current NAV': fmt_indian_2d, # 2 decimals Indian format
+                                'Invested': fmt_indian_0d,      # 0 decimals Indian format
+                                'Current Value': fmt_indian_0d, # 0 decimals Indian format
+                                'P&L': fmt_indian_0d,           # 0 decimals Indian format
+                                'P&L %': '{:+.2f}%'             # Standard % formatting
+                            })
+
+                        # 5. Render to HTML
+                        html_mf = ut.apply_mf_style(styled_mf).hide(axis='index').to_html()
+                        st.markdown(html_mf, unsafe_allow_html=True)
+                        st.write("<br>", unsafe_allow_html=True)
                     
                     
-                    # --- Beautified NAV Performance Logic ---
-                    st.markdown("### 📈 Historical NAV Performance")
-
-                    available_funds = list(MY_FUNDS.keys())
-                    selected_fund_name = st.selectbox("Select Fund to view History:", available_funds, key="mf_history_selector")
-                    scheme_code = MY_FUNDS[selected_fund_name]
-
-                    # 1. NEW: Add the Period Selector above the chart
-                    # This variable 'time_range' is what makes the CAGR dynamic
-                    time_range = st.radio(
-                        "Select Range:", 
-                        ["6M", "1Y", "3Y", "5Y", "MAX"], 
-                        horizontal=True, 
-                        key="nav_range_selector")
-
-                    with st.spinner(f"Fetching NAV history..."):
-                        try:
-                            url = f"https://api.mfapi.in/mf/{scheme_code}"
-                            response = requests.get(url)
-                            data_json = response.json()
-
-                            if "data" in data_json and len(data_json["data"]) > 0:
-                                df_nav = pd.DataFrame(data_json["data"])
-                                df_nav['nav'] = pd.to_numeric(df_nav['nav'])
-                                df_nav['date'] = pd.to_datetime(df_nav['date'], dayfirst=True)
-                                df_nav = df_nav.sort_values('date')
-
-                                # 2. NEW: Filter the dataframe based on the radio button choice
-                                end_date = df_nav['date'].max()
-                                if time_range == "6M":
-                                    start_date = end_date - pd.DateOffset(months=6)
-                                elif time_range == "1Y":
-                                    start_date = end_date - pd.DateOffset(years=1)
-                                elif time_range == "3Y":
-                                    start_date = end_date - pd.DateOffset(years=3)
-                                elif time_range == "5Y":
-                                    start_date = end_date - pd.DateOffset(years=5)
-                                else:
-                                    start_date = df_nav['date'].min()
-
-                                # Filter the data
-                                df_filtered = df_nav[df_nav['date'] >= start_date].copy()
-
-                                # 3. NEW: Calculate returns based ONLY on the filtered data
-                                start_val = df_filtered['nav'].iloc[0]
-                                end_val = df_filtered['nav'].iloc[-1]
+                        # --- Beautified NAV Performance Logic ---
+                        st.markdown("### 📈 Historical NAV Performance")
+
+                        available_funds = list(MY_FUNDS.keys())
+                        selected_fund_name = st.selectbox("Select Fund to view History:", available_funds, key="mf_history_selector")
+                        scheme_code = MY_FUNDS[selected_fund_name]
+
+                        # 1. NEW: Add the Period Selector above the chart
+                        # This variable 'time_range' is what makes the CAGR dynamic
+                        time_range = st.radio(
+                            "Select Range:", 
+                            ["6M", "1Y", "3Y", "5Y", "MAX"], 
+                            horizontal=True, 
+                            key="nav_range_selector")
+
+                        with st.spinner(f"Fetching NAV history..."):
+                            try:
+                                df_nav = ut.get_nav_history(scheme_code)
+
+                                if not df_nav.empty:
+
+                                    # 2. NEW: Filter the dataframe based on the radio button choice
+                                    end_date = df_nav['date'].max()
+                                    if time_range == "6M":
+                                        start_date = end_date - pd.DateOffset(months=6)
+                                    elif time_range == "1Y":
+                                        start_date = end_date - pd.DateOffset(years=1)
+                                    elif time_range == "3Y":
+                                        start_date = end_date - pd.DateOffset(years=3)
+                                    elif time_range == "5Y":
+                                        start_date = end_date - pd.DateOffset(years=5)
+                                    else:
+                                        start_date = df_nav['date'].min()
+
+                                    # Filter the data
+                                    df_filtered = df_nav[df_nav['date'] >= start_date].copy()
+
+                                    # 3. NEW: Calculate returns based ONLY on the filtered data
+                                    start_val = df_filtered['nav'].iloc[0]
+                                    end_val = df_filtered['nav'].iloc[-1]
                                 
-                                abs_return = ((end_val - start_val) / start_val) * 100
+                                    abs_return = ((end_val - start_val) / start_val) * 100
                                 
-                                # Calculate years for CAGR
-                                days_diff = (df_filtered['date'].iloc[-1] - df_filtered['date'].iloc[0]).days
-                                years_diff = days_diff / 365.25
+                                    # Calculate years for CAGR
+                                    days_diff = (df_filtered['date'].iloc[-1] - df_filtered['date'].iloc[0]).days
+                                    years_diff = days_diff / 365.25
                                 
-                                if years_diff >= 1:
-                                    cagr = ((end_val / start_val) ** (1 / years_diff) - 1) * 100
-                                    return_html = f"<span style='color:#22c55e;'>Abs: {abs_return:+.2f}% | CAGR: {cagr:.2f}%</span>"
-                                else:
-                                    return_html = f"<span style='color:#22c55e;'>Abs Return: {abs_return:+.2f}%</span>"
-
-                                # 4. Create Area Chart using df_filtered
-                                fig_nav = px.area(
-                                    df_filtered, 
-                                    x='date', 
-                                    y='nav',
-                                    title=f"<b>{selected_fund_name}</b><br>{return_html}",
-                                    template="plotly_dark"
-                                )
+                                    if years_diff >= 1:
+                                        cagr = ((end_val / start_val) ** (1 / years_diff) - 1) * 100
+                                        return_html = f"<span style='color:#22c55e;'>Abs: {abs_return:+.2f}% | CAGR: {cagr:.2f}%</span>"
+                                    else:
+                                        return_html = f"<span style='color:#22c55e;'>Abs Return: {abs_return:+.2f}%</span>"
+
+                                    # 4. Create Area Chart using df_filtered
+                                    def build_nav_fig():
+                                        fig_nav = px.area(
+                                            df_filtered, 
+                                            x='date', 
+                                            y='nav',
+                                            title=f"<b>{selected_fund_name}</b><br>{return_html}",
+                                            template="plotly_dark"
+                                        )
 
-                                # 5. Styling (Note: I removed the rangeselector buttons from here)
-                                fig_nav.update_traces(
-                                    line_color='#4e73df',
-                                    line_width=2,
-                                    fillcolor='rgba(78, 115, 223, 0.1)',
-                                    hovertemplate="<b>Date:</b> %{x}<br><b>NAV:</b> ₹%{y:.2f}<extra></extra>"
-                                )
+                                        # 5. Styling (Note: I removed the rangeselector buttons from here)
+                                        fig_nav.update_traces(
+                                            line_color='#4e73df',
+                                            line_width=2,
+                                            fillcolor='rgba(78, 115, 223, 0.1)',
+                                            hovertemplate="<b>Date:</b> %{x}<br><b>NAV:</b> ₹%{y:.2f}<extra></extra>"
+                                        )
 
-                                fig_nav.update_layout(
-                                    hovermode="x unified",
-                                    margin=dict(t=100, l=0, r=0, b=0),
-                                    height=450,
-                                    yaxis=dict(showgrid=True, gridcolor="rgba(255,255,255,0.05)", title="", side="right"),
-                                    paper_bgcolor='rgba(0,0,0,0)',
-                                    plot_bgcolor='rgba(0,0,0,0)',
-                                )
+                                        fig_nav.update_layout(
+                                            hovermode="x unified",
+                                            margin=dict(t=100, l=0, r=0, b=0),
+                                            height=450,
+                                            yaxis=dict(showgrid=True, gridcolor="rgba(255,255,255,0.05)", title="", side="right"),
+                                            paper_bgcolor='rgba(0,0,0,0)',
+                                            plot_bgcolor='rgba(0,0,0,0)',
+                                        )
 
-                                st.plotly_chart(fig_nav, use_container_width=True)
+                                        return charts.downsample_figure(fig_nav)
+
+                                    st.plotly_chart(charts.memo_figure("nav_history", build_nav_fig, df_filtered[['date', 'nav']], selected_fund_name, return_html), use_container_width=True)
                                 
-                            else:
-                                st.warning("No historical data found.")
-                        except Exception as e:
-                            st.error(f"Error: {e}")
+                                else:
+                                    st.warning("No historical data found.")
+                            except Exception as e:
+                                st.error(f"Error: {e}")
 
-                else:
-                    st.info("No Mutual Fund holdings found.")
+                    else:
+                        st.info("No Mutual Fund holdings found.")
             
-            with tab3:
-                if mf_sips:
-                    df_sip = pd.DataFrame(mf_sips)
-                    df_sip['instalment_day'] = pd.to_numeric(df_sip['instalment_day'])
-                    active_sips = df_sip[df_sip['status'] == 'ACTIVE'].copy()
+            if ut.is_open(tab3):
+                with tab3, perf.timed("render.tab.sips"):
+                    if mf_sips:
+                        df_sip = pd.DataFrame(mf_sips)
+                        df_sip['instalment_day'] = pd.to_numeric(df_sip['instalment_day'])
+                        active_sips = df_sip[df_sip['status'] == 'ACTIVE'].copy()
                     
-                    # 1. Calculations
-                    total_sip_monthly = active_sips['instalment_amount'].sum()
-                    active_count = len(active_sips)
-                    today_day = datetime.now().day
-                    formatted_full_date = datetime.now().strftime("%d %b %Y")
+                        # 1. Calculations
+                        total_sip_monthly = active_sips['instalment_amount'].sum()
+                        active_count = len(active_sips)
+                        today_day = datetime.now().day
+                        formatted_full_date = datetime.now().strftime("%d %b %Y")
                     
-                    # Calculate Outflow Progress
-                    remaining_cash = active_sips[active_sips['instalment_day'] >= today_day]['instalment_amount'].sum()
-                    paid_so_far = total_sip_monthly - remaining_cash
-                    progress_pct = float(paid_so_far / total_sip_monthly) if total_sip_monthly > 0 else 0.0
-
-                    # 2. Glass Card Summary Ribbon
-                    sip_summary_html = f"""
-            <div style="display: flex; gap: 15px; margin-bottom: 20px; flex-wrap: wrap;">
-                <div style="flex: 1; min-width: 200px; background: rgba(255,255,255,0.03); border: 1px solid rgba(78,115,223,0.15); padding: 18px; border-radius: 15px;">
-                    <p style="font-size: 0.8rem; color: #858796; margin: 0; text-transform: uppercase; letter-spacing: 1px;">Monthly Commitment</p>
-                    <p style="font-size: 1.5rem; font-weight: 700; margin: 5px 0 0 0; color: #4e73df;">₹{total_sip_monthly:,.0f}</p>
-                </div>
-                <div style="flex: 1; min-width: 200px; background: rgba(255,255,255,0.03); border: 1px solid rgba(78,115,223,0.15); padding: 18px; border-radius: 15px;">
-                    <p style="font-size: 0.8rem; color: #858796; margin: 0; text-transform: uppercase; letter-spacing: 1px;">Active Mandates</p>
-                    <p style="font-size: 1.5rem; font-weight: 700; margin: 5px 0 0 0; color: #4e73df;">{active_count} <span style="font-size: 0.8rem; font-weight: 400; color: #1cc88a;">● Running</span></p>
-                </div>
-                <div style="flex: 1; min-width: 200px; background: rgba(255,255,255,0.03); border: 1px solid rgba(231,74,59,0.15); padding: 18px; border-radius: 15px;">
-                    <p style="font-size: 0.8rem; color: #e74a3b; margin: 0; text-transform: uppercase; letter-spacing: 1px;">Upcoming Outflow</p>
-                    <p style="font-size: 1.5rem; font-weight: 700; margin: 5px 0 0 0;">₹{remaining_cash:,.0f}</p>
+                        # Calculate Outflow Progress
+                        remaining_cash = active_sips[active_sips['instalment_day'] >= today_day]['instalment_amount'].sum()
+                        paid_so_far = total_sip_monthly - remaining_cash
+                        progress_pct = float(paid_so_far / total_sip_monthly) if total_sip_monthly > 0 else 0.0
+
+                        # 2. Glass Card Summary Ribbon
+                        sip_summary_html = f"""
+                <div style="display: flex; gap: 15px; margin-bottom: 20px; flex-wrap: wrap;">
+                    <div style="flex: 1; min-width: 200px; background: rgba(255,255,255,0.03); border: 1px solid rgba(78,115,223,0.15); padding: 18px; border-radius: 15px;">
+                        <p style="font-size: 0.8rem; color: #858796; margin: 0; text-transform: uppercase; letter-spacing: 1px;">Monthly Commitment</p>
+                        <p style="font-size: 1.5rem; font-weight: 700; margin: 5px 0 0 0; color: #4e73df;">₹{total_sip_monthly:,.0f}</p>
+                    </div>
+                    <div style="flex: 1; min-width: 200px; background: rgba(255,255,255,0.03); border: 1px solid rgba(78,115,223,0.15); padding: 18px; border-radius: 15px;">
+                        <p style="font-size: 0.8rem; color: #858796; margin: 0; text-transform: uppercase; letter-spacing: 1px;">Active Mandates</p>
+                        <p style="font-size: 1.5rem; font-weight: 700; margin: 5px 0 0 0; color: #4e73df;">{active_count} <span style="font-size: 0.8rem; font-weight: 400; color: #1cc88a;">● Running</span></p>
+                    </div>
+                    <div style="flex: 1; min-width: 200px; background: rgba(255,255,255,0.03); border: 1px solid rgba(231,74,59,0.15); padding: 18px; border-radius: 15px;">
+                        <p style="font-size: 0.8rem; color: #e74a3b; margin: 0; text-transform: uppercase; letter-spacing: 1px;">Upcoming Outflow</p>
+                        <p style="font-size: 1.5rem; font-weight: 700; margin: 5px 0 0 0;">₹{remaining_cash:,.0f}</p>
+                    </div>
                 </div>
-            </div>
-            """
-                    st.markdown(sip_summary_html, unsafe_allow_html=True)
-
-                    # 3. Visual Cash-Flow Progress Bar (FIXED FORMATTING)
-                    st.write(f"**Monthly Outflow Progress: {progress_pct:.0%} complete**")
-                    st.progress(progress_pct)
-                    st.caption(f"📅 Today: **{formatted_full_date}** | Invested: **₹{paid_so_far:,.0f}** | Remaining: **₹{remaining_cash:,.0f}**")
+                """
+                        st.markdown(sip_summary_html, unsafe_allow_html=True)
+
+                        # 3. Visual Cash-Flow Progress Bar (FIXED FORMATTING)
+                        st.write(f"**Monthly Outflow Progress: {progress_pct:.0%} complete**")
+                        st.progress(progress_pct)
+                        st.caption(f"📅 Today: **{formatted_full_date}** | Invested: **₹{paid_so_far:,.0f}** | Remaining: **₹{remaining_cash:,.0f}**")
                     
-                    st.write("<br>", unsafe_allow_html=True)
+                        st.write("<br>", unsafe_allow_html=True)
 
-                    # --- 7-Day Lookahead with Next Instalment Date ---
-                    # 1. Ensure 'next_instalment' is in datetime format
-                    active_sips['next_instalment'] = pd.to_datetime(active_sips['next_instalment'], errors='coerce')
+                        # --- 7-Day Lookahead with Next Instalment Date ---
+                        # 1. Ensure 'next_instalment' is in datetime format
+                        active_sips['next_instalment'] = pd.to_datetime(active_sips['next_instalment'], errors='coerce')
 
-                    # 2. Filter for dates within the next 7 days from today
-                    today_dt = datetime.now()
-                    next_week_dt = today_dt + timedelta(days=7)
+                        # 2. Filter for dates within the next 7 days from today
+                        today_dt = datetime.now()
+                        next_week_dt = today_dt + timedelta(days=7)
 
-                    upcoming_7_days = active_sips[
-                        (active_sips['next_instalment'] >= today_dt) & 
-                        (active_sips['next_instalment'] <= next_week_dt)
-                    ].copy()
+                        upcoming_7_days = active_sips[
+                            (active_sips['next_instalment'] >= today_dt) & 
+                            (active_sips['next_instalment'] <= next_week_dt)
+                        ].copy()
 
-                    if not upcoming_7_days.empty:
-                        # Sort by the actual date
-                        upcoming_7_days = upcoming_7_days.sort_values('next_instalment')
+                        if not upcoming_7_days.empty:
+                            # Sort by the actual date
+                            upcoming_7_days = upcoming_7_days.sort_values('next_instalment')
                         
-                        # Create the columns first
-                        u_col1, u_col2 = st.columns([1, 2.5])
+                            # Create the columns first
+                            u_col1, u_col2 = st.columns([1, 2.5])
 
-                        with u_col1:
-                            st.markdown("#### 🔔 Attention: Upcoming SIPs")
+                            with u_col1:
+                                st.markdown("#### 🔔 Attention: Upcoming SIPs")
                             
-                            total_due = upcoming_7_days['instalment_amount'].sum()
+                                total_due = upcoming_7_days['instalment_amount'].sum()
                             
-                            # Custom CSS to style the metric box border to match the table
-                            st.markdown(
-                                f"""
-                                <style>
-                                    div[data-testid="stMetric"] {{
-                                        background-color: #ffffff;
-                                        border: 2px solid #99f6e4; /* Matches table border color */
-                                        padding: 15px;
-                                        border-radius: 10px;
-                                        box-shadow: 0 2px 4px rgba(0,0,0,0.05);
-                                    }}
-                                </style>
-                                """,
-                                unsafe_allow_html=True
-                            )
+                                # Custom CSS to style the metric box border to match the table
+                                st.markdown(
+                                    f"""
+                                    <style>
+                                        div[data-testid="stMetric"] {{
+                                            background-color: #ffffff;
+                                            border: 2px solid #99f6e4; /* Matches table border color */
+                                            padding: 15px;
+                                            border-radius: 10px;
+                                            box-shadow: 0 2px 4px rgba(0,0,0,0.05);
+                                        }}
+                                    </style>
+                                    """,
+                                    unsafe_allow_html=True
+                                )
 
-                            st.metric(
-                                label="Liquidity Needed", 
-                                value=f"₹{total_due:,.0f}",
-                                help="Total amount due in the next 7 days"
-                            )
-                            st.caption("Please ensure sufficient bank balance.")
+                                st.metric(
+                                    label="Liquidity Needed", 
+                                    value=f"₹{total_due:,.0f}",
+                                    help="Total amount due in the next 7 days"
+                                )
+                                st.caption("Please ensure sufficient bank balance.")
 
-                        with u_col2:
-                            # 2. Header for the table also INSIDE the column
-                            st.markdown("#### 📅 Upcoming SIPs (Next 7 Days)")
+                            with u_col2:
+                                # 2. Header for the table also INSIDE the column
+                                st.markdown("#### 📅 Upcoming SIPs (Next 7 Days)")
 
-                            # Prepare Data
-                            disp_upcoming = upcoming_7_days[['fund', 'instalment_amount', 'next_instalment']].copy()
-                            disp_upcoming.columns = ['Fund Name', 'Amount', 'Due Date']
+                                # Prepare Data
+                                disp_upcoming = upcoming_7_days[['fund', 'instalment_amount', 'next_instalment']].copy()
+                                disp_upcoming.columns = ['Fund Name', 'Amount', 'Due Date']
+
+                                # Format columns
+                                styled_upcoming = disp_upcoming.style.format({
+                                    'Amount': '₹{:,.0f}',
+                                    'Due Date': lambda x: x.strftime('%d %b %Y') if hasattr(x, 'strftime') else str(x)
+                                })
 
-                            # Format columns
-                            styled_upcoming = disp_upcoming.style.format({
+                                # Render Table
+                                html_upcoming = ut.apply_upcoming_style(styled_upcoming).hide(axis='index').to_html()
+                                st.markdown(html_upcoming, unsafe_allow_html=True)
+                        else:
+                            st.info("✨ Your cash flow looks clear for the next 7 days. No SIPs due.")
+                    
+                        st.write("<br>", unsafe_allow_html=True)    
+
+                        # 1. Clean and Prepare Data
+                        # Sorting by instalment_day if available, then resetting index
+                        disp_sip = df_sip.sort_values(by='instalment_day').reset_index(drop=True)
+                        disp_sip = disp_sip[['fund', 'status', 'instalment_amount', 'next_instalment']].copy()
+                        disp_sip.columns = ['Fund Name', 'Status', 'Amount', 'Next Date']
+
+                        # 3. Create Styled Object
+                        # We format Amount as whole numbers and clean the Date format
+                        styled_sip_full = disp_sip.style.applymap(ut.color_status_all, subset=['Status']) \
+                            .format({
                                 'Amount': '₹{:,.0f}',
-                                'Due Date': lambda x: x.strftime('%d %b %Y') if hasattr(x, 'strftime') else str(x)
+                                'Next Date': lambda x: x.strftime('%d %b %Y') if hasattr(x, 'strftime') else str(x)
                             })
 
-                            # Render Table
-                            html_upcoming = ut.apply_upcoming_style(styled_upcoming).hide(axis='index').to_html()
-                            st.markdown(html_upcoming, unsafe_allow_html=True)
+                        # 5. Render
+                        st.markdown("### ⏱️ Complete SIP Schedule")
+                        html_sip_full = ut.apply_sip_full_style(styled_sip_full).hide(axis='index').to_html()
+                        st.markdown(html_sip_full, unsafe_allow_html=True)
+
+                        # --- SIP CASH-FLOW PROJECTION ---
+                        st.write("<br>", unsafe_allow_html=True)
+                        st.markdown("### 🔮 SIP Cash-Flow Projection")
+
+                        p_col1, p_col2 = st.columns([2, 1])
+                        with p_col1:
+                            proj_years = st.slider("Projection Horizon (Years):", min_value=1, max_value=10, value=3, key="sip_proj_years")
+                        with p_col2:
+                            proj_freq = st.radio("Group Outflows By:", ["Month", "Week"], horizontal=True, key="sip_proj_freq")
+
+                        df_flows = ut.memo_per_snapshot(
+                            "sip_flows", (snapshot_id, proj_years),
+                            lambda: sip.project_cash_flows(df_sip, months=proj_years * 12)
+                        )
+
+                        if not df_flows.empty:
+                            outflows = sip.aggregate_cash_flows(df_flows, "W" if proj_freq == "Week" else "M")
+
+                            fig_flows = go.Figure(go.Bar(
+                                x=outflows.index, y=outflows.values, marker_color='#4e73df',
+                                hovertemplate="<b>%{x|%d %b %Y}</b><br>Outflow: ₹%{y:,.0f}<extra></extra>"
+                            ))
+                            fig_flows.update_layout(
+                                height=320,
+                                margin=dict(t=10, l=10, r=10, b=10),
+                                paper_bgcolor='rgba(0,0,0,0)',
+                                plot_bgcolor='rgba(0,0,0,0)',
+                                xaxis=dict(showgrid=False, title=None),
+                                yaxis=dict(showgrid=False, title=None, tickprefix="₹")
+                            )
+                            st.plotly_chart(fig_flows, use_container_width=True)
+
+                            # Corpus growth: existing MF value plus projected instalments at NAV-based CAGR
+                            rates = ut.memo_per_snapshot(
+                                "sip_rates", snapshot_id,
+                                lambda: sip.expected_returns(pd.concat([df_flows['fund'], df_mf['fund']]) if not df_mf.empty else df_flows['fund'], MY_FUNDS)
+                            )
+                            starting_values = df_mf.groupby('fund', observed=True)['current_value'].sum() if not df_mf.empty else None
+                            df_corpus = sip.project_corpus(df_flows, rates, starting_values)
+                            total_outflow = df_flows['amount'].sum()
+                            final_corpus = df_corpus.iloc[-1].sum()
+
+                            c_col1, c_col2 = st.columns(2)
+                            c_col1.metric(f"Total SIP Outflow ({proj_years}Y)", f"₹{ut.format_indian_currency(total_outflow).split('.')[0]}")
+                            c_col2.metric("Projected MF Corpus", f"₹{ut.format_indian_currency(final_corpus).split('.')[0]}",
+                                          help="Current MF value plus projected SIPs, compounding at each fund's 5Y NAV CAGR (10% where unavailable)")
+
+                            fig_corpus = px.area(df_corpus.sum(axis=1).rename("Corpus"), template="plotly_dark")
+                            fig_corpus.update_traces(
+                                line_color='#22c55e', line_width=2, fillcolor='rgba(34, 197, 94, 0.1)',
+                                hovertemplate="<b>%{x|%b %Y}</b><br>Corpus: ₹%{y:,.0f}<extra></extra>"
+                            )
+                            fig_corpus.update_layout(
+                                showlegend=False,
+                                height=350,
+                                margin=dict(t=10, l=10, r=40, b=10),
+                                paper_bgcolor='rgba(0,0,0,0)',
+                                plot_bgcolor='rgba(0,0,0,0)',
+                                xaxis=dict(showgrid=False, title=None),
+                                yaxis=dict(showgrid=True, gridcolor="rgba(255,255,255,0.05)", title=None, side="right", tickprefix="₹")
+                            )
+                            st.plotly_chart(charts.downsample_figure(fig_corpus), use_container_width=True)
+                        else:
+                            st.info("No active SIP mandates to project.")
                     else:
-                        st.info("✨ Your cash flow looks clear for the next 7 days. No SIPs due.")
-                    
-                    st.write("<br>", unsafe_allow_html=True)    
-
-                    # 1. Clean and Prepare Data
-                    # Sorting by instalment_day if available, then resetting index
-                    disp_sip = df_sip.sort_values(by='instalment_day').reset_index(drop=True)
-                    disp_sip = disp_sip[['fund', 'status', 'instalment_amount', 'next_instalment']].copy()
-                    disp_sip.columns = ['Fund Name', 'Status', 'Amount', 'Next Date']
-
-                    # 3. Create Styled Object
-                    # We format Amount as whole numbers and clean the Date format
-                    styled_sip_full = disp_sip.style.applymap(ut.color_status_all, subset=['Status']) \
-                        .format({
-                            'Amount': '₹{:,.0f}',
-                            'Next Date': lambda x: x.strftime('%d %b %Y') if hasattr(x, 'strftime') else str(x)
-                        })
-
-                    # 5. Render
-                    st.markdown("### ⏱️ Complete SIP Schedule")
-                    html_sip_full = ut.apply_sip_full_style(styled_sip_full).hide(axis='index').to_html()
-                    st.markdown(html_sip_full, unsafe_allow_html=True)
-                else:
-                    st.info("No Mutual Fund SIPs found.")
+                        st.info("No Mutual Fund SIPs found.")
+
+            if ut.is_open(tab4):
+                with tab4, perf.timed("render.tab.risk_lab"):
+                    positions = risk.build_positions(df_eq, df_mf, MY_FUNDS)
+
+                    if not positions.empty:
+                        st.markdown("### 🛡️ Value-at-Risk")
+
+                        # 1. Risk Controls
+                        r_col1, r_col2, r_col3, r_col4 = st.columns(4)
+                        with r_col1:
+                            confidence = st.radio("Confidence:", [0.95, 0.99], format_func=lambda x: f"{x:.0%}", horizontal=True, key="var_confidence")
+                        with r_col2:
+                            horizon = st.radio("Horizon (Days):", [1, 10, 21], horizontal=True, key="var_horizon")
+                        with r_col3:
+                            n_sims = st.select_slider("MC Scenarios:", options=[10_000, 50_000, 100_000, 250_000], value=100_000, key="var_sims")
+                        with r_col4:
+                            seed_text = st.text_input("Fixed Seed (optional):", value="42", key="var_seed")
+                            seed = int(seed_text) if seed_text.strip().isdigit() else None
+
+                        with st.spinner("Simulating portfolio risk..."):
+                            try:
+                                prices = ut.memo_per_snapshot("risk_prices", snapshot_id, lambda: risk.build_price_matrix(positions))
+                                hist_res, mc_res = ut.memo_per_snapshot(
+                                    "risk_var", (snapshot_id, simulation_pct, confidence, horizon, n_sims, seed),
+                                    lambda: (
+                                        risk.historical_var(prices, positions, total_curr_combined, confidence, horizon),
+                                        risk.monte_carlo_var(prices, positions, total_curr_combined, confidence, horizon, n_sims=n_sims, seed=seed)
+                                    )
+                                )
+                            except Exception as e:
+                                st.error(f"Error loading price history: {e}")
+                                hist_res, mc_res = None, None
+
+                        if hist_res and mc_res:
+                            fmt_risk = lambda x: f"₹{ut.format_indian_currency(x).split('.')[0]}"
+
+                            v_col1, v_col2, v_col3, v_col4 = st.columns(4)
+                            v_col1.metric(f"Historical VaR ({confidence:.0%})", fmt_risk(hist_res['var']), help=f"Based on {hist_res['observations']} historical windows")
+                            v_col2.metric("Historical CVaR", fmt_risk(hist_res['cvar']), help="Average loss beyond the VaR cutoff")
+                            v_col3.metric(f"Monte Carlo VaR ({confidence:.0%})", fmt_risk(mc_res['var']), help=f"{n_sims:,} correlated scenarios")
+                            v_col4.metric("Monte Carlo CVaR", fmt_risk(mc_res['cvar']))
+
+                            # 2. Distribution Chart (pre-binned so the browser never receives raw scenarios)
+                            counts, edges = np.histogram(mc_res['returns'] * total_curr_combined, bins=80)
+                            fig_var = go.Figure(go.Bar(
+                                x=(edges[:-1] + edges[1:]) / 2, y=counts,
+                                marker_color=['#ef4444' if e < -mc_res['var'] else '#4e73df' for e in edges[:-1]],
+                                hovertemplate="P&L: ₹%{x:,.0f}<br>Scenarios: %{y:,}<extra></extra>"
+                            ))
+                            fig_var.add_vline(x=-mc_res['var'], line_dash="dot", line_color="#f6c23e",
+                                              annotation_text=f"VaR: {fmt_risk(mc_res['var'])}", annotation_font=dict(color="#f6c23e"))
+                            fig_var.update_layout(
+                                height=350, bargap=0.05,
+                                margin=dict(t=30, l=10, r=10, b=10),
+                                paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)',
+                                xaxis=dict(title=f"{horizon}-Day P&L (₹)", showgrid=False, tickprefix="₹"),
+                                yaxis=dict(title=None, showgrid=False)
+                            )
+                            st.plotly_chart(fig_var, use_container_width=True)
+                        else:
+                            st.warning("Not enough price history to estimate VaR.")
+
+                        # 3. Stress Replays
+                        st.markdown("### 🌪️ Historical Stress Tests")
+                        scenario = st.selectbox("Replay Scenario:", list(risk.STRESS_SCENARIOS.keys()), key="stress_scenario")
+
+                        with st.spinner(f"Replaying {scenario}..."):
+                            try:
+                                df_stress = ut.memo_per_snapshot(
+                                    "risk_stress", (snapshot_id, simulation_pct, scenario),
+                                    lambda: risk.run_stress_test(positions, scenario)
+                                )
+                                stress_pnl = df_stress['P&L'].sum()
+                                stress_pct = stress_pnl / df_stress['current_value'].sum() * 100
+
+                                st.metric("Portfolio Impact", f"₹{ut.format_indian_currency(stress_pnl).split('.')[0]}", delta=f"{stress_pct:+.2f}%")
+
+                                disp_stress = df_stress[['name', 'kind', 'current_value', 'Shock %', 'Stressed Value', 'P&L', 'Basis']].copy()
+                                disp_stress.columns = ['Holding', 'Type', 'Current', 'Shock %', 'Stressed', 'P&L', 'Basis']
+
+                                fmt_stress_0d = lambda x: f"₹{ut.format_indian_currency(x).split('.')[0]}"
+                                styled_stress = disp_stress.style.applymap(ut.color_pnl_custom, subset=['Shock %', 'P&L']) \
+                                    .format({
+                                        'Current': fmt_stress_0d,
+                                        'Stressed': fmt_stress_0d,
+                                        'P&L': fmt_stress_0d,
+                                        'Shock %': '{:+.2f}%'
+                                    }, na_rep="N/A")
+
+                                html_stress = ut.apply_sector_style(styled_stress).hide(axis='index').to_html()
+                                st.markdown(html_stress, unsafe_allow_html=True)
+                                st.caption(f"Holdings without prices inside the window are replayed with the {risk.PROXY_SYMBOL} move.")
+                            except Exception as e:
+                                st.error(f"Error running stress test: {e}")
+                    else:
+                        st.info("No holdings available for risk analysis.")
+
+            # Poll background refreshes and swap in new data once it lands
+            if refreshing_versions:
+                ut.watch_revalidation(refreshing_versions)
 
         else:
             st.error("Request token not found in URL.")
@@ -1095,3 +1337,6 @@ if st.session_state.get("authenticated"):
         st.error(f"Error: {e}")
 else:
     st.info("Please complete the sidebar configuration and login to view your dashboard.")
+
+ut.show_perf_panel()
+ut.show_memory_panel()
@@ -1,12 +1,15 @@
 import streamlit as st
-import yfinance as yf
-import plotly.graph_objects as go
 import utils as ut
 from styles import apply_custom_css
 import pandas as pd
 import numpy as np
-from ta.momentum import RSIIndicator
-from ta.trend import SMAIndicator, MACD
+import charts
+import indicators
+import intraday
+import metrics
+import peers
+import perf
+import screen
 
 # --- 1. INITIALIZE SESSION STATE ---
 if 'confirmed' not in st.session_state:
@@ -20,6 +23,7 @@ if 'scan_active' not in st.session_state:
 
 # Must be the first streamlit command
 st.set_page_config(page_title="Stock Screener", page_icon="🔍", layout="wide")
+perf.begin_run("screener")
 apply_custom_css()
 
 # --- TITLE & BENCHMARKS ---
@@ -40,6 +44,25 @@ with col_idx:
 
 stock_mapping = ut.get_index_tickers(index_choice)
 
+# --- PRE-MARKET RANKINGS (precomputed by screen.py) ---
+screen_file = screen.latest_screen_path(index_choice)
+if screen_file:
+    df_rank = ut.load_screen_rankings(str(screen_file), screen_file.stat().st_mtime)
+    generated_at = pd.to_datetime(df_rank['generated_at'].iloc[0]) if not df_rank.empty else None
+    with st.expander(f"🏆 Pre-market Rankings · {index_choice}" + (f" · {generated_at:%d %b %Y, %H:%M}" if generated_at is not None else "")):
+        ranked = df_rank[df_rank['error'].isna()]
+        st.dataframe(
+            ranked[['rank', 'symbol', 'company', 'score', 'recommendation', 'price', 'rsi', 'pct_from_52w_high']].rename(columns={
+                'rank': "#", 'symbol': "Symbol", 'company': "Company", 'score': "Score", 'recommendation': "Call",
+                'price': "Price", 'rsi': "RSI", 'pct_from_52w_high': "% off 52W High"
+            }).round(2),
+            hide_index=True, use_container_width=True
+        )
+        if len(ranked) < len(df_rank):
+            st.caption(f"{len(df_rank) - len(ranked)} symbols could not be screened in that run.")
+else:
+    st.caption(f"💡 Run `python screen.py --index \"{index_choice}\"` before the open to see ranked picks here.")
+
 # --- STOCK SELECTION FORM ---
 with st.form("stock_selection_form"):
     # KEY FIX: vertical_alignment="bottom" ensures the button and selectbox share the same baseline
@@ -69,18 +92,21 @@ st.markdown("<hr style='margin: 30px 0; border: 0; border-top: 1px solid rgba(25
 
 # --- FOCUS AREA (THE ANALYSIS CARD & DETAILS) ---
 if st.session_state.confirmed:
+    # The charting library loads once a stock is picked, not on the empty page
+    import plotly.graph_objects as go
+
     curr_sym = st.session_state.last_selected_symbol
     curr_idx = st.session_state.last_selected_index
     
     if curr_sym in stock_mapping:
         company_name = stock_mapping[curr_sym]
-        ticker = yf.Ticker(f"{curr_sym}.NS")
+        yf_symbol = f"{curr_sym}.NS"
         
         # Fetch Data
         try:
-            fast_info = ticker.fast_info
-            live_price = fast_info.last_price
-            prev_close = fast_info.previous_close
+            quote = ut.get_quote(yf_symbol)
+            live_price = quote['last_price']
+            prev_close = quote['previous_close']
             pct_change = ((live_price - prev_close) / prev_close) * 100
             price_color = "#1cc88a" if pct_change >= 0 else "#e74a3b"
             arrow = "▲" if pct_change >= 0 else "▼"
@@ -112,11 +138,21 @@ if st.session_state.confirmed:
 
         # 3. Conditional Tabs: Only show if scan_active is True
         if st.session_state.scan_active:
+            # Warm every tab's fetch in one concurrent round trip
+            timeframe_default = st.session_state.get("tf_selector", "1y")
+            quarterly_default = st.session_state.get("fin_view_extended", "Annual") != "Annual"
+            ut.prefetch(
+                lambda: ut.get_ohlc_history(yf_symbol, timeframe_default),
+                lambda: ut.get_ohlc_history(yf_symbol, "2y"),
+                lambda: ut.get_ticker_info(yf_symbol),
+                lambda: ut.get_financials(yf_symbol, quarterly=quarterly_default),
+                lambda: metrics.get_or_compute(curr_sym)
+            )
         # 2. Detailed Research Tabs
             st.markdown("### 🔍 Detailed Research")
             tab1, tab2, tab3, tab4 = st.tabs(["📊 Performance", "📑 Fundamentals", "⚙️ Technicals", "🎯 Recommendation"])
 
-            with tab1:
+            with tab1, perf.timed("render.tab.performance"):
                 st.subheader("📈 Historical Price Analysis")
                 
                 # 1. Create columns for Timeframe and Metrics
@@ -132,7 +168,7 @@ if st.session_state.confirmed:
                     )
                 
                 # Fetch data based on timeframe
-                hist = ticker.history(period=timeframe)
+                hist = ut.get_ohlc_history(yf_symbol, timeframe)
                 
                 if not hist.empty:
                     # --- 2. PERFORMANCE CALCULATIONS ---
@@ -164,39 +200,43 @@ if st.session_state.confirmed:
                         else:
                             st.metric("CAGR", f"{cagr:.2f}%")
 
-                    # --- 4. RENDER CHART ---
-                    fig = go.Figure()
-                    fig.add_trace(go.Scatter(
-                        x=hist.index, 
-                        y=hist['Close'], 
-                        name="Close", 
-                        line=dict(color='#36b9cc', width=2),
-                        fill='tozeroy',
-                        fillcolor='rgba(54, 185, 204, 0.1)'
-                    ))
+                    # --- 4. RENDER CHART (rebuilt only when the price series changes) ---
+                    def build_price_fig():
+                        fig = go.Figure()
+                        fig.add_trace(go.Scatter(
+                            x=hist.index, 
+                            y=hist['Close'], 
+                            name="Close", 
+                            line=dict(color='#36b9cc', width=2),
+                            fill='tozeroy',
+                            fillcolor='rgba(54, 185, 204, 0.1)'
+                        ))
                     
-                    fig.update_layout(
-                        template="plotly_white", 
-                        height=450, 
-                        margin=dict(l=60, r=20, t=10, b=50), # Adjusted left margin for Y-axis labels
-                        xaxis_title="Date", 
-                        yaxis_title="Price (₹)",
-                        hovermode="x unified",
-                        yaxis=dict(
-                            autorange=True,
-                            fixedrange=False,
-                            zeroline=False,
-                            tickformat=',.0f' # Added comma formatting for thousands
-                        ),
-                        xaxis=dict(showgrid=False)
-                    )
-                    st.plotly_chart(fig, use_container_width=True)
+                        fig.update_layout(
+                            template="plotly_white", 
+                            height=450, 
+                            margin=dict(l=60, r=20, t=10, b=50), # Adjusted left margin for Y-axis labels
+                            xaxis_title="Date", 
+                            yaxis_title="Price (₹)",
+                            hovermode="x unified",
+                            yaxis=dict(
+                                autorange=True,
+                                fixedrange=False,
+                                zeroline=False,
+                                tickformat=',.0f' # Added comma formatting for thousands
+                            ),
+                            xaxis=dict(showgrid=False)
+                        )
+                        return charts.downsample_figure(fig)
+
+                    st.plotly_chart(charts.memo_figure("price_history", build_price_fig, hist['Close']), use_container_width=True)
                 else:
                     st.warning(f"No historical data found for '{timeframe}'.")
 
-            with tab2:
+            with tab2, perf.timed("render.tab.fundamentals"):
                 st.subheader("🧮 Key Financial Metrics")
-                info = ticker.info
+                # Derived ratios come precomputed from the nightly metrics table (metrics.py)
+                m = metrics.get_or_compute(curr_sym)
     
                 # --- 1. Top-Level Metrics (4 Column Layout) ---
                 col1, col2, col3, col4 = st.columns(4)
@@ -220,33 +260,31 @@ if st.session_state.confirmed:
                 # Column 1: Valuation
                 #col1.metric("Market Cap", ut.format_val(info.get('marketCap'), prefix="₹", suffix=" Cr", decimals=0, is_crore=True))
                 # Calculation: Divide by 10^7 to get raw Crores
-                mcap_raw = info.get('marketCap', 0) / 10**7
+                mcap_raw = m['market_cap_cr'] or 0
 
                 # Formatting: Apply Indian grouping and strip decimals
                 mcap_formatted = f"₹{ut.format_indian_currency(mcap_raw).split('.')[0]} Cr"
 
                 # Display
                 col1.metric("Market Cap", mcap_formatted)
-                col1.metric("P/E Ratio", ut.format_val(info.get('trailingPE')))
-                col1.metric("PEG Ratio", ut.format_val(info.get('pegRatio')))
+                col1.metric("P/E Ratio", ut.format_val(m['trailing_pe']))
+                col1.metric("PEG Ratio", ut.format_val(m['peg_ratio']))
 
                 # Column 2: Price Performance
-                col2.metric("52W High", ut.format_val(info.get('fiftyTwoWeekHigh'), prefix="₹"))
-                col2.metric("52W Low", ut.format_val(info.get('fiftyTwoWeekLow'), prefix="₹"))
-                col2.metric("Price to Book", ut.format_val(info.get('priceToBook')))
+                col2.metric("52W High", ut.format_val(m['high_52w'], prefix="₹"))
+                col2.metric("52W Low", ut.format_val(m['low_52w'], prefix="₹"))
+                col2.metric("Price to Book", ut.format_val(m['price_to_book']))
 
                 # Column 3: Profitability
-                col3.metric("ROE (%)", ut.format_val(info.get('returnOnEquity', 0) * 100, suffix="%"))
+                col3.metric("ROE (%)", ut.format_val(m['roe_pct'], suffix="%"))
                 # ROCE proxy using ROA if direct ROCE is unavailable in info
-                col3.metric("ROCE/ROA (%)", ut.format_val(info.get('returnOnAssets', 0) * 100, suffix="%"))
-                col3.metric("Div. Yield", ut.format_val(info.get('dividendYield', 0), suffix="%"))
+                col3.metric("ROCE/ROA (%)", ut.format_val(m['roa_pct'], suffix="%"))
+                col3.metric("Div. Yield", ut.format_val(m['dividend_yield'], suffix="%"))
 
                 # Column 4: Health & Earnings
-                col4.metric("Trailing EPS", ut.format_val(info.get('trailingEps'), prefix="₹"))
-                # debtToEquity is often returned as a percentage-base (e.g. 40.0 for 0.4)
-                d_e_raw = info.get('debtToEquity')
-                d_e_val = d_e_raw / 100 if isinstance(d_e_raw, (int, float)) else None
-                col4.metric("Debt to Equity", ut.format_val(d_e_val))
+                col4.metric("Trailing EPS", ut.format_val(m['trailing_eps'], prefix="₹"))
+                # Already normalized from Yahoo's percentage base (40.0 -> 0.4)
+                col4.metric("Debt to Equity", ut.format_val(m['debt_to_equity']))
 
                 #st.markdown("---")
                 
@@ -258,7 +296,7 @@ if st.session_state.confirmed:
                 st.subheader(f"📊 {finance_view} Performance & Growth")
 
                 try:
-                    df_fin = ticker.financials if finance_view == "Annual" else ticker.quarterly_financials
+                    df_fin = ut.get_financials(yf_symbol, quarterly=finance_view != "Annual")
 
                     if not df_fin.empty:
                         # 3. Data Selection & Calculation
@@ -341,41 +379,52 @@ if st.session_state.confirmed:
                 except Exception as e:
                     st.error(f"Error rendering financial table: {e}")
 
-            with tab3:
+                # --- 3. Peer Comparison (same sector within the selected index) ---
+                try:
+                    # One cached matrix per index, rebuilt only when the nightly metrics change
+                    matrix = ut.get_fundamentals_matrix(tuple(stock_mapping), peers.version())
+                    comparison = peers.compare(matrix, curr_sym)
+                    if comparison is not None:
+                        df_peers, percentiles = comparison
+                        st.subheader(f"👥 Peer Comparison · {matrix.at[curr_sym, 'sector']}")
+                        df_peers.index = [stock_mapping.get(s, s) if s != "Sector median" else s for s in df_peers.index]
+                        st.dataframe(
+                            df_peers.style.format("{:.2f}", na_rep="N/A")
+                                .apply(lambda row: ["font-weight: 700; background-color: #ccfbf1" if row.name in (company_name, "Sector median") else "" for _ in row], axis=1),
+                            use_container_width=True
+                        )
+
+                        st.markdown(f"**{company_name} · percentile within sector** (100 = highest value among peers)")
+                        pct_cols = st.columns(len(percentiles))
+                        for col, (label, pct) in zip(pct_cols, percentiles.items()):
+                            col.metric(label, "N/A" if pd.isna(pct) else f"{pct:.0f}")
+                        st.caption(f"Peers are the {curr_idx} stocks in this sector with materialized metrics ({len(matrix)} of {len(stock_mapping)} constituents); run `python metrics.py` nightly to cover the rest.")
+                except Exception as e:
+                    st.error(f"Error building peer comparison: {e}")
+
+            with tab3, perf.timed("render.tab.technicals"):
                 st.subheader("⚡ Technical Analysis Indicators")
+                bar_size = st.radio("Bars:", options=["Daily", *intraday.INTERVALS], horizontal=True, key="tech_bars")
+                is_daily = bar_size == "Daily"
+                bar_name = "Day" if is_daily else f"× {bar_size}"
                 
-                # 1. Fetch historical data (2 year needed for SMA 200)
-                hist_data = ticker.history(period="2y")
+                # 1. Fetch historical data (2 year needed for SMA 200; intraday keeps the last few sessions)
+                hist_data = ut.get_ohlc_history(yf_symbol, "2y") if is_daily else intraday.get_bars(yf_symbol, bar_size)
 
                 if not hist_data.empty:
                     try:
                         # 2. CALCULATIONS
-                        # RSI
-                        rsi_io = RSIIndicator(close=hist_data['Close'], window=14)
-                        hist_data['RSI'] = rsi_io.rsi()
-
-                        # MACD
-                        macd_io = MACD(close=hist_data['Close'])
-                        curr_macd = macd_io.macd().iloc[-1]
-                        curr_signal = macd_io.macd_signal().iloc[-1]
-
-                        # Moving Averages: 20, 50, and 200
-                        sma20_io = SMAIndicator(close=hist_data['Close'], window=20)
-                        hist_data['SMA20'] = sma20_io.sma_indicator()
-
-                        sma50_io = SMAIndicator(close=hist_data['Close'], window=50)
-                        hist_data['SMA50'] = sma50_io.sma_indicator()
-
-                        sma200_io = SMAIndicator(close=hist_data['Close'], window=200)
-                        hist_data['SMA200'] = sma200_io.sma_indicator()
-
-                        # Get latest values for the display
-                        current_price = hist_data['Close'].iloc[-1]
-                        current_rsi = hist_data['RSI'].iloc[-1]
-                        val_sma20 = hist_data['SMA20'].iloc[-1]
-                        val_sma50 = hist_data['SMA50'].iloc[-1]
-                        val_sma200 = hist_data['SMA200'].iloc[-1]
-                        beta = ticker.info.get('beta', 'N/A')
+                        # RSI and Moving Averages: 20, 50, and 200 (series for the chart below)
+                        ut.add_indicators(hist_data)
+
+                        # Live readings: the stored indicator state with the live price as the current bar
+                        live = indicators.live_reading(curr_sym, hist_data, live_price, interval="1d" if is_daily else bar_size)
+                        curr_macd, curr_signal = live['macd'], live['macd_signal']
+                        current_price = live['close']
+                        current_rsi = live['rsi']
+                        val_sma20, val_sma50, val_sma200 = live['sma20'], live['sma50'], live['sma200']
+                        m = metrics.get_or_compute(curr_sym)  # Beta is materialized nightly
+                        beta = m['beta'] if m['beta'] is not None else 'N/A'
 
                         # --- ROW 1: Momentum & Risk (3 Columns) ---
                         r1_col1, r1_col2, r1_col3 = st.columns(3)
@@ -436,30 +485,34 @@ if st.session_state.confirmed:
 
                         with r2_col1:
                             dist_20 = ((current_price - val_sma20) / val_sma20) * 100
-                            st.metric(label="20 Day SMA", value=f"₹{val_sma20:,.2f}", 
+                            st.metric(label=f"20 {bar_name} SMA", value=f"₹{val_sma20:,.2f}", 
                                     delta=f"{dist_20:+.1f}% vs Price")
 
                         with r2_col2:
                             dist_50 = ((current_price - val_sma50) / val_sma50) * 100
-                            st.metric(label="50 Day SMA", value=f"₹{val_sma50:,.2f}", 
+                            st.metric(label=f"50 {bar_name} SMA", value=f"₹{val_sma50:,.2f}", 
                                     delta=f"{dist_50:+.1f}% vs Price")
 
                         with r2_col3:
                             if not pd.isna(val_sma200):
                                 dist_200 = ((current_price - val_sma200) / val_sma200) * 100
-                                st.metric(label="200 Day SMA", value=f"₹{val_sma200:,.2f}", 
+                                st.metric(label=f"200 {bar_name} SMA", value=f"₹{val_sma200:,.2f}", 
                                         delta=f"{dist_200:+.1f}% vs Price")
                             else:
-                                st.metric("200 Day SMA", "N/A", delta="Insufficient Data")
+                                st.metric(f"200 {bar_name} SMA", "N/A", delta="Insufficient Data")
 
                         st.write("<br>", unsafe_allow_html=True)
                         # --- 5. INTERACTIVE TECHNICAL CHART ---
-                        st.write("#### 📈 Price vs Moving Averages (Last 200 Days)")
+                        if is_daily:
+                            st.write("#### 📈 Price vs Moving Averages (Last 200 Days)")
+                        else:
+                            sessions = hist_data.index.normalize().nunique()
+                            st.write(f"#### 📈 Price vs Moving Averages (Last {sessions} Sessions, {bar_size} Bars)")
                         
                         try:
 
-                            # Filter data to the last 200 days for clarity
-                            plot_data = hist_data.tail(200)
+                            # Filter data to the last 200 days for clarity; intraday bars are bucketed to a point budget
+                            plot_data = hist_data.tail(200) if is_daily else intraday.downsample(hist_data)
 
                             fig = go.Figure()
 
@@ -503,7 +556,8 @@ if st.session_state.confirmed:
                                 showgrid=False, 
                                 showline=True, 
                                 linecolor='black',
-                                linewidth=1
+                                linewidth=1,
+                                rangebreaks=None if is_daily else intraday.RANGEBREAKS
                             ),
                             # Y-Axis settings: Grid removed
                             yaxis=dict(
@@ -515,7 +569,7 @@ if st.session_state.confirmed:
                             )
                         )
 
-                            st.plotly_chart(fig, use_container_width=True)
+                            st.plotly_chart(charts.downsample_figure(fig), use_container_width=True)
 
                         except Exception as chart_err:
                             st.error(f"Could not render chart: {chart_err}")
@@ -525,39 +579,21 @@ if st.session_state.confirmed:
                 else:
                     st.warning("No historical data available for this ticker.")
 
-            with tab4:
+            with tab4, perf.timed("render.tab.recommendation"):
                 st.subheader("🧭 Investment Recommendation Engine")
-                info = ticker.info
+                info = ut.get_ticker_info(yf_symbol)
                 # 1. Fetch historical data (2 year needed for SMA 200)
-                hist_data = ticker.history(period="2y")
+                hist_data = ut.get_ohlc_history(yf_symbol, "2y")
                 
-                # RSI
-                rsi_io = RSIIndicator(close=hist_data['Close'], window=14)
-                hist_data['RSI'] = rsi_io.rsi()
-
-                # Moving Averages: 20, 50, and 200
-                sma20_io = SMAIndicator(close=hist_data['Close'], window=20)
-                hist_data['SMA20'] = sma20_io.sma_indicator()
-
-                sma50_io = SMAIndicator(close=hist_data['Close'], window=50)
-                hist_data['SMA50'] = sma50_io.sma_indicator()
-
-                sma200_io = SMAIndicator(close=hist_data['Close'], window=200)
-                hist_data['SMA200'] = sma200_io.sma_indicator()
+                # Latest RSI, SMAs and MACD from the stored streaming state (no full-window recompute)
+                state = indicators.advance(curr_sym, hist_data)
                 
                 # Calculate scores
-                pros, cons, total_score = ut.analyze_stock(ticker.info, hist_data)
+                pros, cons, total_score = ut.analyze_stock(info, hist_data, state.values() if state else None)
                 max_score = 17
                 
                 # 1. Logic to define the label and theme keys
-                if total_score >= 13:
-                    rec_text, theme_key = "STRONG BUY", "STRONG BUY"
-                elif total_score >= 9:
-                    rec_text, theme_key = "BUY", "BUY"
-                elif total_score >= 5:
-                    rec_text, theme_key = "HOLD", "HOLD"
-                else:
-                    rec_text, theme_key = "SELL / AVOID", "SELL / AVOID"
+                rec_text = theme_key = ut.recommendation(total_score)
 
                 # 2. Refined Aesthetic Theme Map
                 theme_map = {
@@ -630,3 +666,6 @@ if st.session_state.confirmed:
 else:
 
     st.info("Please select an index and stock, then click 'Confirm Selection'.")
+
+ut.show_perf_panel()
+ut.show_memory_panel()
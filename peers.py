@@ -0,0 +1,59 @@
+import pandas as pd
+import classification
+import metrics
+import store
+
+# Peer comparison for the Screener's Fundamentals tab. One fundamentals matrix per
+# index (symbol x ratio, from the nightly symbol_metrics rows) carries every stock's
+# within-sector percentiles, computed in a single groupby, so a view is a slice of a
+# cached frame rather than a ticker.info call per peer. Symbols the metrics job has
+# not materialized yet are simply absent until its next run.
+
+FIELDS = {
+    'trailing_pe': "P/E",
+    'price_to_book': "P/B",
+    'roe_pct': "ROE %",
+    'debt_to_equity': "D/E",
+    'profit_margin_pct': "Net Margin %",
+    'operating_margin_pct': "Op. Margin %",
+    'revenue_growth_pct': "Revenue Growth %",
+    'earnings_growth_pct': "Earnings Growth %",
+}
+
+
+def version():
+    """Changes whenever symbol_metrics is written; part of the matrix cache key."""
+    df = store.run_query("SELECT MAX(as_of) AS latest, COUNT(*) AS n FROM symbol_metrics")
+    return f"{df['latest'].iloc[0]}:{df['n'].iloc[0]}"
+
+
+def fundamentals_matrix(symbols):
+    """Symbol-indexed frame of FIELDS, sector, market cap and `<field>_pctile` (0-100 within sector)."""
+    df = metrics.read_all(symbols).set_index('symbol')
+    df = df[['sector', 'market_cap_cr', *FIELDS]].astype({f: "float64" for f in FIELDS})
+
+    # Sectors from the local classification table (NSE's taxonomy), else Yahoo's translated into it
+    classified = classification.read(df.index)
+    nse_sector = classified.set_index('symbol')['sector'] if not classified.empty else pd.Series(dtype=object)
+    yahoo_sector = df['sector'].map(lambda s: classification.nse_sector(s) if isinstance(s, str) else None)
+    df['sector'] = df.index.to_series().map(nse_sector).fillna(yahoo_sector).fillna(classification.UNKNOWN_SECTOR)
+
+    pctiles = df.groupby('sector')[list(FIELDS)].rank(pct=True) * 100
+    return df.join(pctiles.add_suffix('_pctile'))
+
+
+def compare(matrix, symbol):
+    """(peer table with a sector-median row, the symbol's percentile per field), or None if unknown.
+
+    Peers are every stock of the matrix in the symbol's sector, largest first.
+    """
+    if symbol not in matrix.index:
+        return None
+    sector = matrix.at[symbol, 'sector']
+    peers = matrix[matrix['sector'] == sector].sort_values('market_cap_cr', ascending=False)
+
+    table = peers[list(FIELDS)].copy()
+    table.loc["Sector median"] = table.median()
+    percentiles = matrix.loc[symbol, [f"{f}_pctile" for f in FIELDS]].astype("float64")
+    percentiles.index = list(FIELDS)
+    return table.rename(columns=FIELDS), percentiles.rename(FIELDS)
@@ -0,0 +1,217 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from functools import wraps
+import pandas as pd
+
+# Process-wide hot-path instrumentation. Off by default (HUB_PERF=1 or the sidebar toggle
+# turns it on); when off, every hook is a single flag check.
+
+MAX_EVENTS = 5000
+
+_enabled = os.environ.get("HUB_PERF", "0") == "1"
+_lock = threading.Lock()
+_events = deque(maxlen=MAX_EVENTS)
+_stats = {}
+_local = threading.local()
+_origin = time.perf_counter()
+
+
+def is_enabled():
+    return _enabled
+
+
+def enable(on=True):
+    global _enabled
+    _enabled = bool(on)
+
+
+def reset():
+    with _lock:
+        _events.clear()
+        _stats.clear()
+
+
+def _stat(name, category):
+    stat = _stats.get(name)
+    if stat is None:
+        stat = _stats[name] = {
+            'name': name, 'category': category, 'calls': 0, 'total_s': 0.0, 'max_s': 0.0,
+            'bytes': 0, 'hits': 0, 'misses': 0, 'errors': 0,
+        }
+    return stat
+
+
+def payload_bytes(value):
+    """Approximate size of an upstream answer (frames by memory, dicts/lists as JSON)."""
+    try:
+        if isinstance(value, pd.DataFrame):
+            return int(value.memory_usage(deep=True).sum())
+        if isinstance(value, pd.Series):
+            return int(value.memory_usage(deep=True))
+        if isinstance(value, (dict, list)):
+            return len(json.dumps(value, default=str))
+    except Exception:
+        pass
+    return 0
+
+
+class Span:
+    """One timed section; call `add_payload()` inside the block to attribute fetched bytes."""
+
+    __slots__ = ("name", "category", "start", "bytes")
+
+    def __init__(self, name, category):
+        self.name = name
+        self.category = category
+        self.bytes = 0
+
+    def add_payload(self, value):
+        self.bytes += payload_bytes(value)
+
+    def __enter__(self):
+        if self.category == "upstream":
+            # Any upstream call inside a cached wrapper means that wrapper missed
+            for scope in getattr(_local, "scopes", ()):
+                scope[1] = True
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.start
+        with _lock:
+            stat = _stat(self.name, self.category)
+            stat['calls'] += 1
+            stat['total_s'] += duration
+            stat['max_s'] = max(stat['max_s'], duration)
+            stat['bytes'] += self.bytes
+            stat['errors'] += exc_type is not None
+            _events.append((self.name, self.category, self.start - _origin, duration,
+                            threading.get_ident(), self.bytes, exc_type is not None))
+        return False
+
+
+class _NoopSpan:
+    def add_payload(self, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def timed(name, category="render"):
+    """Context manager timing a section: `with perf.timed("render.equity_tab"): ...`."""
+    return Span(name, category) if _enabled else _NOOP
+
+
+def instrument(name, category="render"):
+    """Decorator form of `timed`."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with Span(name, category):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_cache(name, hit):
+    if not _enabled:
+        return
+    with _lock:
+        stat = _stat(name, "cache")
+        stat['hits' if hit else 'misses'] += 1
+
+
+def cached(name):
+    """Wraps an `st.cache_data` function to count hits and misses.
+
+    A call is a miss when an upstream call ran underneath it, so the cached
+    function's body needs no changes.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            scopes = getattr(_local, "scopes", None)
+            if scopes is None:
+                scopes = _local.scopes = []
+            scope = [name, False]
+            scopes.append(scope)
+            try:
+                with Span(name, "cache"):
+                    return fn(*args, **kwargs)
+            finally:
+                scopes.pop()
+                record_cache(name, hit=not scope[1])
+        wrapper.clear = getattr(fn, "clear", None)
+        return wrapper
+    return decorator
+
+
+def begin_run(page):
+    """Marks the start of a script run so the panel can report the total page time."""
+    _local.run = (page, time.perf_counter())
+
+
+def end_run():
+    run = getattr(_local, "run", None)
+    if run is None or not _enabled:
+        return
+    page, start = run
+    span = Span(f"page.{page}", "page")
+    span.start = start
+    span.__exit__(None, None, None)
+    _local.run = None
+
+
+# --- REPORTING & EXPORT ---
+def summary():
+    """Aggregated stats per instrumented name, slowest first."""
+    with _lock:
+        rows = [dict(s) for s in _stats.values()]
+    if not rows:
+        return pd.DataFrame(columns=['name', 'category', 'calls', 'total_s', 'avg_ms', 'max_s', 'bytes', 'hit_rate'])
+    df = pd.DataFrame(rows)
+    df['avg_ms'] = df['total_s'] / df['calls'].where(df['calls'] > 0) * 1000
+    lookups = df['hits'] + df['misses']
+    df['hit_rate'] = df['hits'] / lookups.where(lookups > 0)
+    return df.sort_values('total_s', ascending=False).reset_index(drop=True)
+
+
+def export_json():
+    with _lock:
+        stats = [dict(s) for s in _stats.values()]
+        events = list(_events)
+    payload = {
+        'stats': stats,
+        'events': [
+            {'name': n, 'category': c, 'start_s': round(s, 6), 'duration_s': round(d, 6), 'thread': t, 'bytes': b, 'error': e}
+            for n, c, s, d, t, b, e in events
+        ],
+    }
+    return json.dumps(payload, indent=1)
+
+
+def export_chrome_trace():
+    """Trace Event Format JSON, loadable in chrome://tracing or Perfetto."""
+    with _lock:
+        events = list(_events)
+    pid = os.getpid()
+    trace = [
+        {'name': n, 'cat': c, 'ph': "X", 'ts': round(s * 1e6, 1), 'dur': round(d * 1e6, 1),
+         'pid': pid, 'tid': t, 'args': {'bytes': b, 'error': e}}
+        for n, c, s, d, t, b, e in events
+    ]
+    return json.dumps({'traceEvents': trace, 'displayTimeUnit': "ms"})
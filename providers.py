@@ -0,0 +1,434 @@
+import io
+import json
+import os
+import threading
+import time
+from pathlib import Path
+import pandas as pd
+import fetch
+import perf
+import resilience
+import singleflight
+
+# Every upstream market-data call (Yahoo, mfapi, NSE index lists, Kite) goes through the
+# active provider, so caching, batching, instrumentation or replay can be swapped in here.
+# yfinance and kiteconnect are imported on first live use: together they add ~0.4 s to
+# a cold start, and replay mode or the Home page never needs them.
+#
+#   HUB_PROVIDER=live    (default) network backends; Streamlit's cache sits above them in utils
+#   HUB_PROVIDER=cached  live backends behind an in-process TTL cache (jobs, CLI, notebooks)
+#   HUB_PROVIDER=replay  recorded fixtures only (HUB_FIXTURES_DIR, default benchmarks/fixtures)
+
+FIXTURES_DIR = Path(os.environ.get("HUB_FIXTURES_DIR", Path(__file__).resolve().parent / "benchmarks" / "fixtures"))
+MFAPI_URL = "https://api.mfapi.in/mf/{scheme_code}"
+
+
+class MarketDataProvider:
+    """Interface implemented by every backend."""
+
+    name = "base"
+
+    def ticker_info(self, yf_symbol):
+        """yfinance `Ticker.info` dict."""
+        raise NotImplementedError
+
+    def quote(self, yf_symbol):
+        """Latest price and previous close: {'last_price': ..., 'previous_close': ...}."""
+        raise NotImplementedError
+
+    def history(self, yf_symbol, period=None, interval="1d", start=None, end=None):
+        """OHLCV frame for one symbol with flat columns."""
+        raise NotImplementedError
+
+    def closes(self, yf_symbols, period=None, interval="1d", start=None, end=None):
+        """Wide frame of adjusted closes, one column per symbol (in the order given)."""
+        raise NotImplementedError
+
+    def financials(self, yf_symbol, quarterly=False):
+        raise NotImplementedError
+
+    def nav_payload(self, scheme_code):
+        """Raw mfapi JSON for a mutual fund scheme."""
+        raise NotImplementedError
+
+    def index_constituents(self, url):
+        """NSE index constituent CSV as a DataFrame."""
+        raise NotImplementedError
+
+    def kite_session(self, api_key):
+        """A KiteConnect-compatible client."""
+        raise NotImplementedError
+
+
+def _flatten(data):
+    if isinstance(data.columns, pd.MultiIndex):
+        data = data.copy()
+        data.columns = data.columns.get_level_values(0)
+    return data
+
+
+def _closes_frame(data, symbols):
+    if data.empty:
+        return pd.DataFrame(columns=symbols)
+    # Handle both Single and Multi-index DataFrames from yfinance
+    closes = data['Close']
+    if isinstance(closes, pd.Series):
+        closes = closes.to_frame(name=symbols[0])
+    return closes.reindex(columns=symbols)
+
+
+# Yahoo throttles by answering with empty payloads; these raise EmptyResponse inside the
+# fetch call so they are never cached, and a burst of them counts as throttling
+def _empty(what, yf_symbol):
+    return resilience.EmptyResponse(f"Yahoo returned no {what} for {yf_symbol}", key=str(yf_symbol))
+
+
+# Ticker endpoints (info, fast_info, financials) carry yfinance's own per-request timeout
+def _info(yf_symbol):
+    import yfinance as yf
+    info = yf.Ticker(yf_symbol).info
+    if not info or all(v is None for v in info.values()):
+        raise _empty("info", yf_symbol)
+    return info
+
+
+def _quote(yf_symbol):
+    import yfinance as yf
+    fast_info = yf.Ticker(yf_symbol).fast_info
+    if fast_info.last_price is None:
+        raise _empty("quote", yf_symbol)
+    return {'last_price': fast_info.last_price, 'previous_close': fast_info.previous_close}
+
+
+def _download(yf_symbols, **kwargs):
+    import yfinance as yf
+    data = yf.download(yf_symbols, progress=False, auto_adjust=True, timeout=fetch.host_timeout("yahoo"), **kwargs)
+    if data.empty or data['Close'].isna().all(axis=None):
+        raise _empty("prices", yf_symbols)
+    return data
+
+
+def _financials(yf_symbol, quarterly):
+    import yfinance as yf
+    ticker = yf.Ticker(yf_symbol)
+    data = ticker.quarterly_financials if quarterly else ticker.financials
+    if data is None or data.empty:
+        raise _empty("financials", yf_symbol)
+    return data
+
+
+class LiveProvider(MarketDataProvider):
+    """yfinance, mfapi, NSE archives and KiteConnect over the network.
+
+    Every call goes through the fetch layer (per-host limits, timeouts, retries), and
+    empty Yahoo answers raise `resilience.EmptyResponse` instead of being returned.
+    """
+
+    name = "live"
+
+    def ticker_info(self, yf_symbol):
+        return fetch.call_sync("yahoo", _info, yf_symbol)
+
+    def quote(self, yf_symbol):
+        return fetch.call_sync("yahoo", _quote, yf_symbol)
+
+    def history(self, yf_symbol, period=None, interval="1d", start=None, end=None):
+        kwargs = {'start': start, 'end': end} if start else {'period': period or "1y"}
+        data = fetch.call_sync("yahoo", _download, yf_symbol, interval=interval, **kwargs)
+        return _flatten(data)
+
+    def closes(self, yf_symbols, period=None, interval="1d", start=None, end=None):
+        symbols = list(yf_symbols)
+        if not symbols:
+            return pd.DataFrame()
+        kwargs = {'start': start, 'end': end} if start else {'period': period or "5y"}
+        data = fetch.call_sync("yahoo", _download, symbols, interval=interval, **kwargs)
+        return _closes_frame(data, symbols)
+
+    def financials(self, yf_symbol, quarterly=False):
+        return fetch.call_sync("yahoo", _financials, yf_symbol, quarterly)
+
+    def nav_payload(self, scheme_code):
+        return fetch.get_json(MFAPI_URL.format(scheme_code=scheme_code), "mfapi")
+
+    def index_constituents(self, url):
+        data = pd.read_csv(io.StringIO(fetch.get_text(url, "nse")))
+        if data.empty:
+            raise resilience.EmptyResponse(f"NSE returned an empty constituent list for {url}", key=url)
+        return data
+
+    def kite_session(self, api_key):
+        from kiteconnect import KiteConnect
+        return KiteConnect(api_key=api_key, timeout=fetch.host_timeout("kite"))
+
+
+class CachingProvider(MarketDataProvider):
+    """Decorates another provider with a thread-safe in-process TTL cache."""
+
+    name = "cached"
+
+    # Seconds each kind of answer stays fresh
+    TTLS = {
+        'ticker_info': 3600,
+        'quote': 60,
+        'history': 900,
+        'closes': 21600,
+        'financials': 86400,
+        'nav_payload': 21600,
+        'index_constituents': 86400,
+    }
+
+    def __init__(self, inner, ttls=None):
+        self.inner = inner
+        self.ttls = {**self.TTLS, **(ttls or {})}
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def _cached(self, method, *args):
+        key = (method, args)
+        now = time.monotonic()
+        with self._lock:
+            hit = self._cache.get(key)
+            if hit is not None and now - hit[0] < self.ttls[method]:
+                perf.record_cache(f"provider.{method}", hit=True)
+                return hit[1]
+
+        perf.record_cache(f"provider.{method}", hit=False)
+        value = getattr(self.inner, method)(*args)
+        with self._lock:
+            self._cache[key] = (now, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def ticker_info(self, yf_symbol):
+        return self._cached('ticker_info', yf_symbol)
+
+    def quote(self, yf_symbol):
+        return self._cached('quote', yf_symbol)
+
+    def history(self, yf_symbol, period=None, interval="1d", start=None, end=None):
+        return self._cached('history', yf_symbol, period, interval, start, end)
+
+    def closes(self, yf_symbols, period=None, interval="1d", start=None, end=None):
+        return self._cached('closes', tuple(yf_symbols), period, interval, start, end)
+
+    def financials(self, yf_symbol, quarterly=False):
+        return self._cached('financials', yf_symbol, quarterly)
+
+    def nav_payload(self, scheme_code):
+        return self._cached('nav_payload', str(scheme_code))
+
+    def index_constituents(self, url):
+        return self._cached('index_constituents', url)
+
+    def kite_session(self, api_key):
+        return self.inner.kite_session(api_key)
+
+
+class ProviderWrapper(MarketDataProvider):
+    """Base for providers that decorate another one; every call funnels through `_call`."""
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.name = inner.name
+
+    def _call(self, method, *args):
+        return getattr(self.inner, method)(*args)
+
+    # Arguments are passed positionally and normalized so equal requests compare equal
+    def ticker_info(self, yf_symbol):
+        return self._call('ticker_info', yf_symbol)
+
+    def quote(self, yf_symbol):
+        return self._call('quote', yf_symbol)
+
+    def history(self, yf_symbol, period=None, interval="1d", start=None, end=None):
+        return self._call('history', yf_symbol, period, interval, start, end)
+
+    def closes(self, yf_symbols, period=None, interval="1d", start=None, end=None):
+        return self._call('closes', tuple(yf_symbols), period, interval, start, end)
+
+    def financials(self, yf_symbol, quarterly=False):
+        return self._call('financials', yf_symbol, bool(quarterly))
+
+    def nav_payload(self, scheme_code):
+        return self._call('nav_payload', str(scheme_code))
+
+    def index_constituents(self, url):
+        return self._call('index_constituents', url)
+
+    def kite_session(self, api_key):
+        return self.inner.kite_session(api_key)
+
+
+class InstrumentedProvider(ProviderWrapper):
+    """Times every call on another provider and attributes the bytes it returned."""
+
+    def _call(self, method, *args):
+        if not perf.is_enabled():
+            return getattr(self.inner, method)(*args)
+        with perf.timed(f"{self.name}.{method}", "upstream") as span:
+            value = getattr(self.inner, method)(*args)
+            span.add_payload(value)
+        return value
+
+
+class CoalescingProvider(ProviderWrapper):
+    """Single-flight: concurrent identical requests (kind + symbol + window) share one call."""
+
+    def __init__(self, inner):
+        super().__init__(inner)
+        self.group = singleflight.Group()
+
+    def _call(self, method, *args):
+        return self.group.do((method, args), lambda: getattr(self.inner, method)(*args))
+
+
+class ReplayProvider(MarketDataProvider):
+    """Serves recorded fixtures (see benchmarks/record_fixtures.py); never touches the network.
+
+    Per-key recordings (`yf_history_<SYMBOL>.csv`, `yf_info_<SYMBOL>.json`,
+    `mfapi_nav_<CODE>.json`, `index_<NAME>.csv`) win over the generic ones; intraday
+    bars are recorded per interval (`yf_history_1m.csv`, `yf_history_5m.csv`, ...).
+    """
+
+    name = "replay"
+
+    def __init__(self, fixtures_dir=FIXTURES_DIR):
+        self.fixtures_dir = Path(fixtures_dir)
+
+    def _path(self, stem, key, suffix):
+        specific = self.fixtures_dir / f"{stem}_{key}{suffix}"
+        return specific if key is not None and specific.exists() else self.fixtures_dir / f"{stem}{suffix}"
+
+    def _json(self, stem, key=None):
+        path = self._path(stem, key, ".json")
+        return json.loads(path.read_text()) if path.exists() else None
+
+    def _window(self, data, period=None, start=None, end=None):
+        if start:
+            data = data[data.index >= pd.Timestamp(start)]
+            return data[data.index < pd.Timestamp(end)] if end else data
+        if period and period != "max" and not data.empty:
+            unit = {'d': "days", 'mo': "months", 'y': "years"}
+            for suffix, name in unit.items():
+                if period.endswith(suffix) and period[:-len(suffix)].isdigit():
+                    cutoff = data.index[-1] - pd.DateOffset(**{name: int(period[:-len(suffix)])})
+                    return data[data.index > cutoff]
+        return data
+
+    def ticker_info(self, yf_symbol):
+        return self._json("yf_info", yf_symbol) or {}
+
+    def quote(self, yf_symbol):
+        closes = self.history(yf_symbol)['Close']
+        if len(closes) < 2:
+            return {'last_price': None, 'previous_close': None}
+        return {'last_price': float(closes.iloc[-1]), 'previous_close': float(closes.iloc[-2])}
+
+    def history(self, yf_symbol, period=None, interval="1d", start=None, end=None):
+        # Intraday bars come from their own recordings (`yf_history_5m.csv`, ...)
+        stem = "yf_history" if interval == "1d" else f"yf_history_{interval}"
+        path = self._path(stem, yf_symbol, ".csv")
+        if not path.exists():
+            return pd.DataFrame(columns=['Open', 'High', 'Low', 'Close', 'Volume'])
+        data = pd.read_csv(path, index_col=0, parse_dates=True)
+        return self._window(data, period, start, end)
+
+    def closes(self, yf_symbols, period=None, interval="1d", start=None, end=None):
+        symbols = list(yf_symbols)
+        if not symbols:
+            return pd.DataFrame()
+        frames = {s: self.history(s, period, interval, start, end)['Close'] for s in symbols}
+        return pd.DataFrame(frames).reindex(columns=symbols)
+
+    def financials(self, yf_symbol, quarterly=False):
+        stem = "yf_quarterly_financials" if quarterly else "yf_financials"
+        path = self._path(stem, yf_symbol, ".csv")
+        return pd.read_csv(path, index_col=0) if path.exists() else pd.DataFrame()
+
+    def nav_payload(self, scheme_code):
+        return self._json("mfapi_nav", scheme_code) or {'data': []}
+
+    def index_constituents(self, url):
+        name = Path(url).stem
+        path = self._path("index", name, ".csv")
+        if path.exists():
+            return pd.read_csv(path)
+        # Fall back to the recorded equity holdings as a stand-in index
+        holdings = self._json("kite_holdings") or []
+        symbols = [h['tradingsymbol'] for h in holdings]
+        return pd.DataFrame({'Symbol': symbols, 'Company Name': symbols})
+
+    def kite_session(self, api_key):
+        return ReplayKite(self)
+
+
+class ReplayKite:
+    """KiteConnect stand-in serving the recorded Kite payloads."""
+
+    def __init__(self, provider):
+        self.provider = provider
+
+    def login_url(self):
+        return "#"
+
+    def generate_session(self, request_token, api_secret=None):
+        return {'access_token': "replay"}
+
+    def set_access_token(self, access_token):
+        pass
+
+    def profile(self):
+        return {'user_id': "REPLAY", 'user_name': "Recorded Fixtures", 'broker': "-", 'email': "-"}
+
+    def holdings(self):
+        return self.provider._json("kite_holdings") or []
+
+    def mf_holdings(self):
+        return self.provider._json("kite_mf_holdings") or []
+
+    def mf_sips(self):
+        return self.provider._json("kite_mf_sips") or []
+
+
+_BACKENDS = {
+    "live": LiveProvider,
+    "cached": lambda: CachingProvider(LiveProvider()),
+    "replay": ReplayProvider,
+}
+
+_active = None
+_active_lock = threading.Lock()
+
+
+def _wrap(backend):
+    # Coalescing sits above instrumentation so only real upstream calls are timed
+    return CoalescingProvider(InstrumentedProvider(backend))
+
+
+def configure(name_or_provider):
+    """Selects the process-wide provider by name ('live', 'cached', 'replay') or instance."""
+    global _active
+    provider = _BACKENDS[name_or_provider]() if isinstance(name_or_provider, str) else name_or_provider
+    provider = _wrap(provider)
+    with _active_lock:
+        _active = provider
+    return provider
+
+
+def get_provider():
+    global _active
+    with _active_lock:
+        if _active is None:
+            _active = _wrap(_BACKENDS[os.environ.get("HUB_PROVIDER", "live")]())
+        return _active
+
+
+def coalescing_stats():
+    """Requests seen by the single-flight layer and how many upstream calls it saved."""
+    return get_provider().group.stats()
+
@@ -0,0 +1,246 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+import pandas as pd
+import requests
+import perf
+
+# Upstream protection shared by the whole process: an adaptive token bucket and a
+# circuit breaker per host (used by fetch.call), and a last-known-good store that
+# serves the previous answer while an upstream is throttling or down.
+#
+# Nothing here ever caches a failure: throttled and empty answers raise, so
+# st.cache_data and the provider caches only ever keep real results.
+
+
+class UpstreamError(Exception):
+    """An upstream answered in a way that must not be treated (or cached) as data."""
+
+
+class Throttled(UpstreamError):
+    """The upstream is rate limiting us (HTTP 429 or yfinance's rate-limit error)."""
+
+
+class EmptyResponse(UpstreamError):
+    """An empty frame or info dict where data was expected.
+
+    Yahoo throttles by answering empty, but a delisted ticker or an index without
+    financials is empty too. Only a burst over several symbols (see EmptyBurst) marks
+    one as `burst`, and only then does it count as throttling.
+    """
+
+    def __init__(self, message, key=None):
+        super().__init__(message)
+        self.key = key
+        self.burst = False
+
+
+class CircuitOpen(UpstreamError):
+    """The host's breaker is open; the call failed fast without touching the network."""
+
+
+def is_throttle_signal(exc):
+    if isinstance(exc, EmptyResponse):
+        return exc.burst
+    if isinstance(exc, Throttled):
+        return True
+    if type(exc).__name__ == "YFRateLimitError" or "Too Many Requests" in str(exc):
+        return True
+    response = getattr(exc, "response", None)
+    return (getattr(response, "status_code", None) or getattr(exc, "code", None)) == 429
+
+
+def is_transient(exc):
+    """Failures worth falling back on: throttling, timeouts, dropped connections, 5xx."""
+    if isinstance(exc, EmptyResponse):
+        return exc.burst
+    if isinstance(exc, (UpstreamError, TimeoutError, requests.ConnectionError, requests.Timeout)):
+        return True
+    if is_throttle_signal(exc):
+        return True
+    response = getattr(exc, "response", None)
+    status = getattr(response, "status_code", None) or getattr(exc, "code", None)
+    return isinstance(status, int) and status >= 500
+
+
+class TokenBucket:
+    """Thread-safe token bucket whose rate halves on throttling and creeps back on success.
+
+    `reserve()` never blocks: it books a token (the balance may go negative) and
+    returns how long the caller must wait, so it works from threads and the event loop.
+    """
+
+    def __init__(self, rate, burst, min_rate=0.2, recovery=0.05):
+        self.base_rate = float(rate)
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.min_rate = min_rate
+        self.recovery = recovery  # Fraction of the base rate regained per success
+        self.throttled = 0
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self):
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.base_rate, self.rate + self.base_rate * self.recovery)
+
+    def on_throttle(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = min(self._tokens, 0.0)  # Drop any saved-up burst
+            self.throttled += 1
+
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive transient failures and fails fast while open.
+
+    After the cooldown one probe call is let through (half-open); its outcome closes
+    the breaker or reopens it with a doubled cooldown (capped at `max_cooldown`).
+    """
+
+    def __init__(self, threshold=5, cooldown=30, max_cooldown=300):
+        self.threshold = threshold
+        self.base_cooldown = cooldown
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.trips = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if self.probing or time.monotonic() - self.opened_at >= self.cooldown:
+            return "half-open"
+        return "open"
+
+    def before_call(self, host):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            remaining = self.cooldown - (time.monotonic() - self.opened_at)
+            if remaining > 0 or self.probing:
+                raise CircuitOpen(f"{host} circuit open; retrying in {max(remaining, 0):.0f}s")
+            self.probing = True
+
+    def on_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+            self.cooldown = self.base_cooldown
+
+    def on_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.probing:
+                self.cooldown = min(self.max_cooldown, self.cooldown * 2)
+                self.opened_at = time.monotonic()
+                self.probing = False
+                self.trips += 1
+            elif self.opened_at is None and self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+                self.trips += 1
+
+
+class EmptyBurst:
+    """Tells throttling (empty answers for many symbols at once) from a symbol that has no data.
+
+    Empty answers for `distinct` different keys within `window` seconds, with no real
+    answer in between, are a burst.
+    """
+
+    def __init__(self, distinct=5, window=60):
+        self.distinct = distinct
+        self.window = window
+        self._recent = {}  # key -> monotonic time of its latest empty answer
+        self._lock = threading.Lock()
+
+    def record(self, key):
+        """Notes an empty answer for `key`; returns whether it is part of a burst."""
+        now = time.monotonic()
+        with self._lock:
+            self._recent[key] = now
+            self._recent = {k: t for k, t in self._recent.items() if now - t <= self.window}
+            return len(self._recent) >= self.distinct
+
+    def reset(self):
+        with self._lock:
+            self._recent.clear()
+
+
+# --- LAST KNOWN GOOD ---
+def _copy(value):
+    return value.copy() if isinstance(value, (pd.DataFrame, pd.Series, dict)) else value
+
+
+class LastKnownGood:
+    """Bounded LRU of the latest successful answer per key."""
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._values = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, key, value):
+        with self._lock:
+            self._values[key] = value
+            self._values.move_to_end(key)
+            while len(self._values) > self.maxsize:
+                self._values.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            value = self._values.get(key)
+        return None if value is None else _copy(value)
+
+
+def last_known_good(name, default=None, maxsize=256):
+    """Decorates a cached fetcher so transient failures serve the previous good answer.
+
+    Sits *outside* `st.cache_data`: failures raise through the cache (so they are never
+    stored) and the fallback is only returned to this caller. Empty answers fall back too. Without a previous answer
+    `default()` is returned when given, otherwise the error propagates.
+    """
+    def decorator(fn):
+        store = LastKnownGood(maxsize)
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items())))
+            try:
+                value = fn(*args, **kwargs)
+            except Exception as e:
+                # A symbol with no data gets the same stand-in as an outage
+                if not (is_transient(e) or isinstance(e, EmptyResponse)):
+                    raise
+                stale = store.get(key)
+                perf.record_cache(f"{name}.last_good", hit=stale is not None)
+                if stale is not None:
+                    return stale
+                if default is not None:
+                    return default()
+                raise
+            store.put(key, value)
+            return value
+
+        wrapper.clear = getattr(fn, "clear", None)
+        return wrapper
+    return decorator
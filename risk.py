@@ -0,0 +1,175 @@
+import numpy as np
+import pandas as pd
+import utils as ut
+
+# Named historical drawdown windows replayed against current holdings
+STRESS_SCENARIOS = {
+    "COVID Crash (Mar 2020)": ("2020-02-19", "2020-03-23"),
+    "Global Financial Crisis (2008)": ("2008-01-08", "2008-10-27"),
+    "Taper Tantrum (2013)": ("2013-05-20", "2013-08-28"),
+    "Demonetisation Shock (2016)": ("2016-11-08", "2016-12-26"),
+    "Russia-Ukraine Selloff (2022)": ("2022-01-17", "2022-03-07"),
+}
+
+# Assets without data inside a stress window are replayed with this benchmark
+PROXY_SYMBOL = "^NSEI"
+
+
+def build_positions(df_eq, df_mf, fund_codes):
+    """Combines equity and MF holdings into one position table weighted by current_value."""
+    frames = []
+
+    if not df_eq.empty:
+        frames.append(pd.DataFrame({
+            'name': df_eq['tradingsymbol'].astype(str).values,
+            'kind': 'Equity',
+            'source_key': (df_eq['tradingsymbol'].astype(str) + ".NS").values,
+            'current_value': df_eq['current_value'].values
+        }))
+
+    if not df_mf.empty:
+        # Kite fund names are matched case-insensitively against the curated scheme codes
+        codes = {name.upper(): code for name, code in fund_codes.items()}
+        frames.append(pd.DataFrame({
+            'name': df_mf['fund'].astype(str).values,
+            'kind': 'Mutual Fund',
+            'source_key': df_mf['fund'].str.upper().map(codes).values,
+            'current_value': df_mf['current_value'].values
+        }))
+
+    if not frames:
+        return pd.DataFrame(columns=['name', 'kind', 'source_key', 'current_value', 'weight'])
+
+    positions = pd.concat(frames, ignore_index=True)
+    positions = positions[positions['current_value'] > 0].reset_index(drop=True)
+    positions['weight'] = positions['current_value'] / positions['current_value'].sum()
+    return positions
+
+
+def build_price_matrix(positions, start=None, end=None, period="5y"):
+    """Aligned daily price/NAV matrix with one column per position (by row index).
+
+    Positions without a price (an unknown ticker, an unmapped fund or a failed NAV fetch)
+    get no column, and the risk measures renormalize weights over the rest.
+    """
+    # 1. Equities in one batched Yahoo download
+    eq_keys = tuple(positions.loc[positions['kind'] == 'Equity', 'source_key'])
+    closes = ut.get_close_history(eq_keys, start=start, end=end, period=period) if eq_keys else pd.DataFrame()
+
+    # 2. Mutual funds from the cached mfapi history, fetched concurrently
+    mf_keys = positions.loc[positions['kind'] != 'Equity', 'source_key']
+    navs = ut.get_nav_histories(k for k in mf_keys if isinstance(k, str))
+    series = {}
+    for i, row in positions.iterrows():
+        if row['kind'] == 'Equity':
+            if row['source_key'] in closes.columns:
+                series[i] = closes[row['source_key']]
+        elif isinstance(row['source_key'], str):
+            df_nav = navs[row['source_key']]
+            if not isinstance(df_nav, Exception):
+                series[i] = df_nav.set_index('date')['nav']
+
+    if not series:
+        return pd.DataFrame()
+
+    # 3. Union calendar, forward-filled so NSE and AMFI holidays line up
+    prices = pd.DataFrame(series).sort_index().ffill()
+    prices.index = pd.to_datetime(prices.index).tz_localize(None)
+    if start:
+        prices = prices.loc[start:end]
+    elif period.endswith("y"):
+        # mfapi returns full history; trim to the same lookback as the equity download
+        prices = prices.loc[prices.index.max() - pd.DateOffset(years=int(period[:-1])):]
+    return prices
+
+
+def portfolio_returns(prices, positions, horizon=1):
+    """Historical portfolio returns over `horizon` days, renormalizing weights to priced assets."""
+    log_rets = np.log(prices).diff().dropna(how='all').dropna(axis=1, how='all').fillna(0.0)
+    if log_rets.empty:
+        return pd.Series(dtype=float)
+
+    weights = positions.loc[log_rets.columns, 'weight'].to_numpy()
+    weights = weights / weights.sum()
+
+    # Overlapping horizon windows compound log returns before converting back
+    if horizon > 1:
+        log_rets = log_rets.rolling(horizon).sum().dropna()
+    return pd.Series(np.expm1(log_rets.to_numpy()) @ weights, index=log_rets.index)
+
+
+def _var_cvar(returns, confidence, portfolio_value):
+    cutoff = np.quantile(returns, 1 - confidence)
+    tail = returns[returns <= cutoff]
+    var = -cutoff * portfolio_value
+    cvar = -tail.mean() * portfolio_value if len(tail) else var
+    return var, cvar
+
+
+def historical_var(prices, positions, portfolio_value, confidence=0.95, horizon=1):
+    """Historical-simulation VaR/CVaR in rupees over the given horizon."""
+    returns = portfolio_returns(prices, positions, horizon).to_numpy()
+    if len(returns) == 0:
+        return None
+
+    var, cvar = _var_cvar(returns, confidence, portfolio_value)
+    return {'var': var, 'cvar': cvar, 'returns': returns, 'observations': len(returns)}
+
+
+def _cholesky(cov):
+    # Clip tiny negative eigenvalues so short or collinear histories still factorize
+    vals, vecs = np.linalg.eigh(cov)
+    vals = np.clip(vals, 1e-12, None)
+    return np.linalg.cholesky((vecs * vals) @ vecs.T)
+
+
+def monte_carlo_var(prices, positions, portfolio_value, confidence=0.95, horizon=1,
+                    n_sims=100_000, seed=None, batch_size=25_000):
+    """Monte Carlo VaR/CVaR from correlated normal log returns, simulated in NumPy batches."""
+    log_rets = np.log(prices).diff().dropna(how='all').dropna(axis=1, how='all').fillna(0.0)
+    if len(log_rets) < 2:
+        return None
+
+    weights = positions.loc[log_rets.columns, 'weight'].to_numpy()
+    weights = weights / weights.sum()
+
+    # 1. Daily moments scaled to the horizon
+    mu = log_rets.mean().to_numpy() * horizon
+    chol = _cholesky(np.cov(log_rets.to_numpy(), rowvar=False, ddof=1).reshape(len(mu), len(mu)) * horizon)
+
+    # 2. Batched correlated draws -> per-asset simple returns -> portfolio return
+    rng = np.random.default_rng(seed)
+    sims = np.empty(n_sims)
+    for lo in range(0, n_sims, batch_size):
+        hi = min(lo + batch_size, n_sims)
+        z = rng.standard_normal((hi - lo, len(mu)))
+        sims[lo:hi] = np.expm1(mu + z @ chol.T) @ weights
+
+    var, cvar = _var_cvar(sims, confidence, portfolio_value)
+    return {'var': var, 'cvar': cvar, 'returns': sims, 'observations': len(log_rets)}
+
+
+def run_stress_test(positions, scenario_name):
+    """Replays a named historical window on current holdings; returns per-position impact."""
+    start, end = STRESS_SCENARIOS[scenario_name]
+    prices = build_price_matrix(positions, start=start, end=end)
+
+    # Benchmark move stands in for assets that did not exist (or were not priced) in the window
+    proxy = ut.get_close_history((PROXY_SYMBOL,), start=start, end=end)[PROXY_SYMBOL].dropna()
+    proxy_ret = float(proxy.iloc[-1] / proxy.iloc[0] - 1) if len(proxy) > 1 else np.nan
+
+    result = positions[['name', 'kind', 'current_value']].copy()
+    result['Shock %'] = proxy_ret * 100
+    result['Basis'] = f"Proxy ({PROXY_SYMBOL})"
+
+    for i in result.index:
+        if i in prices.columns:
+            window = prices[i].dropna()
+            # Require the asset to be priced at the very start of the window
+            if len(window) > 1 and window.index[0] <= pd.Timestamp(start) + pd.Timedelta(days=7):
+                result.loc[i, 'Shock %'] = (window.iloc[-1] / window.iloc[0] - 1) * 100
+                result.loc[i, 'Basis'] = "Actual"
+
+    result['Stressed Value'] = result['current_value'] * (1 + result['Shock %'] / 100)
+    result['P&L'] = result['Stressed Value'] - result['current_value']
+    return result.sort_values('P&L').reset_index(drop=True)
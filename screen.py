@@ -0,0 +1,135 @@
+"""Headless index screen: scores every constituent with the Screener's rules and ranks them.
+
+    python screen.py                                  # NIFTY 50 -> data/screens/nifty_50.parquet
+    python screen.py --index "NIFTY 50" --index "NIFTY NEXT 50" --format csv
+    HUB_PROVIDER=replay python screen.py              # offline, from recorded fixtures
+
+Schedule it before the open so the Screener page loads rankings instantly, e.g. cron:
+
+    30 8 * * 1-5  cd /path/to/Investment_hub && python screen.py --index "NIFTY 50" --index "NIFTY NEXT 50"
+
+Scores come from the nightly `symbol_metrics` rows (metrics.py) when fresh; anything
+missing is computed through the same fetchers as the app (utils -> provider -> fetch),
+so the rate limiter, circuit breaker, coalescing and caches all apply. HUB_PROVIDER
+defaults to `cached` here so repeated lookups within a run stay in-process.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+import pandas as pd
+import fetch
+import metrics
+import perf
+import store
+import utils as ut
+
+SCREENS_DIR = store.DATA_DIR / "screens"
+INDICES = ["NIFTY 50", "NIFTY NEXT 50", "NIFTY BANK", "NIFTY MIDCAP 150"]
+
+COLUMNS = ['rank', 'symbol', 'company', 'score', 'recommendation', 'price', 'rsi', 'sma50', 'sma200',
+           'pct_from_52w_high', 'pros', 'cons', 'error', 'generated_at']
+
+
+def _slug(index_name):
+    return index_name.lower().replace(" ", "_")
+
+
+def parquet_available():
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def screen_symbol(symbol, company):
+    """One row of the screen for an NSE symbol; failures are recorded, not raised."""
+    row = {'symbol': symbol, 'company': company}
+    try:
+        # One indexed lookup when the nightly metrics job has run; computed otherwise
+        m = metrics.get_or_compute(symbol)
+        if m['score'] is None:
+            raise ValueError("no price history or fundamentals")
+    except Exception as e:
+        row['error'] = str(e)[:200]
+        return row
+
+    row.update({k: m[k] for k in ('score', 'recommendation', 'rsi', 'sma50', 'sma200', 'pct_from_52w_high', 'pros', 'cons')})
+    row['price'] = m['close']
+    return row
+
+
+def run_screen(index_name):
+    """Ranked screen of one index (best score first); symbols that failed sort last."""
+    constituents = ut.get_index_tickers(index_name) or {}
+    rows = fetch.gather([lambda s=s, c=c: screen_symbol(s, c) for s, c in constituents.items()])
+    df = pd.DataFrame(rows).reindex(columns=COLUMNS)
+    df = df.sort_values(['score', 'rsi'], ascending=[False, True], na_position='last').reset_index(drop=True)
+    df['rank'] = range(1, len(df) + 1)
+    df['generated_at'] = datetime.now().isoformat(timespec="seconds")
+    return df
+
+
+def screen_path(index_name, fmt="parquet"):
+    return SCREENS_DIR / f"{_slug(index_name)}.{fmt}"
+
+
+def write_screen(df, index_name, fmt="auto"):
+    if fmt == "auto":
+        fmt = "parquet" if parquet_available() else "csv"
+    SCREENS_DIR.mkdir(parents=True, exist_ok=True)
+    path = screen_path(index_name, fmt)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    # Write then rename, so the page never reads a half-written file
+    if fmt == "parquet":
+        df.to_parquet(tmp, index=False)
+    else:
+        df.to_csv(tmp, index=False)
+    os.replace(tmp, path)
+    # Drop an older file in the other format so readers never pick up a stale one
+    other = screen_path(index_name, "csv" if fmt == "parquet" else "parquet")
+    if other.exists():
+        other.unlink()
+    return path
+
+
+def latest_screen_path(index_name):
+    """Path of the precomputed screen for an index, or None."""
+    for fmt in ("parquet", "csv"):
+        path = screen_path(index_name, fmt)
+        if path.exists():
+            return path
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--index", action="append", choices=INDICES,
+                        help="index to screen (repeatable; default NIFTY 50)")
+    parser.add_argument("--format", choices=["auto", "parquet", "csv"], default="auto",
+                        help="output format (auto: Parquet when pyarrow is installed)")
+    parser.add_argument("--top", type=int, default=10, help="rows to print per index")
+    parser.add_argument("--timings", action="store_true", help="print the per-call perf breakdown")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("HUB_PROVIDER", "cached")  # Read on the first provider call
+    perf.enable()
+    for index_name in args.index or ["NIFTY 50"]:
+        started = time.perf_counter()
+        df = run_screen(index_name)
+        path = write_screen(df, index_name, args.format)
+        failed = int(df['error'].notna().sum())
+        print(f"{index_name}: screened {len(df)} symbols in {time.perf_counter() - started:.1f}s "
+              f"({len(df) - failed} ok, {failed} failed) -> {path}")
+        print(df.head(args.top)[['rank', 'symbol', 'score', 'recommendation', 'price', 'rsi']].to_string(index=False))
+
+    if args.timings:
+        summary = perf.summary()
+        print(summary[['name', 'category', 'calls', 'total_s', 'avg_ms', 'hit_rate']].head(20).to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
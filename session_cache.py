@@ -0,0 +1,132 @@
+import os
+import sys
+import threading
+import weakref
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+# Byte-budgeted, LRU-evicted cache for heavy per-session results (memoized sections,
+# frames, histories). Each session's cache lives in its st.session_state, so it is
+# freed with the session; a weak registry lets one global cap span every session.
+#
+#   HUB_SESSION_BUDGET_MB  per-session budget (default 64)
+#   HUB_GLOBAL_BUDGET_MB   cap across all live sessions (default 512)
+
+MB = 1024 * 1024
+SESSION_BUDGET = int(float(os.environ.get("HUB_SESSION_BUDGET_MB", 64)) * MB)
+GLOBAL_BUDGET = int(float(os.environ.get("HUB_GLOBAL_BUDGET_MB", 512)) * MB)
+
+STATE_KEY = "_session_cache"
+
+_lock = threading.RLock()
+_sessions = weakref.WeakValueDictionary()
+_clock = 0
+
+
+def estimate_bytes(value, _depth=0):
+    """Approximate memory held by a value; frames and arrays are measured deeply."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True, index=True).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if _depth < 4:
+        if isinstance(value, dict):
+            return sys.getsizeof(value) + sum(estimate_bytes(k, _depth + 1) + estimate_bytes(v, _depth + 1) for k, v in value.items())
+        if isinstance(value, (list, tuple, set, frozenset)):
+            return sys.getsizeof(value) + sum(estimate_bytes(v, _depth + 1) for v in value)
+    return sys.getsizeof(value)
+
+
+def _tick():
+    global _clock
+    _clock += 1
+    return _clock
+
+
+class SessionCache:
+    """One session's entries: name -> (key, value, bytes, last used)."""
+
+    def __init__(self, session_id, budget=SESSION_BUDGET):
+        self.session_id = session_id
+        self.budget = budget
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.evictions = 0
+
+    def get(self, name, key):
+        """The stored value when its key still matches, else None."""
+        with _lock:
+            entry = self.entries.get(name)
+            if entry is None or entry[0] != key:
+                return None
+            self.entries[name] = (entry[0], entry[1], entry[2], _tick())
+            self.entries.move_to_end(name)
+            return entry[1]
+
+    def put(self, name, key, value):
+        """Stores a value (replacing any older key for `name`) and enforces both budgets."""
+        size = estimate_bytes(value)
+        with _lock:
+            self._drop(name)
+            if size > self.budget:
+                return  # Too big to keep; the caller still has the value
+            self.entries[name] = (key, value, size, _tick())
+            self.nbytes += size
+            while self.nbytes > self.budget:
+                self._evict_oldest()
+            _enforce_global_budget()
+
+    def _drop(self, name):
+        entry = self.entries.pop(name, None)
+        if entry is not None:
+            self.nbytes -= entry[2]
+
+    def _evict_oldest(self):
+        name = next(iter(self.entries))
+        self._drop(name)
+        self.evictions += 1
+
+    def clear(self):
+        with _lock:
+            self.entries.clear()
+            self.nbytes = 0
+
+    def usage(self):
+        """Entries as a DataFrame (name, KB), most recently used first."""
+        with _lock:
+            rows = [{'name': name, 'kb': round(entry[2] / 1024, 1)} for name, entry in reversed(self.entries.items())]
+        return pd.DataFrame(rows, columns=['name', 'kb'])
+
+
+def _enforce_global_budget():
+    # Evicts the least recently used entry across all sessions until under the cap
+    caches = list(_sessions.values())
+    total = sum(c.nbytes for c in caches)
+    while total > GLOBAL_BUDGET:
+        victim = min((c for c in caches if c.entries), key=lambda c: next(iter(c.entries.values()))[3], default=None)
+        if victim is None:
+            return
+        before = victim.nbytes
+        victim._evict_oldest()
+        total -= before - victim.nbytes
+
+
+def for_session(state, session_id):
+    """The cache stored in a session's state, created and registered on first use."""
+    cache = state.get(STATE_KEY)
+    if cache is None:
+        cache = state[STATE_KEY] = SessionCache(session_id)
+    with _lock:
+        _sessions[session_id] = cache
+    return cache
+
+
+def global_usage():
+    """Bytes, entries and evictions per live session."""
+    with _lock:
+        rows = [{'session': sid[:8], 'entries': len(c.entries), 'mb': round(c.nbytes / MB, 2), 'evictions': c.evictions}
+                for sid, c in _sessions.items()]
+    return pd.DataFrame(rows, columns=['session', 'entries', 'mb', 'evictions'])
@@ -0,0 +1,152 @@
+import numpy as np
+import pandas as pd
+import store
+import utils as ut
+
+# Months between instalments; weekly mandates are handled on a 7-day grid
+FREQUENCY_MONTHS = {"monthly": 1, "quarterly": 3, "half-yearly": 6, "yearly": 12}
+WEEKLY = "weekly"
+
+# Optional list of exchange/bank holidays (one `date` column); weekends are always skipped
+HOLIDAYS_FILE = store.DATA_DIR / "market_holidays.csv"
+DEFAULT_EXPECTED_RETURN = 0.10
+
+
+def load_holidays():
+    if not HOLIDAYS_FILE.exists():
+        return np.array([], dtype='datetime64[D]')
+    dates = pd.to_datetime(pd.read_csv(HOLIDAYS_FILE)['date'], errors='coerce').dropna()
+    return dates.values.astype('datetime64[D]')
+
+
+def _month_grid_dates(month_index, day):
+    """Calendar dates for absolute month numbers, clamping the day to the month's length."""
+    month_start = month_index.astype('datetime64[M]').astype('datetime64[D]')
+    next_start = (month_index + 1).astype('datetime64[M]').astype('datetime64[D]')
+    days_in_month = (next_start - month_start).astype(int)
+    return month_start + (np.minimum(day, days_in_month) - 1).astype('timedelta64[D]')
+
+
+def project_cash_flows(df_sip, months=12, start=None, holidays=None):
+    """Expands every active mandate into dated instalments over the next `months` months.
+
+    Month-end days are clamped (a 31st mandate pays on 30 Apr / 28 Feb) and dates
+    falling on weekends or holidays roll forward to the next business day.
+    """
+    columns = ['sip_id', 'fund', 'date', 'amount']
+    active = df_sip[df_sip['status'].str.upper() == 'ACTIVE'].copy() if not df_sip.empty else df_sip
+    if active.empty:
+        return pd.DataFrame(columns=columns)
+
+    start = pd.Timestamp(start or pd.Timestamp.today()).normalize()
+    end = start + pd.DateOffset(months=months)
+    start_d, end_d = np.datetime64(start.date()), np.datetime64(end.date())
+
+    # 1. Per-mandate anchors: the broker's next instalment date, else the current month
+    day_raw = pd.to_numeric(active['instalment_day'], errors='coerce')
+    has_day = day_raw.between(1, 31)
+    anchor = pd.to_datetime(active['next_instalment'], errors='coerce')
+    anchor = anchor.fillna(start.replace(day=1)).dt.normalize()
+    day = day_raw.where(has_day, anchor.dt.day).astype(int)
+
+    frequency = active.get('frequency', pd.Series("monthly", index=active.index)).fillna("monthly").str.lower()
+    step_months = frequency.map(FREQUENCY_MONTHS).fillna(1).astype(int).to_numpy()
+    is_weekly = (frequency == WEEKLY).to_numpy()
+
+    # 2. Broadcast mandates x instalment number on one grid
+    n_steps = months * 5 + 2  # enough rows for weekly mandates too
+    k = np.arange(n_steps)
+    anchor_d = anchor.values.astype('datetime64[D]')
+    anchor_month = anchor.values.astype('datetime64[M]').astype(int)
+
+    monthly_dates = _month_grid_dates(anchor_month[:, None] + k[None, :] * step_months[:, None], day.to_numpy()[:, None])
+    weekly_dates = anchor_d[:, None] + (k * 7).astype('timedelta64[D]')[None, :]
+    dates = np.where(is_weekly[:, None], weekly_dates, monthly_dates)
+
+    # 3. Respect finite mandates (instalments == -1 means perpetual)
+    pending = pd.to_numeric(active.get('pending_instalments', pd.Series(-1, index=active.index)), errors='coerce')
+    total = pd.to_numeric(active.get('instalments', pd.Series(-1, index=active.index)), errors='coerce')
+    remaining = np.where((total.fillna(-1) < 0) | pending.isna(), n_steps, pending.fillna(n_steps)).astype(int)
+    upcoming = dates >= start_d
+    instalment_no = np.cumsum(upcoming, axis=1)
+    valid = upcoming & (dates < end_d) & (instalment_no <= remaining[:, None])
+
+    rows, cols = np.nonzero(valid)
+    paid_on = np.busday_offset(dates[rows, cols], 0, roll='forward',
+                               holidays=load_holidays() if holidays is None else holidays)
+
+    flows = pd.DataFrame({
+        'sip_id': active['sip_id'].to_numpy()[rows] if 'sip_id' in active else rows,
+        'fund': active['fund'].to_numpy()[rows],
+        'date': pd.to_datetime(paid_on),
+        'amount': pd.to_numeric(active['instalment_amount'], errors='coerce').fillna(0).to_numpy()[rows]
+    })
+    return flows.sort_values(['date', 'fund']).reset_index(drop=True)
+
+
+def aggregate_cash_flows(flows, freq="M"):
+    """Total outflow per week ('W') or month ('M')."""
+    if flows.empty:
+        return pd.Series(dtype=float)
+    rule = "W-SUN" if freq == "W" else "MS"
+    return flows.set_index('date')['amount'].resample(rule).sum()
+
+
+def expected_returns(funds, fund_codes, lookback_years=5, default=DEFAULT_EXPECTED_RETURN):
+    """Annualized NAV CAGR per fund from cached mfapi history, with a default for unmapped funds."""
+    codes = {name.upper(): code for name, code in fund_codes.items()}
+    funds = pd.unique(pd.Series(funds))
+    navs = ut.get_nav_histories(c for c in (codes.get(str(f).upper()) for f in funds) if c)
+    rates = {}
+    for fund in funds:
+        code = codes.get(str(fund).upper())
+        rate = default
+        if code:
+            try:
+                df_nav = navs[code]
+                if isinstance(df_nav, Exception):
+                    raise df_nav
+                window = df_nav[df_nav['date'] >= df_nav['date'].max() - pd.DateOffset(years=lookback_years)]
+                years = (window['date'].iloc[-1] - window['date'].iloc[0]).days / 365.25
+                if years >= 1:
+                    rate = (window['nav'].iloc[-1] / window['nav'].iloc[0]) ** (1 / years) - 1
+            except Exception:
+                pass
+        rates[fund] = rate
+    return pd.Series(rates, dtype=float)
+
+
+def project_corpus(flows, rates, starting_values=None, start=None):
+    """Month-end corpus per fund from projected instalments compounding at each fund's rate.
+
+    Every flow is discounted to `start`, cumulated per month, and grown back to each
+    checkpoint, so the whole projection is a few (months x funds) array operations.
+    """
+    start = pd.Timestamp(start or pd.Timestamp.today()).normalize()
+    if flows.empty:
+        return pd.DataFrame()
+
+    funds = sorted(set(flows['fund']) | set(starting_values.index if starting_values is not None else []))
+    growth = (1 + rates.reindex(funds).fillna(DEFAULT_EXPECTED_RETURN)).to_numpy()
+
+    # 1. Present value of every instalment at the projection start
+    years_from_start = (flows['date'] - start).dt.days.to_numpy() / 365.25
+    fund_idx = pd.Index(funds).get_indexer(flows['fund'])
+    pv = flows['amount'].to_numpy() / growth[fund_idx] ** years_from_start
+
+    # 2. Month buckets x funds, cumulated through time
+    checkpoints = pd.date_range(start, flows['date'].max(), freq="ME")
+    if len(checkpoints) == 0 or checkpoints[-1] < flows['date'].max():
+        checkpoints = checkpoints.append(pd.DatetimeIndex([flows['date'].max()]))
+    bucket = np.searchsorted(checkpoints.values, flows['date'].values)
+    pv_grid = np.zeros((len(checkpoints), len(funds)))
+    np.add.at(pv_grid, (bucket, fund_idx), pv)
+    cum_pv = pv_grid.cumsum(axis=0)
+
+    if starting_values is not None:
+        cum_pv += starting_values.reindex(funds).fillna(0).to_numpy()[None, :]
+
+    # 3. Grow the cumulative PV forward to each checkpoint
+    t = ((checkpoints - start).days.to_numpy() / 365.25)[:, None]
+    corpus = cum_pv * growth[None, :] ** t
+    return pd.DataFrame(corpus, index=checkpoints, columns=funds)
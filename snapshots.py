@@ -0,0 +1,208 @@
+import hashlib
+import json
+from contextlib import closing
+from datetime import datetime
+import pandas as pd
+import fetch
+import perf
+import store
+
+# Natural key of each Kite payload within an account; a row version is only appended
+# when its content changes. Every row and run also carries the account's user_id, so
+# accounts sharing one store never tombstone or see each other's rows.
+SNAPSHOT_KEYS = {
+    "profile": ["user_id"],
+    "holdings": ["exchange", "tradingsymbol"],
+    "mf_holdings": ["tradingsymbol"],
+    "mf_sips": ["sip_id"],
+}
+
+# Market-driven fields that move on every capture during market hours. They are left
+# out of the row hash, so a new row version means the position itself changed; within
+# a day the latest version's prices are refreshed in place, and each day that sees a
+# capture keeps one version (so the journal holds daily prices, not one copy per capture).
+VOLATILE_FIELDS = {
+    "holdings": ["last_price", "close_price", "pnl", "day_change", "day_change_percentage"],
+    "mf_holdings": ["last_price", "last_price_date", "pnl"],
+}
+
+# Fields compared in the "what changed" view
+DIFF_FIELDS = {
+    "holdings": ["quantity", "average_price"],
+    "mf_holdings": ["quantity", "average_price"],
+    "mf_sips": ["status", "instalment_amount", "instalment_day"],
+}
+
+
+def _row_key(kind, user_id, row):
+    return "|".join([user_id, *(str(row.get(f, "")) for f in SNAPSHOT_KEYS[kind])])
+
+
+def _serialize(kind, row):
+    # Kite returns datetimes for some SIP fields; str() keeps them round-trippable for pandas
+    payload = json.dumps(row, sort_keys=True, default=str)
+    volatile = VOLATILE_FIELDS.get(kind, ())
+    position = json.dumps({k: v for k, v in row.items() if k not in volatile}, sort_keys=True, default=str)
+    return payload, hashlib.md5(position.encode()).hexdigest()
+
+
+def _latest_rows(conn, kind, user_id, as_of=None):
+    sql = """
+        SELECT r.row_key, r.row_hash, r.payload, r.captured_at
+        FROM snapshot_rows r
+        JOIN (SELECT row_key, MAX(captured_at) AS latest FROM snapshot_rows
+              WHERE kind = ? AND user_id = ? AND captured_at <= ? GROUP BY row_key) l
+          ON r.row_key = l.row_key AND r.captured_at = l.latest
+        WHERE r.kind = ? AND r.user_id = ?
+    """
+    # Dates compare as "start of that day"; datetimes to the microsecond
+    as_of = as_of.isoformat() if hasattr(as_of, "isoformat") else (as_of or "9999-12-31")
+    return pd.read_sql_query(sql, conn, params=(kind, user_id, as_of, kind, user_id))
+
+
+def record_snapshot(kind, rows, user_id, captured_at=None):
+    """Appends changed, new and removed rows of one account's Kite payload. Returns the number of versions appended.
+
+    Rows whose only change is a price move refresh today's version in place.
+    """
+    captured_at = (captured_at or datetime.now()).isoformat(timespec="microseconds")
+    snapshot_date = captured_at[:10]
+    rows = [rows] if isinstance(rows, dict) else list(rows or [])
+
+    with closing(store.connect()) as conn, conn:
+        latest = _latest_rows(conn, kind, user_id)
+        live = latest[latest['payload'].notna()].set_index('row_key')
+        known_hashes = live['row_hash'].to_dict()
+
+        # 1. New or modified positions, a first version for the day, or fresh prices for today's
+        inserts, refreshes, seen = [], [], set()
+        for row in rows:
+            key = _row_key(kind, user_id, row)
+            payload, row_hash = _serialize(kind, row)
+            seen.add(key)
+            if known_hashes.get(key) != row_hash or live.at[key, 'captured_at'][:10] != snapshot_date:
+                inserts.append((kind, user_id, key, captured_at, snapshot_date, row_hash, payload))
+            elif live.at[key, 'payload'] != payload:
+                refreshes.append((payload, kind, key, live.at[key, 'captured_at']))
+
+        # 2. Tombstones for this account's rows that disappeared since its last snapshot
+        for key in set(known_hashes) - seen:
+            inserts.append((kind, user_id, key, captured_at, snapshot_date, None, None))
+
+        conn.executemany(
+            "INSERT INTO snapshot_rows (kind, user_id, row_key, captured_at, snapshot_date, row_hash, payload) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            inserts
+        )
+        conn.executemany("UPDATE snapshot_rows SET payload = ? WHERE kind = ? AND row_key = ? AND captured_at = ?", refreshes)
+        conn.execute(
+            "INSERT INTO snapshot_runs (kind, user_id, captured_at, snapshot_date, row_count, changed_rows) VALUES (?, ?, ?, ?, ?, ?)",
+            (kind, user_id, captured_at, snapshot_date, len(rows), len(inserts))
+        )
+    return len(inserts)
+
+
+def load_snapshot(kind, user_id, as_of=None):
+    """Rebuilds one account's payload list exactly as it looked at `as_of` (default: latest)."""
+    with closing(store.connect()) as conn:
+        latest = _latest_rows(conn, kind, user_id, as_of)
+    latest = latest[latest['payload'].notna()].sort_values('row_key')
+    return [json.loads(p) for p in latest['payload']]
+
+
+def last_captured_at(kind, user_id):
+    df = store.run_query("SELECT MAX(captured_at) AS last FROM snapshot_runs WHERE kind = ? AND user_id = ?", (kind, user_id))
+    last = df['last'].iloc[0]
+    return datetime.fromisoformat(last) if last else None
+
+
+def _read_payload(kite, kind):
+    # Journaled kinds are named after the Kite client methods that return them
+    with perf.timed(f"{type(kite).__name__}.{kind}", "upstream") as span:
+        rows = getattr(kite, kind)()
+        span.add_payload(rows)
+    return rows
+
+
+def _read_payloads(kite):
+    """All journaled payloads, fetched concurrently under Kite's request limit."""
+    kinds = list(SNAPSHOT_KEYS)
+    return dict(zip(kinds, fetch.map_calls("kite", lambda kind: _read_payload(kite, kind), kinds)))
+
+
+def fetch_and_record(kite):
+    """Fetches every journaled payload from Kite and records it under the profile's user_id. Returns the raw payloads."""
+    captured_at = datetime.now()
+    payloads = _read_payloads(kite)
+    user_id = payloads['profile']['user_id']
+    for kind, rows in payloads.items():
+        record_snapshot(kind, rows, user_id, captured_at)
+    return payloads
+
+
+def fetch_payloads(kite):
+    """Fresh payloads for the Dashboard; live sessions are journaled, offline ones replayed."""
+    if isinstance(kite, OfflineKite):
+        return _read_payloads(kite)
+    return fetch_and_record(kite)
+
+
+def load_latest_payloads(user_id=None):
+    """An account's last journaled payloads and their capture time, or None when it has no snapshot."""
+    if not user_id:
+        return None
+    captured_at = last_captured_at("holdings", user_id)
+    if captured_at is None:
+        return None
+    return fetch_payloads(OfflineKite(user_id)), captured_at
+
+
+def diff_snapshots(kind, user_id, before_as_of, after_as_of=None):
+    """Added / Removed / Changed rows of one account between two points in time."""
+    with closing(store.connect()) as conn:
+        before = _latest_rows(conn, kind, user_id, before_as_of)
+        after = _latest_rows(conn, kind, user_id, after_as_of)
+
+    before = before[before['payload'].notna()].set_index('row_key')
+    after = after[after['payload'].notna()].set_index('row_key')
+    fields = DIFF_FIELDS.get(kind, [])
+
+    changes = []
+    for key in sorted(set(before.index) | set(after.index)):
+        old = json.loads(before.at[key, 'payload']) if key in before.index else None
+        new = json.loads(after.at[key, 'payload']) if key in after.index else None
+        if old is None:
+            status = "Added"
+        elif new is None:
+            status = "Removed"
+        elif before.at[key, 'row_hash'] != after.at[key, 'row_hash'] and any(old.get(f) != new.get(f) for f in fields):
+            status = "Changed"
+        else:
+            continue
+
+        entry = {'Key': key.split("|")[-1], 'Change': status}
+        for f in fields:
+            entry[f"{f} (before)"] = old.get(f) if old else None
+            entry[f"{f} (now)"] = new.get(f) if new else None
+        changes.append(entry)
+    return pd.DataFrame(changes)
+
+
+class OfflineKite:
+    """Read-only stand-in for KiteConnect that serves one account's latest journaled snapshot."""
+
+    def __init__(self, user_id, as_of=None):
+        self.user_id = user_id
+        self.as_of = as_of
+
+    def profile(self):
+        rows = load_snapshot("profile", self.user_id, self.as_of)
+        return rows[0] if rows else {'user_id': self.user_id, 'user_name': "Offline Snapshot", 'broker': "-", 'email': "-"}
+
+    def holdings(self):
+        return load_snapshot("holdings", self.user_id, self.as_of)
+
+    def mf_holdings(self):
+        return load_snapshot("mf_holdings", self.user_id, self.as_of)
+
+    def mf_sips(self):
+        return load_snapshot("mf_sips", self.user_id, self.as_of)
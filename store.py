@@ -0,0 +1,185 @@
+import os
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+import pandas as pd
+
+# Local on-disk store shared by the app pages and background jobs
+DATA_DIR = Path(os.environ.get("HUB_DATA_DIR", Path(__file__).resolve().parent / "data"))
+DB_PATH = DATA_DIR / "hub.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS daily_prices (
+    symbol TEXT NOT NULL,
+    date   TEXT NOT NULL,
+    close  REAL NOT NULL,
+    PRIMARY KEY (symbol, date)
+);
+CREATE TABLE IF NOT EXISTS portfolio_history (
+    user_id       TEXT NOT NULL DEFAULT '',
+    holdings_hash TEXT NOT NULL,
+    date          TEXT NOT NULL,
+    value         REAL NOT NULL,
+    benchmark     REAL,
+    PRIMARY KEY (user_id, holdings_hash, date)
+);
+CREATE TABLE IF NOT EXISTS snapshot_rows (
+    kind          TEXT NOT NULL,
+    user_id       TEXT NOT NULL DEFAULT '',
+    row_key       TEXT NOT NULL,
+    captured_at   TEXT NOT NULL,
+    snapshot_date TEXT NOT NULL,
+    row_hash      TEXT,
+    payload       TEXT,
+    PRIMARY KEY (kind, row_key, captured_at)
+);
+CREATE INDEX IF NOT EXISTS idx_snapshot_rows_date ON snapshot_rows (kind, snapshot_date);
+CREATE TABLE IF NOT EXISTS snapshot_runs (
+    kind          TEXT NOT NULL,
+    user_id       TEXT NOT NULL DEFAULT '',
+    captured_at   TEXT NOT NULL,
+    snapshot_date TEXT NOT NULL,
+    row_count     INTEGER NOT NULL,
+    changed_rows  INTEGER NOT NULL,
+    PRIMARY KEY (kind, user_id, captured_at)
+);
+CREATE TABLE IF NOT EXISTS symbol_metrics (
+    symbol              TEXT PRIMARY KEY,
+    as_of               TEXT NOT NULL,
+    sector              TEXT,
+    market_cap_cr       REAL,
+    trailing_pe         REAL,
+    forward_pe          REAL,
+    peg_ratio           REAL,
+    price_to_book       REAL,
+    roe_pct             REAL,
+    roa_pct             REAL,
+    profit_margin_pct   REAL,
+    operating_margin_pct REAL,
+    revenue_growth_pct  REAL,
+    earnings_growth_pct REAL,
+    debt_to_equity      REAL,
+    dividend_yield      REAL,
+    trailing_eps        REAL,
+    beta                REAL,
+    high_52w            REAL,
+    low_52w             REAL,
+    close               REAL,
+    rsi                 REAL,
+    sma20               REAL,
+    sma50               REAL,
+    sma200              REAL,
+    macd                REAL,
+    macd_signal         REAL,
+    pct_from_52w_high   REAL,
+    score               INTEGER,
+    recommendation      TEXT,
+    pros                INTEGER,
+    cons                INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_symbol_metrics_score ON symbol_metrics (score DESC);
+CREATE INDEX IF NOT EXISTS idx_symbol_metrics_sector ON symbol_metrics (sector);
+CREATE TABLE IF NOT EXISTS symbol_classification (
+    symbol            TEXT PRIMARY KEY,
+    sector            TEXT,
+    industry          TEXT,
+    market_cap_bucket TEXT,
+    source            TEXT NOT NULL,
+    updated_at        TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS indicator_state (
+    symbol     TEXT NOT NULL,
+    interval   TEXT NOT NULL,
+    last_bar   TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    state      TEXT NOT NULL,
+    PRIMARY KEY (symbol, interval)
+);
+"""
+
+# Columns added after their table first shipped, so stores created earlier get them too
+_ADDED_COLUMNS = [
+    ("snapshot_rows", "user_id", "TEXT NOT NULL DEFAULT ''"),
+    ("snapshot_runs", "user_id", "TEXT NOT NULL DEFAULT ''"),
+    ("symbol_metrics", "operating_margin_pct", "REAL"),
+    ("symbol_metrics", "revenue_growth_pct", "REAL"),
+    ("symbol_metrics", "earnings_growth_pct", "REAL"),
+]
+
+_initialized = set()
+
+
+def _migrate(conn):
+    # portfolio_history is derived from daily_prices: a pre-account layout is rebuilt, not converted
+    if "user_id" not in {row[1] for row in conn.execute("PRAGMA table_info(portfolio_history)")}:
+        conn.execute("DROP TABLE portfolio_history")
+        conn.executescript(_SCHEMA)
+    for table, column, kind in _ADDED_COLUMNS:
+        existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        if column not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {kind}")
+    # Indexes over added columns, created once the columns exist
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_snapshot_rows_user ON snapshot_rows (kind, user_id, row_key)")
+    conn.commit()
+
+
+def connect():
+    """Opens a connection to the local store, creating the schema on first use."""
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(DB_PATH, timeout=30)
+    if DB_PATH not in _initialized:
+        conn.executescript(_SCHEMA)
+        _migrate(conn)
+        _initialized.add(DB_PATH)
+    return conn
+
+
+def run_query(sql, params=()):
+    with closing(connect()) as conn:
+        return pd.read_sql_query(sql, conn, params=params)
+
+
+def execute_many(sql, rows):
+    with closing(connect()) as conn, conn:
+        conn.executemany(sql, rows)
+
+
+# --- DAILY PRICE STORE (Yahoo closes and AMFI NAVs) ---
+def last_price_date(symbol):
+    df = run_query("SELECT MAX(date) AS last FROM daily_prices WHERE symbol = ?", (symbol,))
+    last = df['last'].iloc[0]
+    return pd.Timestamp(last) if last else None
+
+
+def write_prices(prices):
+    """Upserts a wide date x symbol frame of closes into the price store."""
+    long = prices.stack().dropna().reset_index()
+    if long.empty:
+        return 0
+    long.columns = ['date', 'symbol', 'close']
+    long['date'] = pd.to_datetime(long['date']).dt.strftime('%Y-%m-%d')
+    execute_many(
+        "INSERT OR REPLACE INTO daily_prices (symbol, date, close) VALUES (?, ?, ?)",
+        long[['symbol', 'date', 'close']].itertuples(index=False, name=None)
+    )
+    return len(long)
+
+
+def read_prices(symbols, start=None):
+    """Reads stored closes back as a wide date x symbol frame."""
+    symbols = list(symbols)
+    if not symbols:
+        return pd.DataFrame()
+
+    placeholders = ",".join("?" * len(symbols))
+    sql = f"SELECT symbol, date, close FROM daily_prices WHERE symbol IN ({placeholders})"
+    params = list(symbols)
+    if start is not None:
+        sql += " AND date >= ?"
+        params.append(pd.Timestamp(start).strftime('%Y-%m-%d'))
+
+    df = run_query(sql, params)
+    if df.empty:
+        return pd.DataFrame(columns=symbols)
+    df['date'] = pd.to_datetime(df['date'])
+    return df.pivot(index='date', columns='symbol', values='close').reindex(columns=symbols).sort_index()
@@ -0,0 +1,119 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+# Process-wide stale-while-revalidate registry. Entries outlive a single rerun so
+# a page can render the last known value instantly while a worker thread refreshes it.
+# The registry is an LRU bounded by MAX_ENTRIES, and entries no page has read for
+# IDLE_SECONDS are dropped, so keys of ended sessions (per user, symbol, period) do not
+# pile up; an evicted key simply starts cold on its next read.
+
+MAX_ENTRIES = 256
+IDLE_SECONDS = 6 * 3600
+
+
+class Entry:
+    """Last known value for a key plus the state of its background refresh."""
+
+    def __init__(self):
+        self.value = None
+        self.updated_at = None
+        self.version = 0
+        self.refreshing = False
+        self.error = None
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+        self.read_at = time.monotonic()
+
+    def age_seconds(self):
+        if self.updated_at is None:
+            return None
+        return (datetime.now() - self.updated_at).total_seconds()
+
+    def wait(self, timeout=None):
+        """Blocks until the entry has any value (stale or fresh)."""
+        return self.ready.wait(timeout)
+
+
+_entries = OrderedDict()
+_registry_lock = threading.Lock()
+
+
+def _evict(now):
+    # Oldest reads first: drop idle entries, then whatever exceeds the cap
+    while _entries:
+        key, entry = next(iter(_entries.items()))
+        if len(_entries) <= MAX_ENTRIES and now - entry.read_at <= IDLE_SECONDS:
+            break
+        del _entries[key]
+
+
+def get_entry(key):
+    now = time.monotonic()
+    with _registry_lock:
+        if key not in _entries:
+            _entries[key] = Entry()
+        entry = _entries[key]
+        entry.read_at = now
+        _entries.move_to_end(key)
+        _evict(now)
+        return entry
+
+
+def session_key(prefix, secret):
+    """Stable registry key that never keeps the raw secret (e.g. a Kite access token)."""
+    digest = hashlib.sha256(str(secret).encode()).hexdigest()[:16]
+    return f"{prefix}:{digest}"
+
+
+def _set_value(entry, value, updated_at):
+    entry.value = value
+    entry.updated_at = updated_at
+    entry.version += 1
+    entry.ready.set()
+
+
+def _refresh(entry, fetch_fn):
+    try:
+        value = fetch_fn()
+    except Exception as e:
+        # Keep serving the stale value; the error is surfaced next to the freshness badge
+        with entry.lock:
+            entry.error = e
+            entry.refreshing = False
+            entry.ready.set()
+        return
+
+    with entry.lock:
+        _set_value(entry, value, datetime.now())
+        entry.error = None
+        entry.refreshing = False
+
+
+def revalidate(key, fetch_fn, fallback_fn=None, max_age=300):
+    """Returns the entry for `key` immediately and refreshes it in the background when stale.
+
+    `fallback_fn` seeds an empty entry and must return `(value, updated_at)` or None.
+    """
+    entry = get_entry(key)
+    with entry.lock:
+        if entry.value is None and fallback_fn is not None:
+            seeded = fallback_fn()
+            if seeded is not None:
+                _set_value(entry, *seeded)
+
+        age = entry.age_seconds()
+        is_stale = age is None or age > max_age
+        if is_stale and not entry.refreshing:
+            entry.refreshing = True
+            threading.Thread(target=_refresh, args=(entry, fetch_fn), daemon=True, name=f"swr-{key}").start()
+    return entry
+
+
+def invalidate(key):
+    """Marks an entry stale so the next revalidate() triggers a refresh."""
+    entry = get_entry(key)
+    with entry.lock:
+        entry.updated_at = None
@@ -1,35 +1,50 @@
+import os
+import time
 import streamlit as st
-import yfinance as yf
 import pandas as pd
-from kiteconnect import KiteConnect
 from urllib.parse import urlparse, parse_qs
-from ta.trend import MACD
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+import fetch
+import holdings as hd
+import perf
+import providers
+import resilience
+import session_cache
+import snapshots
+import swr
+
+MARKET_WATCH = {
+    "Nifty 50": "^NSEI", 
+    "Nifty Next 50": "^NSMIDCP", 
+    "Nifty Midcap 150": "NIFTYMIDCAP150.NS"
+}
 
 @st.fragment(run_every=10)
+@perf.instrument("render.market_watch")
 def show_live_benchmarks():
     st.markdown("### 🏛️ Market Watch (Live)")
-    indices = {
-        "Nifty 50": "^NSEI", 
-        "Nifty Next 50": "^NSMIDCP", 
-        "Nifty Midcap 150": "NIFTYMIDCAP150.NS"
-    }
+    indices = MARKET_WATCH
     
-    symbols = list(indices.values())
-    data = yf.download(symbols, period="1d", interval="1m", progress=False, auto_adjust=True)
+    symbols = tuple(indices.values())
+    try:
+        data = get_intraday_closes(symbols)
+    except Exception:
+        data = pd.DataFrame()
+    # Day change against the previous session's close, as the price alerts measure it
+    try:
+        prev_closes = previous_closes(get_daily_closes(symbols), data.index[-1], symbols)
+    except Exception:
+        prev_closes = pd.Series(float("nan"), index=list(symbols))
     
     cols = st.columns(len(indices))
     
     for i, (name, symbol) in enumerate(indices.items()):
         with cols[i]:
             try:
-                # Handle both Single and Multi-index DataFrames from yfinance
-                if isinstance(data['Close'], pd.DataFrame):
-                    prices = data['Close'][symbol].dropna()
-                else:
-                    prices = data['Close'].dropna()
+                prices = data[symbol].dropna()
                 
                 current_price = prices.iloc[-1]
-                prev_close = prices.iloc[0]
+                prev_close = prev_closes[symbol]
                 
                 change = current_price - prev_close
                 pct_change = (change / prev_close) * 100
@@ -37,15 +52,85 @@ def show_live_benchmarks():
                 st.metric(
                     label=name,
                     value=f"{current_price:,.2f}",
-                    delta=f"{change:+.2f} ({pct_change:+.2f}%)"
+                    delta=f"{change:+.2f} ({pct_change:+.2f}%)" if not pd.isna(prev_close) else None
                 )
             except Exception:
                 st.error(f"Error loading {name}")
 
+# --- PRICE ALERTS (evaluated on the Market Watch tick; see alerts.py) ---
+@st.fragment(run_every=10)
+@perf.instrument("alerts.tick")
+def watch_alerts(holding_symbols):
+    """Evaluates the alert rules over holdings, the watchlist and the indices; new alerts pop up as toasts."""
+    import alerts  # Deferred: alerts builds on metrics, which imports utils
+    try:
+        engine = alerts.get_engine()
+        symbols = list(dict.fromkeys([*holding_symbols, *engine.watchlist]))
+        yf_symbols = tuple(f"{s}.NS" for s in symbols) + tuple(MARKET_WATCH.values())
+        try:
+            live_closes = get_intraday_closes(yf_symbols)
+        except Exception:
+            live_closes = None  # Stored readings still evaluate; price rules wait for the next tick
+        try:
+            daily_closes = get_daily_closes(yf_symbols)
+        except Exception:
+            daily_closes = None  # Day-change rules wait for the previous close
+        signal_frame = alerts.signals(symbols, live_closes, MARKET_WATCH, daily_closes)
+        scopes = {'holdings': list(holding_symbols), 'watchlist': engine.watchlist, 'indices': list(MARKET_WATCH)}
+        # The engine logs each alert once for all sessions; this session toasts what it has not seen yet
+        seen = st.session_state.setdefault("alerts_seen", time.time())
+        engine.evaluate(signal_frame, scopes)
+        log = engine.visible(alerts.read_log(limit=50), scopes)
+        if not log.empty and 'ts' in log.columns:
+            new = log[log['ts'] > seen]
+            for message in reversed(new['message'].tolist()):
+                st.toast(message, icon="🔔")
+            st.session_state.alerts_seen = max(seen, log['ts'].max())
+    except Exception as e:
+        st.caption(f"⚠️ Alerts paused: {e}")
+        return
+
+    log = log.head(20)
+    missing = alerts.no_data(signal_frame, symbols)
+    with st.expander(f"🔔 Alerts · {len(engine.rules)} rules over {len(symbols)} symbols", expanded=False):
+        if missing:
+            st.caption(f"⚠️ No data for {', '.join(missing)}: only live-price rules apply until their metrics can be computed.")
+        if log.empty:
+            st.caption(f"No alerts yet. Rules and the watchlist live in {alerts.RULES_FILE}.")
+        else:
+            st.dataframe(log[['time', 'symbol', 'message']], hide_index=True, use_container_width=True)
+
+@resilience.last_known_good("get_intraday_closes")
+@st.cache_data(ttl=10, show_spinner=False) # Cache for one Market Watch tick
+def get_intraday_closes(yf_symbols):
+    """Today's 1-minute closes; while Yahoo throttles, the last good frame is shown."""
+    return providers.get_provider().closes(yf_symbols, period="1d", interval="1m")
+
+@resilience.last_known_good("get_daily_closes")
+@st.cache_data(ttl=900, show_spinner=False) # Cache for 15 minutes
+def get_daily_closes(yf_symbols):
+    """The last few daily closes in one batch, for day changes against the previous close."""
+    return providers.get_provider().closes(yf_symbols, period="5d", interval="1d")
+
+def previous_closes(daily_closes, session, yf_symbols):
+    """Each symbol's last daily close before the session of `session` (NaN where unknown)."""
+    yf_symbols = list(yf_symbols)
+    if daily_closes is None or daily_closes.empty:
+        return pd.Series(float("nan"), index=yf_symbols)
+    # Dates only: intraday bars are exchange-local and tz-aware, daily bars usually naive
+    before = daily_closes[pd.Index(daily_closes.index.date) < pd.Timestamp(session).date()]
+    if before.empty:
+        return pd.Series(float("nan"), index=yf_symbols)
+    return before.reindex(columns=yf_symbols).ffill().iloc[-1].astype("float64")
+
 def handle_kite_auth():
     """Renders the Kite Configuration UI. Call this ONLY on Dashboard."""
-    api_key = st.secrets["api_key"]
-    api_secret = st.secrets["api_secret"]
+    # Secrets are optional so the Dashboard can run offline from the snapshot journal
+    try:
+        api_key = st.secrets["api_key"]
+        api_secret = st.secrets["api_secret"]
+    except Exception:
+        api_key, api_secret = None, None
     
     # Initialize session state for persistent login
     if "kite" not in st.session_state:
@@ -57,30 +142,56 @@ def handle_kite_auth():
         st.header("⚙️ Configurations")
         
         if st.session_state.authenticated:
-            st.success("✅ Kite Connected")
+            if isinstance(st.session_state.kite, snapshots.OfflineKite):
+                st.info("📴 Offline Mode (Last Snapshot)")
+            else:
+                st.success("✅ Kite Connected")
             if st.button("Log Out"):
                 st.session_state.authenticated = False
                 st.session_state.kite = None
                 st.rerun()
         else:
-            kite_obj = KiteConnect(api_key=api_key)
-            st.write("1. Authorize App:")
-            if st.button("🚀 Get Login URL"):
-                st.link_button("Login to Kite", kite_obj.login_url())
-            
-            redirect_url = st.text_input("2. Paste Redirect URL here:")
-            if redirect_url:
-                try:
-                    parsed_url = urlparse(redirect_url)
-                    request_token = parse_qs(parsed_url.query).get("request_token", [None])[0]
-                    if request_token:
-                        data = kite_obj.generate_session(request_token, api_secret=api_secret)
-                        kite_obj.set_access_token(data["access_token"])
-                        st.session_state.kite = kite_obj
-                        st.session_state.authenticated = True
-                        st.rerun()
-                except Exception as e:
-                    st.error(f"Error: {e}")
+            if api_key:
+                kite_obj = providers.get_provider().kite_session(api_key)
+                st.write("1. Authorize App:")
+                if st.button("🚀 Get Login URL"):
+                    st.link_button("Login to Kite", kite_obj.login_url())
+                
+                redirect_url = st.text_input("2. Paste Redirect URL here:")
+                if redirect_url:
+                    try:
+                        parsed_url = urlparse(redirect_url)
+                        request_token = parse_qs(parsed_url.query).get("request_token", [None])[0]
+                        if request_token:
+                            data = kite_obj.generate_session(request_token, api_secret=api_secret)
+                            kite_obj.set_access_token(data["access_token"])
+                            st.session_state.kite = kite_obj
+                            st.session_state.kite_user_id = data.get("user_id") or kite_obj.profile()["user_id"]
+                            st.session_state.authenticated = True
+                            st.rerun()
+                    except Exception as e:
+                        st.error(f"Error: {e}")
+            elif providers.get_provider().name == "replay":
+                # HUB_PROVIDER=replay: log in against the recorded Kite fixtures
+                if st.button("🎞️ Use Recorded Fixtures (Replay)"):
+                    st.session_state.kite = providers.get_provider().kite_session(None)
+                    st.session_state.kite_user_id = st.session_state.kite.profile()["user_id"]
+                    st.session_state.authenticated = True
+                    st.rerun()
+            else:
+                st.warning("Kite API keys not configured.")
+
+            # Offline fallback: replay the journaled snapshot of the account this visitor
+            # already logged in as (or the one named by HUB_OFFLINE_USER on a dev machine)
+            offline_user = st.session_state.get("kite_user_id") or os.environ.get("HUB_OFFLINE_USER")
+            last_snapshot = snapshots.last_captured_at("holdings", offline_user) if offline_user else None
+            if last_snapshot:
+                st.caption(f"Last snapshot of {offline_user}: {last_snapshot.strftime('%d %b %Y, %H:%M')}")
+                if st.button("📴 Use Last Snapshot (Offline)"):
+                    st.session_state.kite = snapshots.OfflineKite(offline_user)
+                    st.session_state.kite_user_id = offline_user
+                    st.session_state.authenticated = True
+                    st.rerun()
 
 def handle_what_if_sidebar():
     """Renders the What-If Analysis UI. Call this on Dashboard and/or Screener."""
@@ -106,26 +217,30 @@ def handle_what_if_sidebar():
         
         return simulation_pct
 
+INDEX_URLS = {
+    "NIFTY 50": "https://archives.nseindia.com/content/indices/ind_nifty50list.csv",
+    "NIFTY NEXT 50": "https://archives.nseindia.com/content/indices/ind_niftynext50list.csv",
+    "NIFTY BANK": "https://archives.nseindia.com/content/indices/ind_niftybanklist.csv",
+    "NIFTY MIDCAP 150": "https://archives.nseindia.com/content/indices/ind_niftymidcap150list.csv",
+    "NIFTY SMALLCAP 250": "https://archives.nseindia.com/content/indices/ind_niftysmallcap250list.csv",
+    "NIFTY LARGEMIDCAP 250": "https://archives.nseindia.com/content/indices/ind_niftylargemidcap250list.csv"
+}
+
+def get_index_constituents(index_name):
+    """Cleaned NSE constituent CSV for an index (Symbol, Company Name, Industry, ...)."""
+    df = providers.get_provider().index_constituents(INDEX_URLS.get(index_name))
+
+    # --- CLEANING STEP ---
+    # 1. Remove specific known dummy symbols
+    blacklist = ["DUMMYHDLVR"]
+    df = df[~df['Symbol'].isin(blacklist)]
+
+    # 2. General filter: Remove anything starting with or containing 'DUMMY'
+    return df[~df['Symbol'].str.contains('DUMMY', case=False, na=False)]
+
 def get_index_tickers(index_name):
-    urls = {
-        "NIFTY 50": "https://archives.nseindia.com/content/indices/ind_nifty50list.csv",
-        "NIFTY NEXT 50": "https://archives.nseindia.com/content/indices/ind_niftynext50list.csv",
-        "NIFTY BANK": "https://archives.nseindia.com/content/indices/ind_niftybanklist.csv",
-        "NIFTY MIDCAP 150": "https://archives.nseindia.com/content/indices/ind_niftymidcap150list.csv"
-    }
-    
     try:
-        url = urls.get(index_name)
-        headers = {'User-Agent': 'Mozilla/5.0'}
-        df = pd.read_csv(url)
-        
-        # --- CLEANING STEP ---
-        # 1. Remove specific known dummy symbols
-        blacklist = ["DUMMYHDLVR"]
-        df = df[~df['Symbol'].isin(blacklist)]
-        
-        # 2. General filter: Remove anything starting with or containing 'DUMMY'
-        df = df[~df['Symbol'].str.contains('DUMMY', case=False, na=False)]
+        df = get_index_constituents(index_name)
         
         # Create a dictionary { 'RELIANCE': 'Reliance Industries Ltd.', ... }
         # Note: NSE CSV column name for Company Name is usually 'Company Name'
@@ -137,7 +252,14 @@ def get_index_tickers(index_name):
         st.error(f"Error fetching {index_name} list: {e}")
         return []
     
-def analyze_stock(info, hist_data):
+def analyze_stock(info, hist_data, technicals=None):
+    """Pros, cons and a score out of 17 from fundamentals and the latest technicals.
+
+    `technicals` (close, rsi, sma50, sma200, macd, macd_signal) can come from the stored
+    streaming state in indicators.py; without it they are computed from `hist_data`.
+    """
+    if technicals is None:
+        technicals = latest_technicals(hist_data)
     pros = []
     cons = []
     score = 0
@@ -205,16 +327,16 @@ def analyze_stock(info, hist_data):
         score += 1
 
     # 3. TECHNICAL MOMENTUM
-    rsi = hist_data['RSI'].iloc[-1]
+    rsi = technicals['rsi']
     if rsi < 35:
         pros.append(f"RSI Oversold ({rsi:.1f}): Potential for price reversal upwards.")
         score += 2
     elif rsi > 70:
         cons.append(f"RSI Overbought ({rsi:.1f}): Stock may be due for a correction.")
 
-    curr_price = hist_data['Close'].iloc[-1]
-    sma200 = hist_data['SMA50'].iloc[-1]
-    sma50 = hist_data['SMA200'].iloc[-1]
+    curr_price = technicals['close']
+    sma200 = technicals['sma50']
+    sma50 = technicals['sma200']
     if not pd.isna(sma200):
         if curr_price > sma200:
             pros.append("Above 200 SMA: Long-term trend is bullish.")
@@ -240,11 +362,7 @@ def analyze_stock(info, hist_data):
             cons.append(f"Falling Knife Alert: Down {dist_from_high:.1f}% from 52-week high; high downward momentum.")
             
     # 4. MACD Signal
-    # MACD
-    macd_io = MACD(close=hist_data['Close'])
-    curr_macd = macd_io.macd().iloc[-1]
-    curr_signal = macd_io.macd_signal().iloc[-1]
-    if curr_macd > curr_signal:
+    if technicals['macd'] > technicals['macd_signal']:
         pros.append("MACD Bullish Cross: Short-term momentum is positive.")
         score += 1
     else:
@@ -252,17 +370,339 @@ def analyze_stock(info, hist_data):
 
     return pros, cons, score
 
+def latest_technicals(hist_data):
+    """Last close, RSI, SMAs and MACD of a frame that already went through add_indicators."""
+    from ta.trend import MACD  # Deferred: ta is only needed once a stock is analysed
+    macd_io = MACD(close=hist_data['Close'])
+    last = hist_data.iloc[-1]
+    return {
+        'close': last['Close'], 'rsi': last['RSI'], 'sma20': last['SMA20'], 'sma50': last['SMA50'], 'sma200': last['SMA200'],
+        'macd': macd_io.macd().iloc[-1], 'macd_signal': macd_io.macd_signal().iloc[-1],
+    }
+
+def recommendation(score):
+    """Label for an analyze_stock score (out of 17)."""
+    if score >= 13:
+        return "STRONG BUY"
+    elif score >= 9:
+        return "BUY"
+    elif score >= 5:
+        return "HOLD"
+    return "SELL / AVOID"
+
+@st.cache_data(max_entries=8, show_spinner=False) # Cached until the file changes (mtime is part of the key)
+def load_screen_rankings(path, mtime):
+    """Ranked screen written by screen.py (Parquet or CSV)."""
+    return pd.read_parquet(path) if path.endswith(".parquet") else pd.read_csv(path)
+
+@perf.cached("fundamentals_matrix")
+@st.cache_data(max_entries=8, show_spinner=False) # Cached until symbol_metrics changes (its version is part of the key)
+def get_fundamentals_matrix(symbols, version):
+    """Sector-percentile fundamentals for an index's symbols (see peers.py)."""
+    import peers  # Deferred: peers builds on metrics, which imports utils
+    return peers.fundamentals_matrix(list(symbols))
+
 # --- OPTIMIZED SECTOR FETCHING (Add this outside your main loop) ---
+@resilience.last_known_good("get_sector_info")
+@perf.cached("get_sector_info")
 @st.cache_data(ttl=86400) # Cache for 24 hours
 def get_sector_info(symbols):
-    data = {}
-    for symbol in symbols:
-        try:
-            ticker = yf.Ticker(f"{symbol}.NS")
-            data[symbol] = ticker.info.get('sector', 'Others')
-        except:
-            data[symbol] = "Others"
-    return data
+    return fetch_sector_info(symbols)
+
+# Uncached variant, safe to call from background refresh threads
+def fetch_sector_info(symbols):
+    """Sector per symbol from the local classification table; raises when Yahoo is throttling
+    and a symbol it has never seen cannot be filled in."""
+    import classification  # Deferred: classification builds on utils' index lists
+    return classification.sector_map(symbols)
+
+# --- PORTFOLIO PREPARATION (Shared by the Dashboard, jobs & benchmarks) ---
+def prepare_holdings_frames(holdings, mf_holdings, simulation_pct=0):
+    """Builds the compact equity/MF frames with invested and (simulated) current values."""
+    multiplier = 1 + (simulation_pct / 100)
+
+    # Only the fields the pages read, with fixed dtypes (see holdings.py)
+    df_eq = hd.with_values(hd.from_records(holdings, hd.EQUITY_SCHEMA), multiplier)
+    df_mf = hd.with_values(hd.from_records(mf_holdings, hd.MF_SCHEMA), multiplier)
+    return df_eq, df_mf
+
+def portfolio_totals(df_eq, df_mf):
+    """(total invested, total current) across equity and MF holdings."""
+    total_inv = (df_eq['invested_value'].sum() if not df_eq.empty else 0) + \
+                (df_mf['invested_value'].sum() if not df_mf.empty else 0)
+    total_curr = (df_eq['current_value'].sum() if not df_eq.empty else 0) + \
+                 (df_mf['current_value'].sum() if not df_mf.empty else 0)
+    return total_inv, total_curr
+
+@perf.instrument("render.styler.equity_holdings")
+def equity_holdings_html(df_eq):
+    """Renders the 'Detailed Equity Holdings' table to styled HTML."""
+    # 1. Prepare and Clean Data
+    df_holdings = hd.view(df_eq, ['tradingsymbol', 'quantity', 'average_price', 'last_price', 'invested_value', 'current_value'])
+
+    # Calculations
+    df_holdings['P&L'] = df_holdings['current_value'] - df_holdings['invested_value']
+    df_holdings['P&L %'] = (df_holdings['P&L'] / df_holdings['invested_value']) * 100
+    df_holdings['Weight %'] = (df_holdings['current_value'] / df_holdings['current_value'].sum()) * 100
+
+    # Sort by highest current value
+    df_holdings = df_holdings.sort_values(by='current_value', ascending=False).reset_index(drop=True)
+
+    # 2. Rename columns for display
+    rename_map = {
+        'tradingsymbol': 'Stock', 'quantity': 'Qty', 'average_price': 'Avg Price',
+        'last_price': 'LTP', 'invested_value': 'Invested', 'current_value': 'Current',
+        'P&L': 'P&L', 'P&L %': 'P&L %', 'Weight %': 'Weight %'
+    }
+    df_display = df_holdings.rename(columns=rename_map)
+
+    # 3. Create formatting lambdas for 0 decimals and 2 decimals
+    fmt_0d = lambda x: f"₹{format_indian_currency(x).split('.')[0]}"
+    fmt_2d = lambda x: f"₹{format_indian_currency(x)}"
+    fmt_qty = lambda x: format_indian_currency(x).split('.')[0] # No ₹ for quantity
+
+    # 4. Create the Styled Object
+    styled_final = df_display.style.applymap(color_values, subset=['P&L', 'P&L %']) \
+        .format({
+            'Qty': fmt_qty,
+            'Avg Price': fmt_2d,
+            'LTP': fmt_2d,
+            'Invested': fmt_0d,
+            'Current': fmt_0d,
+            'P&L': fmt_0d,
+            'P&L %': '{:+.2f}%',
+            'Weight %': '{:.1f}%'
+        })
+
+    return apply_holdings_style(styled_final).hide(axis='index').to_html()
+
+def build_sector_frames(df_eq, sector_map, missing_label="Others"):
+    """Per-holding sector frame (for the sunburst) and the aggregated sector summary."""
+    df_sector_full = hd.view(df_eq, ['tradingsymbol', 'invested_value', 'current_value'])
+    df_sector_full['Sector'] = df_sector_full['tradingsymbol'].map(sector_map).fillna(missing_label)
+
+    # Aggregate Summary
+    df_sector_summary = df_sector_full.groupby('Sector').agg({
+        'invested_value': 'sum',
+        'current_value': 'sum'
+    }).reset_index()
+
+    df_sector_summary['P&L'] = df_sector_summary['current_value'] - df_sector_summary['invested_value']
+    df_sector_summary['Weight %'] = (df_sector_summary['current_value'] / df_sector_summary['current_value'].sum()) * 100
+    df_sector_summary = df_sector_summary.sort_values(by='current_value', ascending=False)
+    return df_sector_full, df_sector_summary
+
+@perf.instrument("render.styler.sector_summary")
+def sector_summary_html(df_sector_summary):
+    """Renders the 'Sector Breakdown' table to styled HTML."""
+    df_clean = df_sector_summary.reset_index(drop=True)
+    df_clean.columns = [col.replace('_', ' ').title() for col in df_clean.columns]
+
+    # Define the Indian Numbering Lambda with 0 Decimals
+    fmt_indian_0d = lambda x: f"₹{format_indian_currency(x).split('.')[0]}"
+
+    # Apply Professional Styling and Formatting
+    styled_sector = df_clean.style.applymap(color_pnl_custom, subset=['P&L']) \
+        .format({
+            'Invested Value': fmt_indian_0d,
+            'Current Value': fmt_indian_0d,
+            'P&L': fmt_indian_0d,
+            'Weight %': '{:.0f}%' # Zero decimals for weight as requested
+        })
+
+    return apply_sector_style(styled_sector).hide(axis='index').to_html()
+
+def add_indicators(hist_data, sma_windows=(20, 50, 200)):
+    """Adds RSI(14) and SMA columns (SMA20, SMA50, ...) to a daily OHLC frame in place."""
+    from ta.momentum import RSIIndicator
+    from ta.trend import SMAIndicator
+    hist_data['RSI'] = RSIIndicator(close=hist_data['Close'], window=14).rsi()
+    for window in sma_windows:
+        hist_data[f'SMA{window}'] = SMAIndicator(close=hist_data['Close'], window=window).sma_indicator()
+    return hist_data
+
+# --- STALE-WHILE-REVALIDATE UI HELPERS ---
+def show_freshness_badge(entry, label="Data"):
+    """Small 'last updated' pill for data served from the SWR layer."""
+    if entry.updated_at is None:
+        return
+    stamp = entry.updated_at.strftime('%d %b %Y, %H:%M:%S')
+    if entry.refreshing:
+        text, color = f"🕑 {label} from {stamp} · refreshing in background…", "#d97706"
+    elif entry.error is not None:
+        text, color = f"⚠️ {label} from {stamp} · refresh failed: {entry.error}", "#ef4444"
+    else:
+        text, color = f"🟢 {label} updated {stamp}", "#16a34a"
+    st.markdown(f'<p style="text-align:right; font-size:0.8rem; color:{color}; margin:0 0 10px 0;">{text}</p>', unsafe_allow_html=True)
+
+@st.fragment(run_every=2)
+def watch_revalidation(rendered_versions):
+    """Polls in-flight refreshes and reruns the page once newer data has landed.
+
+    Only call this while at least one entry is refreshing; it stops polling on the next rerun.
+    """
+    for key, version in rendered_versions.items():
+        if swr.get_entry(key).version != version:
+            st.rerun(scope="app")
+
+# --- PERFORMANCE PANEL (Sidebar; call at the very end of a page) ---
+def show_perf_panel():
+    """Collapsible sidebar view of perf timings, cache hit rates and trace exports."""
+    perf.end_run()
+    with st.sidebar.expander("⏱️ Performance", expanded=False):
+        enabled = st.toggle("Record timings", value=perf.is_enabled(), key="perf_enabled")
+        if enabled != perf.is_enabled():
+            perf.enable(enabled)
+            st.rerun()
+
+        # Single-flight counters are always on (a few integer bumps per upstream call)
+        flights = providers.coalescing_stats()
+        st.caption(f"🔗 Coalesced requests: {flights['saved']} of {flights['requests']} upstream calls saved")
+        for host in fetch.host_status():
+            if host['throttled'] or host['circuit'] != "closed":
+                st.caption(f"🚦 {host['host']}: {host['rate_per_s']} req/s, throttled {host['throttled']}x, circuit {host['circuit']}")
+        if not enabled:
+            st.caption("Instrumentation is off. Turn it on, then rerun the page.")
+            return
+
+        df = perf.summary()
+        if df.empty:
+            st.caption("No samples yet.")
+            return
+
+        view = pd.DataFrame({
+            'Section': df['name'],
+            'Calls': df['calls'],
+            'Total ms': (df['total_s'] * 1000).round(1),
+            'Avg ms': df['avg_ms'].round(1),
+            'Max ms': (df['max_s'] * 1000).round(1),
+            'KB': (df['bytes'] / 1024).round(1),
+            'Hit %': (df['hit_rate'] * 100).round(0),
+        })
+        st.dataframe(view, hide_index=True, use_container_width=True)
+
+        col_json, col_trace = st.columns(2)
+        col_json.download_button("JSON", perf.export_json(), file_name="hub_perf.json", mime="application/json")
+        col_trace.download_button("Chrome trace", perf.export_chrome_trace(), file_name="hub_trace.json", mime="application/json")
+        if st.button("Reset counters"):
+            perf.reset()
+            st.rerun()
+
+def show_memory_panel():
+    """Sidebar debug view of this session's cached results and memory across sessions."""
+    cache = session_memory()
+    with st.sidebar.expander("🧠 Session Memory", expanded=False):
+        st.caption(
+            f"This session: {cache.nbytes / session_cache.MB:.1f} of {cache.budget / session_cache.MB:.0f} MB "
+            f"({cache.evictions} evicted) · all sessions capped at {session_cache.GLOBAL_BUDGET / session_cache.MB:.0f} MB"
+        )
+        usage = cache.usage()
+        if usage.empty:
+            st.caption("Nothing cached for this session yet.")
+        else:
+            st.dataframe(usage.rename(columns={'name': 'Section', 'kb': 'KB'}), hide_index=True, use_container_width=True)
+        st.dataframe(
+            session_cache.global_usage().rename(columns={'session': 'Session', 'entries': 'Entries', 'mb': 'MB', 'evictions': 'Evicted'}),
+            hide_index=True, use_container_width=True
+        )
+        if st.button("Free this session's cache"):
+            cache.clear()
+            st.rerun()
+
+# --- LAZY SECTIONS (Only the active tab/expander executes) ---
+def lazy_tabs(labels, key):
+    """st.tabs that reruns on switch and reports which tab is open."""
+    try:
+        return st.tabs(labels, key=key, on_change="rerun")
+    except TypeError:
+        # Older Streamlit cannot track the active tab; every tab stays eager
+        return st.tabs(labels)
+
+def lazy_expander(label, key, expanded=False):
+    try:
+        return st.expander(label, expanded=expanded, key=key, on_change="rerun")
+    except TypeError:
+        return st.expander(label, expanded=expanded)
+
+def is_open(container):
+    """True when a lazy tab/expander is active (or cannot report its state)."""
+    return getattr(container, "open", None) is not False
+
+def session_memory():
+    """This session's byte-budgeted LRU cache (see session_cache.py)."""
+    ctx = get_script_run_ctx()
+    return session_cache.for_session(st.session_state, ctx.session_id if ctx else "local")
+
+def memo_per_snapshot(name, memo_key, compute_fn):
+    """Memoizes a section result per session until its key (snapshot id + inputs) changes."""
+    # Only the latest result per section is kept, within the session and global byte budgets
+    cache = session_memory()
+    value = cache.get(name, memo_key)
+    perf.record_cache(f"memo.{name}", hit=value is not None)
+    if value is None:
+        with perf.timed(f"memo.{name}", "compute"):
+            value = compute_fn()
+        cache.put(name, memo_key, value)
+    return value
+
+@resilience.last_known_good("get_ticker_info", default=dict)
+@perf.cached("get_ticker_info")
+@st.cache_data(ttl=3600, max_entries=512, show_spinner=False) # Cache for 1 hour, at most 512 symbols
+def get_ticker_info(yf_symbol):
+    return providers.get_provider().ticker_info(yf_symbol)
+
+@resilience.last_known_good("get_quote")
+@perf.cached("get_quote")
+@st.cache_data(ttl=60, show_spinner=False) # Cache for 1 minute
+def get_quote(yf_symbol):
+    return providers.get_provider().quote(yf_symbol)
+
+@resilience.last_known_good("get_ohlc_history", default=pd.DataFrame)
+@perf.cached("get_ohlc_history")
+@st.cache_data(ttl=900, max_entries=64, show_spinner=False) # Cache for 15 minutes, at most 64 histories
+def get_ohlc_history(yf_symbol, period, interval="1d"):
+    return providers.get_provider().history(yf_symbol, period=period, interval=interval)
+
+@resilience.last_known_good("get_financials", default=pd.DataFrame)
+@perf.cached("get_financials")
+@st.cache_data(ttl=86400, max_entries=128, show_spinner=False) # Cache for 24 hours, at most 128 statements
+def get_financials(yf_symbol, quarterly=False):
+    return providers.get_provider().financials(yf_symbol, quarterly)
+
+# --- SHARED HISTORY FETCHERS (Used by Risk Lab & NAV charts) ---
+@resilience.last_known_good("get_nav_history")
+@perf.cached("get_nav_history")
+@st.cache_data(ttl=21600, max_entries=64, show_spinner=False) # Cache for 6 hours, at most 64 schemes
+def get_nav_history(scheme_code):
+    """Full NAV history for a scheme from mfapi as a date-sorted DataFrame."""
+    return parse_nav_payload(providers.get_provider().nav_payload(scheme_code))
+
+def prefetch(*thunks):
+    """Warms several cached fetchers concurrently; errors surface later at the real call site."""
+    fetch.gather(thunks, return_exceptions=True)
+
+def get_nav_histories(scheme_codes):
+    """NAV histories for several schemes fetched concurrently: {code: DataFrame or Exception}."""
+    codes = list(dict.fromkeys(scheme_codes))
+    results = fetch.gather([lambda c=c: get_nav_history(c) for c in codes], return_exceptions=True)
+    return dict(zip(codes, results))
+
+def parse_nav_payload(data_json):
+    """Turns an mfapi scheme payload into a date-sorted date/nav DataFrame."""
+    if "data" not in data_json or len(data_json["data"]) == 0:
+        return pd.DataFrame(columns=['date', 'nav'])
+
+    df_nav = pd.DataFrame(data_json["data"])
+    df_nav['nav'] = pd.to_numeric(df_nav['nav'], errors='coerce')
+    df_nav['date'] = pd.to_datetime(df_nav['date'], dayfirst=True)
+    return df_nav.dropna(subset=['nav']).sort_values('date').reset_index(drop=True)
+
+@resilience.last_known_good("get_close_history")
+@perf.cached("get_close_history")
+@st.cache_data(ttl=21600, max_entries=32) # Cache for 6 hours, at most 32 windows
+def get_close_history(yf_symbols, start=None, end=None, period="5y"):
+    """Daily adjusted closes for a tuple of Yahoo symbols, one column per symbol."""
+    return providers.get_provider().closes(yf_symbols, period=period, start=start, end=end)
 
 # 3. Helper Function for P&L Coloring
 def color_values(val):